@@ -11,66 +11,583 @@ pip install flask openpyxl pandas werkzeug
 python app.py → http://127.0.0.1:5000
 """
 
-import os, json, uuid, sqlite3
+import os, re, io, csv, gzip, json, time, uuid, shutil, functools, mimetypes, posixpath, subprocess, socket, sqlite3, base64, hashlib, threading, itertools, tempfile, unicodedata
 from datetime import datetime, date
-from flask import Flask, render_template_string, request, jsonify, send_from_directory, url_for, send_file
+from collections import OrderedDict
+from flask import (Flask, request, jsonify, url_for,
+                   send_file, Response, stream_with_context, g, has_request_context)
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from urllib.parse import quote
+import click
 import pandas as pd
-import io
+import openpyxl
+try:    import orjson   # optional — ho toh records / export ka JSON isse (stdlib se kaafi tez)
+except ImportError: orjson = None
+try:    import brotli   # optional — ho toh br, warna gzip
+except ImportError: brotli = None
+try:    from PIL import Image, ImageOps   # optional — image thumbnails
+except ImportError: Image = None
 
 app = Flask(__name__)
 app.config['SECRET_KEY']         = 'crm-2025-secret'
-app.config['UPLOAD_FOLDER']      = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+app.config['UPLOAD_FOLDER']      = os.environ.get('CRM_UPLOAD_FOLDER') or \
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+app.config['JOB_FOLDER']         = os.environ.get('CRM_JOB_FOLDER') or \
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs')
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crm.db')
+DB_PATH = os.environ.get('CRM_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crm.db')
+
+# Har connection par lagne wale PRAGMAs — env se override karo (CRM_SQLITE_<NAME>)
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('CRM_SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous':  os.environ.get('CRM_SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('CRM_SQLITE_BUSY_TIMEOUT', 15000)),        # ms
+    'mmap_size':    int(os.environ.get('CRM_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),  # bytes
+    'cache_size':   int(os.environ.get('CRM_SQLITE_CACHE_SIZE', -64000)),         # -N = N KiB
+    'temp_store':   os.environ.get('CRM_SQLITE_TEMP_STORE', 'MEMORY'),
+}
 
 ALLOWED = {'png','jpg','jpeg','gif','webp','pdf','mp4','mov','avi','mkv','xlsx','xls','docx','txt','csv'}
 COLORS  = ['#00c8ff','#00e07a','#ff9500','#ff3d5a','#a855f7','#f59e0b','#06b6d4','#84cc16']
+PAGE_SIZE     = int(os.environ.get('CRM_PAGE_SIZE', 200))
+MAX_PAGE_SIZE = int(os.environ.get('CRM_MAX_PAGE_SIZE', 2000))
+COUNT_CAP     = int(os.environ.get('CRM_COUNT_CAP', 10000))   # count=estimate isse aage nahi ginta
+IMPORT_BATCH  = int(os.environ.get('CRM_IMPORT_BATCH', 5000))  # executemany chunk size
+HEADER_ROWS   = 10   # import: header row pehli itni rows mein dhundi jaati hai (upar title / khaali rows)
+STREAM_IMPORT_BYTES = int(os.environ.get('CRM_STREAM_IMPORT_BYTES', 5 * 1024 * 1024))  # isse badi .xlsx stream hoti hai
+EXPORT_CHUNK        = int(os.environ.get('CRM_EXPORT_CHUNK', 2000))                   # fetchmany rows
+EXPORT_SPOOL_BYTES  = int(os.environ.get('CRM_EXPORT_SPOOL_BYTES', 32 * 1024 * 1024))  # isse bada xlsx disk par
+JOB_WORKERS   = int(os.environ.get('CRM_JOB_WORKERS', 1))     # har process mein job threads; 0 = band
+JOB_POLL      = float(os.environ.get('CRM_JOB_POLL', 2))       # sec — queue kitni der mein dekho
+JOB_STALE     = int(os.environ.get('CRM_JOB_STALE', 120))      # itne sec heartbeat nahi → job dobara queue
+JOB_TTL       = int(os.environ.get('CRM_JOB_TTL', 7 * 24 * 3600))   # sec — khatam jobs aur unki files itne baad hatao
+JOB_PRUNE_EVERY = 3600   # sec — har worker khaali hone par itni der mein ek baar prune_jobs
+JOB_ATTEMPTS  = 3
+DELETE_BATCH  = int(os.environ.get('CRM_DELETE_BATCH', 2000))
+PURGE_BATCH   = int(os.environ.get('CRM_PURGE_BATCH', 500))    # file_trash ki files ek transaction mein
+PURGE_ATTEMPTS = 5   # itni baar unlink fail → GC tak chhod do
+STORAGES      = ('json', 'cells')   # record data: ek JSON blob ya crm_cells rows
+DEFAULT_STORAGE = os.environ.get('CRM_STORAGE', 'json')   # naye projects ke liye
+META_CACHE_SIZE = int(os.environ.get('CRM_META_CACHE_SIZE', 512))   # project/column LRU entries
+COMPRESS_MIN    = int(os.environ.get('CRM_COMPRESS_MIN', 1400))     # bytes — isse chhote response as-is
+COMPRESS_LEVEL  = int(os.environ.get('CRM_COMPRESS_LEVEL', 5))      # gzip 1-9 / brotli quality 0-11
+UPLOAD_CHUNK    = int(os.environ.get('CRM_UPLOAD_CHUNK', 8 * 1024 * 1024))           # chunked upload ka default chunk
+UPLOAD_MAX      = int(os.environ.get('CRM_UPLOAD_MAX', 4 * 1024 * 1024 * 1024))      # chunked upload ki max file
+UPLOAD_TTL      = int(os.environ.get('CRM_UPLOAD_TTL', 24 * 3600))   # sec — itni der chhua nahi toh session hatao
+ATT_MAX_AGE     = int(os.environ.get('CRM_ATT_MAX_AGE', 365 * 24 * 3600))   # attachment naam content ka sha256 — kabhi nahi badalta
+# Attachment bytes proxy bheje: 'x-accel' (nginx, ATT_ACCEL_PREFIX wali internal location) ya
+# 'x-sendfile' (apache / lighttpd, poora path). Khaali = Flask khud (Range / 304 ke saath).
+ATT_OFFLOAD      = os.environ.get('CRM_ATT_OFFLOAD', '').lower()
+ATT_ACCEL_PREFIX = os.environ.get('CRM_ATT_ACCEL_PREFIX', '/_uploads/')
+THUMB_SIZE      = int(os.environ.get('CRM_THUMB_SIZE', 256))      # px — thumbnail ka lamba side
+THUMB_TIMEOUT   = int(os.environ.get('CRM_THUMB_TIMEOUT', 60))    # sec — pdftoppm / ffmpeg
+COMPRESS_TYPES  = {'application/json', 'text/html', 'text/css', 'application/javascript'}
+app.config['PARTIAL_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], '.partial')   # adhoore uploads
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+app.config['THUMB_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], '.thumbs')      # derivatives
+os.makedirs(app.config['PARTIAL_FOLDER'], exist_ok=True)
+os.makedirs(app.config['THUMB_FOLDER'], exist_ok=True)
+os.makedirs(app.config['JOB_FOLDER'], exist_ok=True)
 
 
 # ─────────────── DB ───────────────
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+CORE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS projects (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        name       TEXT NOT NULL,
+        color      TEXT DEFAULT '#00c8ff',
+        created_at TEXT DEFAULT (datetime('now'))
+    );
+    CREATE TABLE IF NOT EXISTS crm_columns (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        name       TEXT NOT NULL,
+        col_type   TEXT DEFAULT 'text',
+        col_order  INTEGER DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS crm_records (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        data       TEXT DEFAULT '{}',
+        tags       TEXT DEFAULT '',
+        notes      TEXT DEFAULT '',
+        created_at TEXT DEFAULT (datetime('now')),
+        updated_at TEXT DEFAULT (datetime('now'))
+    );
+    CREATE TABLE IF NOT EXISTS attachments (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        record_id     INTEGER NOT NULL REFERENCES crm_records(id) ON DELETE CASCADE,
+        filename      TEXT NOT NULL,
+        original_name TEXT NOT NULL,
+        file_type     TEXT DEFAULT 'file',
+        file_size     INTEGER DEFAULT 0,
+        created_at    TEXT DEFAULT (datetime('now'))
+    );
+"""
+
+JOBS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id         TEXT PRIMARY KEY,
+        kind       TEXT NOT NULL,
+        project_id INTEGER,
+        params     TEXT DEFAULT '{}',
+        status     TEXT DEFAULT 'queued',   -- queued | running | done | failed | cancelled
+        progress   INTEGER DEFAULT 0,
+        total      INTEGER DEFAULT 0,
+        message    TEXT DEFAULT '',
+        result     TEXT DEFAULT '{}',
+        cancel     INTEGER DEFAULT 0,
+        owner      TEXT,
+        heartbeat  TEXT,
+        attempts   INTEGER DEFAULT 0,
+        created_at TEXT DEFAULT (datetime('now')),
+        updated_at TEXT DEFAULT (datetime('now'))
+    );
+    CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs(status, created_at);
+"""
+
+# Search index — record ki saari values ek `body` mein; rowid = crm_records.id
+FTS_BODY = ("(SELECT group_concat(value, ' ') FROM json_each("
+            "CASE WHEN json_valid({d}) THEN {d} ELSE '{{}}' END))")
+FTS_SCHEMA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS crm_records_fts USING fts5(
+        body, notes, tags,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );
+    CREATE TRIGGER IF NOT EXISTS crm_records_fts_ai AFTER INSERT ON crm_records BEGIN
+        INSERT INTO crm_records_fts(rowid, body, notes, tags)
+        VALUES (NEW.id, {FTS_BODY.format(d='NEW.data')}, NEW.notes, NEW.tags);
+    END;
+    CREATE TRIGGER IF NOT EXISTS crm_records_fts_au AFTER UPDATE OF data, notes, tags ON crm_records BEGIN
+        UPDATE crm_records_fts SET body = {FTS_BODY.format(d='NEW.data')},
+               notes = NEW.notes, tags = NEW.tags
+        WHERE rowid = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS crm_records_fts_ad AFTER DELETE ON crm_records BEGIN
+        DELETE FROM crm_records_fts WHERE rowid = OLD.id;
+    END;
+"""
+# v6 se body mein crm_cells ki values bhi (cells storage wale projects)
+FTS_BODY_CELLS = ("(SELECT group_concat(value, ' ') FROM ("
+                  "SELECT value FROM json_each(CASE WHEN json_valid({d}) THEN {d} ELSE '{{}}' END) "
+                  "UNION ALL SELECT value FROM crm_cells WHERE record_id = {rid}))")
+# Wahi body par tombstone columns ({keys} json keys, {ids} column ids) ke bina — compaction baaki ho tab
+FTS_LIVE_BODY = ("(SELECT group_concat(value, ' ') FROM ("
+                 "SELECT key, value FROM json_each(CASE WHEN json_valid(r.data) THEN r.data ELSE '{{}}' END) "
+                 "WHERE key NOT IN ({keys}) UNION ALL SELECT column_id, value FROM crm_cells "
+                 "WHERE record_id = r.id AND column_id NOT IN ({ids})))")
+
+def _fts_tokens(text):
+    """unicode61 (remove_diacritics) jaise tokens — lowercase, accents hata ke, '_' bhi separator"""
+    text = ''.join(ch for ch in unicodedata.normalize('NFKD', str(text or '').casefold())
+                   if not unicodedata.combining(ch))
+    return re.findall(r'[^\W_]+', text)
+
+def _live_match(body, notes, tags, terms):
+    """SQL function crm_live_match — _fts_query ke har body / bina column wale phrase (aakhri word
+    prefix) ko live body, notes, tags mein dhundo; sab mile toh 1"""
+    cols = {'body': _fts_tokens(body), 'notes': _fts_tokens(notes), 'tags': _fts_tokens(tags)}
+    def has(toks, words):
+        n = len(words)
+        return any(toks[i:i + n - 1] == words[:-1] and toks[i + n - 1].startswith(words[-1])
+                   for i in range(len(toks) - n + 1))
+    for scope, words in json.loads(terms):
+        words = _fts_tokens(' '.join(words))
+        if words and not any(has(cols[c], words) for c in (['body'] if scope == 'body' else cols)):
+            return 0
+    return 1
+
+_local = threading.local()
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_PRAGMAS['busy_timeout'] / 1000)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    for k, v in SQLITE_PRAGMAS.items():
+        if re.fullmatch(r'-?\w+', str(v)): conn.execute(f"PRAGMA {k} = {v}")
+    conn.create_function('crm_live_match', 4, _live_match, deterministic=True)
     return conn
 
+# Project ke counts — triggers se maintain, /api/stats aur /api/projects O(1).
+# Cascade mein attachment delete hote waqt record pehle hi hat chuka hota hai, isliye
+# record ke attachments uske BEFORE DELETE trigger mein ghatate hain.
+STATS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS project_stats (
+        project_id  INTEGER PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+        records     INTEGER DEFAULT 0,
+        columns     INTEGER DEFAULT 0,
+        attachments INTEGER DEFAULT 0,
+        today_date  TEXT,               -- sabse naye record ka date(created_at)
+        today_count INTEGER DEFAULT 0   -- us din ke records
+    );
+    CREATE TRIGGER IF NOT EXISTS project_stats_proj_ai AFTER INSERT ON projects BEGIN
+        INSERT OR IGNORE INTO project_stats(project_id) VALUES (NEW.id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_stats_rec_ai AFTER INSERT ON crm_records BEGIN
+        UPDATE project_stats SET
+            records = records + 1,
+            today_count = CASE WHEN today_date IS date(NEW.created_at) THEN today_count + 1
+                               WHEN today_date IS NULL OR date(NEW.created_at) > today_date THEN 1
+                               ELSE today_count END,
+            today_date  = CASE WHEN today_date IS NULL OR date(NEW.created_at) > today_date
+                               THEN date(NEW.created_at) ELSE today_date END
+        WHERE project_id = NEW.project_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_stats_rec_bd BEFORE DELETE ON crm_records BEGIN
+        UPDATE project_stats SET
+            records = records - 1,
+            attachments = attachments - (SELECT COUNT(*) FROM attachments WHERE record_id = OLD.id),
+            today_count = today_count - (today_date IS date(OLD.created_at))
+        WHERE project_id = OLD.project_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_stats_col_ai AFTER INSERT ON crm_columns BEGIN
+        UPDATE project_stats SET columns = columns + 1 WHERE project_id = NEW.project_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_stats_col_ad AFTER DELETE ON crm_columns BEGIN
+        UPDATE project_stats SET columns = columns - 1 WHERE project_id = OLD.project_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_stats_att_ai AFTER INSERT ON attachments BEGIN
+        UPDATE project_stats SET attachments = attachments + 1
+        WHERE project_id = (SELECT project_id FROM crm_records WHERE id = NEW.record_id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS project_stats_att_ad AFTER DELETE ON attachments BEGIN
+        UPDATE project_stats SET attachments = attachments - 1
+        WHERE project_id = (SELECT project_id FROM crm_records WHERE id = OLD.record_id);
+    END;
+"""
+
+def get_db():
+    """Har thread ka apna connection, baar baar reuse hota hai (gunicorn sync aur gthread
+    dono mein ek thread ek waqt mein ek hi request chalata hai). Fork ke baad naya banta hai."""
+    c = getattr(_local, 'conn', None)
+    if c is None or _local.key != (os.getpid(), DB_PATH):
+        c = _local.conn = _connect()
+        _local.key = (os.getpid(), DB_PATH)
+    return c
+
+@app.teardown_request
+def _release_db(exc):
+    # Adhoori transaction agle request tak na jaaye
+    c = getattr(_local, 'conn', None)
+    if c is not None and c.in_transaction: c.rollback()
+
+
+def fts_rebuild(conn, body=None):
+    body = body or FTS_BODY_CELLS.format(d='data', rid='crm_records.id')
+    conn.execute("DELETE FROM crm_records_fts")
+    conn.execute(
+        "INSERT INTO crm_records_fts(rowid, body, notes, tags) "
+        f"SELECT id, {body}, notes, tags FROM crm_records")
+    conn.execute("INSERT INTO crm_records_fts(crm_records_fts) VALUES('optimize')")
+    return conn.execute("SELECT COUNT(*) as c FROM crm_records_fts").fetchone()['c']
+
+# Har project ke asli counts (ek hi SELECT) — recompute aur drift check dono ke liye
+STATS_FRESH = """
+    SELECT p.id AS project_id,
+        (SELECT COUNT(*) FROM crm_records r WHERE r.project_id = p.id) AS records,
+        (SELECT COUNT(*) FROM crm_columns c WHERE c.project_id = p.id{live}) AS columns,
+        (SELECT COUNT(*) FROM attachments a JOIN crm_records r ON a.record_id = r.id
+          WHERE r.project_id = p.id) AS attachments,
+        (SELECT MAX(date(r.created_at)) FROM crm_records r
+          WHERE r.project_id = p.id) AS today_date,
+        (SELECT COUNT(*) FROM crm_records r WHERE r.project_id = p.id
+          AND date(r.created_at) = (SELECT MAX(date(created_at)) FROM crm_records
+                                    WHERE project_id = p.id)) AS today_count
+    FROM projects p
+"""
+
+def stats_recompute(conn, pid=None, live=" AND c.deleted_at IS NULL"):
+    """project_stats ko asli tables se dobara bharo → jin projects ke counts galat the unki list.
+    live = columns gine jaane ki shart (v7 se pehle deleted_at nahi tha)"""
+    where, params = (" WHERE p.id = ?", (pid,)) if pid else ("", ())
+    fresh = {r['project_id']: dict(r) for r in
+             conn.execute(STATS_FRESH.format(live=live) + where, params).fetchall()}
+    old = {r['project_id']: dict(r) for r in conn.execute(
+        "SELECT * FROM project_stats" + (" WHERE project_id = ?" if pid else ""), params).fetchall()}
+    drift = [p for p, row in fresh.items() if {k: old.get(p, {}).get(k) for k in row} != row]
+    # upsert — version (v9) kabhi peeche nahi jaana chahiye, warna purane ETag phir match karein
+    conn.executemany(
+        "INSERT INTO project_stats(project_id,records,columns,attachments,today_date,today_count) "
+        "VALUES(:project_id,:records,:columns,:attachments,:today_date,:today_count) "
+        "ON CONFLICT(project_id) DO UPDATE SET records=excluded.records, columns=excluded.columns, "
+        "attachments=excluded.attachments, today_date=excluded.today_date, "
+        "today_count=excluded.today_count", [fresh[p] for p in drift])
+    if drift and 'version' in next(iter(old.values()), {}):
+        conn.execute(f"UPDATE project_stats SET version = version + 1 "
+                     f"WHERE project_id IN ({','.join(map(str, drift))})")
+    return drift
+
+INDEX_SCHEMA = """
+    CREATE INDEX IF NOT EXISTS ix_records_project_created ON crm_records(project_id, created_at);
+    CREATE INDEX IF NOT EXISTS ix_columns_project_order   ON crm_columns(project_id, col_order);
+    CREATE INDEX IF NOT EXISTS ix_attachments_record      ON attachments(record_id);
+"""
+
+# Cells storage — har (record, column) ki value alag row mein; num_value sirf jab value
+# number ho (numeric sort/filter ke liye). projects.storage = 'json' | 'cells'.
+# Cells project mein crm_records.data '{}' rehta hai; FTS body cells se banti hai.
+CELLS_SCHEMA = f"""
+    ALTER TABLE projects ADD COLUMN storage TEXT DEFAULT 'json';
+    CREATE TABLE IF NOT EXISTS crm_cells (
+        record_id INTEGER NOT NULL REFERENCES crm_records(id) ON DELETE CASCADE,
+        column_id INTEGER NOT NULL REFERENCES crm_columns(id) ON DELETE CASCADE,
+        value     TEXT,
+        num_value REAL,
+        PRIMARY KEY (record_id, column_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS ix_cells_column_value ON crm_cells(column_id, value);
+    CREATE INDEX IF NOT EXISTS ix_cells_column_num   ON crm_cells(column_id, num_value)
+        WHERE num_value IS NOT NULL;
+    DROP TRIGGER IF EXISTS crm_records_fts_ai;
+    CREATE TRIGGER crm_records_fts_ai AFTER INSERT ON crm_records BEGIN
+        INSERT INTO crm_records_fts(rowid, body, notes, tags)
+        VALUES (NEW.id, {FTS_BODY_CELLS.format(d='NEW.data', rid='NEW.id')}, NEW.notes, NEW.tags);
+    END;
+    DROP TRIGGER IF EXISTS crm_records_fts_au;
+    CREATE TRIGGER crm_records_fts_au AFTER UPDATE OF data, notes, tags ON crm_records BEGIN
+        UPDATE crm_records_fts SET body = {FTS_BODY_CELLS.format(d='NEW.data', rid='NEW.id')},
+               notes = NEW.notes, tags = NEW.tags
+        WHERE rowid = NEW.id;
+    END;
+"""
+
+# Column delete sirf deleted_at lagata hai (O(1)) — column turant chhup jaata hai, records
+# mein bachi values readers ignore karte hain aur 'compact_columns' job batches mein hatata hai.
+# Stats ke columns tombstone lagte hi ghat jaate hain, asli DELETE par dobara nahi.
+TOMBSTONE_SCHEMA = """
+    ALTER TABLE crm_columns ADD COLUMN deleted_at TEXT;
+    DROP TRIGGER IF EXISTS project_stats_col_ad;
+    CREATE TRIGGER project_stats_col_ad AFTER DELETE ON crm_columns WHEN OLD.deleted_at IS NULL BEGIN
+        UPDATE project_stats SET columns = columns - 1 WHERE project_id = OLD.project_id;
+    END;
+    CREATE TRIGGER project_stats_col_tomb AFTER UPDATE OF deleted_at ON crm_columns
+    WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL BEGIN
+        UPDATE project_stats SET columns = columns - 1 WHERE project_id = NEW.project_id;
+    END;
+"""
+
+# indexed = 1 → JSON project mein ix_col_<id> partial expression index (_col_key par),
+# 'column_indexes' job banata / hatata hai
+COLUMN_INDEX_SCHEMA = """
+    ALTER TABLE crm_columns ADD COLUMN indexed INTEGER DEFAULT 0;
+"""
+
+# project_stats.version — project ka koi bhi write (record, cell sync, column, attachment,
+# project row) isse badhata hai; GET endpoints ka ETag isi se. Stats wale triggers hi bump
+# karte hain taaki import mein har row par ek hi UPDATE rahe.
+VERSION_SCHEMA = """
+    ALTER TABLE project_stats ADD COLUMN version INTEGER DEFAULT 0;
+    DROP TRIGGER IF EXISTS project_stats_rec_ai;
+    CREATE TRIGGER project_stats_rec_ai AFTER INSERT ON crm_records BEGIN
+        UPDATE project_stats SET
+            records = records + 1, version = version + 1,
+            today_count = CASE WHEN today_date IS date(NEW.created_at) THEN today_count + 1
+                               WHEN today_date IS NULL OR date(NEW.created_at) > today_date THEN 1
+                               ELSE today_count END,
+            today_date  = CASE WHEN today_date IS NULL OR date(NEW.created_at) > today_date
+                               THEN date(NEW.created_at) ELSE today_date END
+        WHERE project_id = NEW.project_id;
+    END;
+    DROP TRIGGER IF EXISTS project_stats_rec_bd;
+    CREATE TRIGGER project_stats_rec_bd BEFORE DELETE ON crm_records BEGIN
+        UPDATE project_stats SET
+            records = records - 1, version = version + 1,
+            attachments = attachments - (SELECT COUNT(*) FROM attachments WHERE record_id = OLD.id),
+            today_count = today_count - (today_date IS date(OLD.created_at))
+        WHERE project_id = OLD.project_id;
+    END;
+    CREATE TRIGGER project_stats_rec_au AFTER UPDATE ON crm_records BEGIN
+        UPDATE project_stats SET version = version + 1 WHERE project_id = NEW.project_id;
+    END;
+    DROP TRIGGER IF EXISTS project_stats_col_ai;
+    CREATE TRIGGER project_stats_col_ai AFTER INSERT ON crm_columns BEGIN
+        UPDATE project_stats SET columns = columns + 1, version = version + 1
+        WHERE project_id = NEW.project_id;
+    END;
+    DROP TRIGGER IF EXISTS project_stats_col_ad;
+    CREATE TRIGGER project_stats_col_ad AFTER DELETE ON crm_columns BEGIN
+        UPDATE project_stats SET columns = columns - (OLD.deleted_at IS NULL), version = version + 1
+        WHERE project_id = OLD.project_id;
+    END;
+    CREATE TRIGGER project_stats_col_au AFTER UPDATE ON crm_columns BEGIN
+        UPDATE project_stats SET version = version + 1 WHERE project_id = NEW.project_id;
+    END;
+    DROP TRIGGER IF EXISTS project_stats_att_ai;
+    CREATE TRIGGER project_stats_att_ai AFTER INSERT ON attachments BEGIN
+        UPDATE project_stats SET attachments = attachments + 1, version = version + 1
+        WHERE project_id = (SELECT project_id FROM crm_records WHERE id = NEW.record_id);
+    END;
+    DROP TRIGGER IF EXISTS project_stats_att_ad;
+    CREATE TRIGGER project_stats_att_ad AFTER DELETE ON attachments BEGIN
+        UPDATE project_stats SET attachments = attachments - 1, version = version + 1
+        WHERE project_id = (SELECT project_id FROM crm_records WHERE id = OLD.record_id);
+    END;
+    CREATE TRIGGER project_stats_proj_au AFTER UPDATE ON projects BEGIN
+        UPDATE project_stats SET version = version + 1 WHERE project_id = NEW.id;
+    END;
+"""
+
+# Ek hi row ka counter — projects / crm_columns ka koi bhi change (aur column index create /
+# drop) ise badhata hai. Har worker ka META CACHE isi se jaanta hai ki uski copy purani hai.
+META_VERSION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        n  INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO meta_version(id, n) VALUES (1, 0);
+    CREATE TRIGGER meta_version_proj_ai AFTER INSERT ON projects BEGIN UPDATE meta_version SET n = n + 1; END;
+    CREATE TRIGGER meta_version_proj_au AFTER UPDATE ON projects BEGIN UPDATE meta_version SET n = n + 1; END;
+    CREATE TRIGGER meta_version_proj_ad AFTER DELETE ON projects BEGIN UPDATE meta_version SET n = n + 1; END;
+    CREATE TRIGGER meta_version_col_ai AFTER INSERT ON crm_columns BEGIN UPDATE meta_version SET n = n + 1; END;
+    CREATE TRIGGER meta_version_col_au AFTER UPDATE ON crm_columns BEGIN UPDATE meta_version SET n = n + 1; END;
+    CREATE TRIGGER meta_version_col_ad AFTER DELETE ON crm_columns BEGIN UPDATE meta_version SET n = n + 1; END;
+"""
+
+# Chunked upload: session (init) → har chunk PUT (disk par seedha offset par, sha256 check)
+# → finalize par attachments mein row. Jo chunks aa chuke unki list resume ke liye.
+UPLOAD_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS upload_sessions (
+        id            TEXT PRIMARY KEY,
+        record_id     INTEGER NOT NULL REFERENCES crm_records(id) ON DELETE CASCADE,
+        original_name TEXT NOT NULL,
+        file_size     INTEGER NOT NULL,
+        chunk_size    INTEGER NOT NULL,
+        sha256        TEXT,                 -- poori file ka, client ne diya ho toh finalize par check
+        created_at    TEXT DEFAULT (datetime('now')),
+        updated_at    TEXT DEFAULT (datetime('now'))
+    );
+    CREATE INDEX IF NOT EXISTS ix_upload_sessions_updated ON upload_sessions(updated_at);
+    CREATE INDEX IF NOT EXISTS ix_upload_sessions_record ON upload_sessions(record_id);   -- record delete cascade
+    CREATE TABLE IF NOT EXISTS upload_chunks (
+        upload_id TEXT NOT NULL REFERENCES upload_sessions(id) ON DELETE CASCADE,
+        idx       INTEGER NOT NULL,
+        size      INTEGER NOT NULL,
+        sha256    TEXT NOT NULL,
+        PRIMARY KEY (upload_id, idx)
+    ) WITHOUT ROWID;
+"""
+
+# Attachment files content-addressed: uploads/<sha[:2]>/<sha[2:4]>/<sha256>.<ext>. Ek file
+# kitne attachments rows mein hai woh blobs.refs (triggers se). refs 0 → release_blobs (file_trash se unlink).
+# Purani uuid naam wali files ko 'dedupe_uploads' job (migration ke saath queue) badalta hai.
+BLOB_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS blobs (
+        path TEXT PRIMARY KEY,              -- UPLOAD_FOLDER ke andar
+        size INTEGER NOT NULL DEFAULT 0,
+        refs INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS ix_blobs_unused ON blobs(path) WHERE refs <= 0;
+    CREATE INDEX IF NOT EXISTS ix_attachments_filename ON attachments(filename);
+    INSERT INTO blobs(path, size, refs)
+        SELECT filename, MAX(file_size), COUNT(*) FROM attachments GROUP BY filename;
+    CREATE TRIGGER blobs_att_ai AFTER INSERT ON attachments BEGIN
+        INSERT INTO blobs(path, size, refs) VALUES (NEW.filename, NEW.file_size, 1)
+        ON CONFLICT(path) DO UPDATE SET refs = refs + 1;
+    END;
+    CREATE TRIGGER blobs_att_ad AFTER DELETE ON attachments BEGIN
+        UPDATE blobs SET refs = refs - 1 WHERE path = OLD.filename;
+    END;
+    CREATE TRIGGER blobs_att_au AFTER UPDATE OF filename ON attachments BEGIN
+        UPDATE blobs SET refs = refs - 1 WHERE path = OLD.filename;
+        INSERT INTO blobs(path, size, refs) VALUES (NEW.filename, NEW.file_size, 1)
+        ON CONFLICT(path) DO UPDATE SET refs = refs + 1;
+    END;
+    -- filename badle (dedupe_uploads uuid → sha path) toh project ka version — warna purane ETag
+    -- par 304 aur client ke paas purana /uploads/<uuid> URL rehta hai
+    CREATE TRIGGER project_stats_att_au AFTER UPDATE ON attachments BEGIN
+        UPDATE project_stats SET version = version + 1 WHERE project_id IN (
+            SELECT project_id FROM crm_records WHERE id IN (OLD.record_id, NEW.record_id));
+    END;
+    INSERT INTO jobs(id, kind) SELECT lower(hex(randomblob(16))), 'dedupe_uploads'
+        WHERE EXISTS (SELECT 1 FROM attachments);
+"""
+
+# Har blob ka thumbnail (image / pdf ka pehla page / video ka frame) — blobs.thumb:
+# NULL = abhi bana nahi, 'ok' = .thumbs mein hai, 'none' = ban nahi sakta (type / tool nahi).
+THUMB_SCHEMA = """
+    ALTER TABLE blobs ADD COLUMN thumb TEXT;
+    CREATE INDEX IF NOT EXISTS ix_blobs_thumb_todo ON blobs(path) WHERE thumb IS NULL;
+    -- thumb badle toh us blob ko use karne wale har project ka version — warna records page /
+    -- record ka ETag 304 deta rehta hai purane thumb_url: null ke saath
+    CREATE TRIGGER project_stats_blob_thumb AFTER UPDATE OF thumb ON blobs
+    WHEN NEW.thumb IS NOT OLD.thumb BEGIN
+        UPDATE project_stats SET version = version + 1 WHERE project_id IN (
+            SELECT r.project_id FROM attachments a JOIN crm_records r ON r.id = a.record_id
+            WHERE a.filename = NEW.path);
+    END;
+    INSERT INTO jobs(id, kind) SELECT lower(hex(randomblob(16))), 'thumbnails'
+        WHERE EXISTS (SELECT 1 FROM blobs);
+"""
+
+# Disk se hatne wali files ki queue. Blob row hatate hi path yahan (trigger) aur 'purge_files'
+# job batches mein unlink karta hai — request ka transaction file system ka intezaar nahi karta.
+# Wahi content phir aa jaye (blob insert) toh path queue se nikal jaata hai.
+TRASH_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS file_trash (
+        id       INTEGER PRIMARY KEY,
+        path     TEXT NOT NULL UNIQUE,          -- UPLOAD_FOLDER ke andar
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error    TEXT
+    );
+    CREATE TRIGGER IF NOT EXISTS trash_blobs_ad AFTER DELETE ON blobs BEGIN
+        INSERT OR IGNORE INTO file_trash(path) VALUES (OLD.path);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trash_blobs_ai AFTER INSERT ON blobs BEGIN
+        DELETE FROM file_trash WHERE path = NEW.path;
+    END;
+"""
+
+# ─────────────── MIGRATIONS ───────────────
+# (version, naam, SQL, python step) — PRAGMA user_version batata hai kahan tak lag chuka.
+# Naye schema changes hamesha list ke END mein naye version ke saath; purane kabhi mat badlo.
+# v1–v4 IF NOT EXISTS hain taaki migrations se pehle bane DBs bhi adopt ho jaayein.
+MIGRATIONS = [
+    (1, 'core tables',      CORE_SCHEMA,  None),
+    (2, 'search index',     FTS_SCHEMA,   lambda conn: fts_rebuild(conn, FTS_BODY.format(d='data'))),
+    (3, 'jobs',             JOBS_SCHEMA,  None),
+    (4, 'project stats',    STATS_SCHEMA, lambda conn: stats_recompute(conn, live='')),
+    (5, 'core indexes',     INDEX_SCHEMA, None),
+    (6, 'cell storage',     CELLS_SCHEMA, None),
+    (7, 'column tombstones', TOMBSTONE_SCHEMA, None),
+    (8, 'indexed columns',  COLUMN_INDEX_SCHEMA, None),
+    (9, 'project versions', VERSION_SCHEMA, None),
+    (10, 'meta version',    META_VERSION_SCHEMA, None),
+    (11, 'upload sessions', UPLOAD_SCHEMA, None),
+    (12, 'attachment blobs', BLOB_SCHEMA, None),
+    (13, 'thumbnails',      THUMB_SCHEMA, None),
+    (14, 'file trash',      TRASH_SCHEMA, None),
+]
+
+def _statements(sql):
+    buf = ''
+    for line in sql.splitlines(True):
+        buf += line
+        if sqlite3.complete_statement(buf):   # trigger ke BEGIN ... END; ko bhi samajhta hai
+            yield buf; buf = ''
+    if buf.strip(): yield buf
+
+def migrate(conn):
+    """Baaki migrations ek-ek transaction mein lagao → applied [(version, naam)]"""
+    applied = []
+    for version, name, sql, step in MIGRATIONS:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version: continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                conn.rollback(); continue          # dusre worker ne abhi abhi laga diya
+            for stmt in _statements(sql): conn.execute(stmt)
+            if step: step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except:
+            conn.rollback(); raise
+        applied.append((version, name))
+    return applied
+
 def init_db():
     with get_db() as conn:
-        conn.executescript("""
-            CREATE TABLE IF NOT EXISTS projects (
-                id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                name       TEXT NOT NULL,
-                color      TEXT DEFAULT '#00c8ff',
-                created_at TEXT DEFAULT (datetime('now'))
-            );
-            CREATE TABLE IF NOT EXISTS crm_columns (
-                id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
-                name       TEXT NOT NULL,
-                col_type   TEXT DEFAULT 'text',
-                col_order  INTEGER DEFAULT 0
-            );
-            CREATE TABLE IF NOT EXISTS crm_records (
-                id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
-                data       TEXT DEFAULT '{}',
-                tags       TEXT DEFAULT '',
-                notes      TEXT DEFAULT '',
-                created_at TEXT DEFAULT (datetime('now')),
-                updated_at TEXT DEFAULT (datetime('now'))
-            );
-            CREATE TABLE IF NOT EXISTS attachments (
-                id            INTEGER PRIMARY KEY AUTOINCREMENT,
-                record_id     INTEGER NOT NULL REFERENCES crm_records(id) ON DELETE CASCADE,
-                filename      TEXT NOT NULL,
-                original_name TEXT NOT NULL,
-                file_type     TEXT DEFAULT 'file',
-                file_size     INTEGER DEFAULT 0,
-                created_at    TEXT DEFAULT (datetime('now'))
-            );
-        """)
+        migrate(conn)
         cnt = conn.execute("SELECT COUNT(*) as c FROM projects").fetchone()['c']
         if cnt == 0:
             c = conn.execute("INSERT INTO projects(name,color) VALUES(?,?)",
@@ -89,6 +606,128 @@ def init_db():
 
 init_db()
 
+@app.cli.command('db-upgrade')
+def db_upgrade_cmd():
+    """Pending schema migrations lagao."""
+    with get_db() as conn:
+        applied = migrate(conn)
+        v = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, name in applied: print(f"  applied {version}: {name}")
+    print(f"schema version {v}")
+
+@app.cli.command('stats-recompute')
+@click.option('--project', type=int, default=None, help='Sirf ek project')
+def stats_recompute_cmd(project):
+    """project_stats ko repair karo — records/columns/attachments/today dobara gino."""
+    with get_db() as conn:
+        drift = stats_recompute(conn, project)
+    print(f"{len(drift)} project(s) repaired" + (f": {drift}" if drift else ""))
+
+@app.cli.command('convert-storage')
+@click.argument('storage', type=click.Choice(STORAGES))
+@click.option('--project', type=int, default=None, help='Sirf ek project (default: sab)')
+def convert_storage_cmd(storage, project):
+    """Projects ka record data json ↔ cells storage mein convert karo."""
+    with get_db() as conn:
+        pids = [project] if project else [r['id'] for r in conn.execute(
+            "SELECT id FROM projects WHERE COALESCE(storage,'json') != ?", (storage,)).fetchall()]
+        for pid in pids:
+            n = convert_storage(conn, pid, storage)
+            print(f"  project {pid}: {n} records → {storage}")
+        sync_column_indexes(conn)
+    print(f"{len(pids)} project(s) converted")
+
+@app.cli.command('compact-columns')
+@click.option('--project', type=int, default=None, help='Sirf ek project (default: sab)')
+def compact_columns_cmd(project):
+    """Delete kiye gaye columns ki bachi values records se abhi hatao."""
+    with get_db() as conn:
+        pids = [project] if project else [r['project_id'] for r in conn.execute(
+            "SELECT DISTINCT project_id FROM crm_columns WHERE deleted_at IS NOT NULL").fetchall()]
+        for pid in pids:
+            print(f"  project {pid}: {compact_columns(conn, pid)} records checked")
+        sync_column_indexes(conn)
+    print(f"{len(pids)} project(s) compacted")
+
+@app.cli.command('column-indexes')
+def column_indexes_cmd():
+    """Indexed columns ke expression indexes abhi banao / hatao."""
+    with get_db() as conn:
+        made, dropped = sync_column_indexes(conn)
+    for n in made: print(f"  created {n}")
+    for n in dropped: print(f"  dropped {n}")
+    print(f"{len(made)} created, {len(dropped)} dropped")
+
+@app.cli.command('fts-rebuild')
+def fts_rebuild_cmd():
+    """Search index (crm_records_fts) ko crm_records se dobara banao."""
+    with get_db() as conn:
+        n = fts_rebuild(conn)
+    print(f"{n} records indexed")
+
+
+# ─────────────── META CACHE ───────────────
+# Project row, column list aur bane hue column indexes har request mein lagte hain — process
+# mein chhota LRU. Har entry meta_version.n ke saath rakhi jaati hai; DB ka n badla (kisi bhi
+# worker ne project / column badla) toh entry miss. Request mein n ek hi baar padha jaata hai.
+class MetaCache:
+    def __init__(self, size):
+        self.size, self.data, self.lock = size, OrderedDict(), threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, stamp, load):
+        with self.lock:
+            hit = self.data.get(key)
+            if hit is not None and hit[0] == stamp:
+                self.data.move_to_end(key); self.hits += 1
+                return hit[1]
+            self.misses += 1
+        val = load()
+        with self.lock:
+            self.data[key] = (stamp, val); self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False); self.evictions += 1
+        return val
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'size': len(self.data), 'max_size': self.size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': round(self.hits / total, 3) if total else None}
+
+_meta = MetaCache(META_CACHE_SIZE)
+
+def _meta_stamp(conn):
+    if not has_request_context():   # jobs / CLI — har baar DB se
+        return conn.execute("SELECT n FROM meta_version WHERE id = 1").fetchone()[0]
+    if 'meta_stamp' not in g:
+        g.meta_stamp = conn.execute("SELECT n FROM meta_version WHERE id = 1").fetchone()[0]
+    return g.meta_stamp
+
+def meta_changed():
+    """Is request ne project / column badla — agla lookup stamp DB se dobara padhe"""
+    if has_request_context(): g.pop('meta_stamp', None)
+
+def project_meta(conn, pid):
+    """projects row (dict) ya None — cached, badlo mat"""
+    def load():
+        r = conn.execute("SELECT * FROM projects WHERE id=?", (pid,)).fetchone()
+        return dict(r) if r else None
+    return _meta.get(('project', pid), _meta_stamp(conn), load)
+
+def project_columns(conn, pid):
+    """Project ke saare columns (tombstone wale bhi, deleted_at ke saath) col_order mein —
+    cached tuple of dicts, badlo mat"""
+    return _meta.get(('columns', pid), _meta_stamp(conn), lambda: tuple(dict(r) for r in conn.execute(
+        "SELECT id, project_id, name, col_type, col_order, indexed, deleted_at FROM crm_columns "
+        "WHERE project_id=? ORDER BY col_order", (pid,)).fetchall()))
+
+def _column_indexes(conn):
+    """Bane hue ix_col_<id> indexes ke naam"""
+    return _meta.get(('indexes',), _meta_stamp(conn), lambda: frozenset(r['name'] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND name GLOB 'ix_col_[0-9]*'").fetchall()))
+
 
 # ─────────────── UTILS ───────────────
 def _human_size(n):
@@ -108,22 +747,44 @@ def _file_type(fn):
 def allowed(fn):
     return '.' in fn and fn.rsplit('.',1)[1].lower() in ALLOWED
 
+_DAY = re.compile(r'\d{4}-\d\d-\d\d(?:[ T]|$)')
+
 def fmt_date(s):
     if not s: return ''
+    if _DAY.match(s): return _fmt_day(s[:10])   # output sirf date par depend karta hai
     try:    return datetime.fromisoformat(s.split('.')[0]).strftime('%d %b %Y')
     except: return s
 
+@functools.lru_cache(maxsize=4096)
+def _fmt_day(d):
+    try:    return date.fromisoformat(d).strftime('%d %b %Y')
+    except: return d
+
+if orjson:
+    _loads = orjson.loads
+    def _dumps(o): return orjson.dumps(o).decode()
+else:
+    _loads = json.loads
+    def _dumps(o): return json.dumps(o, ensure_ascii=False, separators=(',', ':'))
+
 def att_to_dict(a):
+    """a = attachments row; thumb_url sirf ATT_SELECT wali row (blobs.thumb ke saath) mein"""
     return {
         'id': a['id'], 'filename': a['filename'],
         'original_name': a['original_name'], 'file_type': a['file_type'],
         'file_size_str': _human_size(a['file_size']),
-        'url': url_for('serve_upload', filename=a['filename'])
+        'url': url_for('serve_upload', filename=a['filename']),
+        'thumb_url': url_for('serve_thumb', filename=thumb_name(a['filename']))
+                     if 'thumb' in a.keys() and a['thumb'] == 'ok' else None
     }
 
-def record_to_dict(row, atts):
-    try:    data = json.loads(row['data'])
-    except: data = {}
+# Attachments + unke blob ki thumbnail state
+ATT_SELECT = "SELECT a.*, b.thumb FROM attachments a LEFT JOIN blobs b ON b.path = a.filename "
+
+def record_to_dict(row, atts, data=None):
+    if data is None:
+        try:    data = json.loads(row['data'])
+        except: data = {}
     return {
         'id': row['id'], 'data': data,
         'tags': row['tags'] or '', 'notes': row['notes'] or '',
@@ -131,33 +792,761 @@ def record_to_dict(row, atts):
         'attachments': atts
     }
 
+# Records page ki columns — data_ok: stored text seedha response mein ja sakta hai (record_json)
+PAGE_COLS = "r.*, json_valid(r.data) AS data_ok"
+
+def record_json(row, atts, data=None):
+    """record_to_dict jaisa hi object, seedha JSON text mein. data None ho toh stored
+    data text as-is jaata hai — decode / re-encode nahi (JSON storage, koi filter nahi)"""
+    return '{"id":%d,"data":%s,"tags":%s,"notes":%s,"created_at":%s,"attachments":%s}' % (
+        row['id'], (row['data'] or '{}') if data is None else _dumps(data),
+        _dumps(row['tags'] or ''), _dumps(row['notes'] or ''),
+        _dumps(fmt_date(row['created_at'])), _dumps(atts))
+
+def records_columns(rows, atts, data, fields):
+    """Page ka column-major roop — har key ek baar: {fields: [col_id..], id: [..], tags: [..],
+    notes: [..], created_at: [..], att_count: [..], data: [fields[0] ki values, ..]}.
+    Value na ho toh null. Jis column mein values dohrayi jaati hain (client, city, status..)
+    woh {dict: [unique values], codes: [har row ka index]} banta hai. Grid ko attachments ki
+    sirf ginti chahiye — poori list record GET se."""
+    keys = [str(f) for f in fields]
+    pos, n = {k: j for j, k in enumerate(keys)}, len(rows)
+    cols = [[None] * n for _ in keys]
+    for i, r in enumerate(rows):   # row-wise bharo — har dict ek hi baar khulta hai
+        for k, v in data.get(r['id'], {}).items():
+            j = pos.get(k)
+            if j is not None: cols[j][i] = v
+    return {'fields': keys, 'id': [r['id'] for r in rows],
+            'tags': [r['tags'] or '' for r in rows], 'notes': [r['notes'] or '' for r in rows],
+            'created_at': [fmt_date(r['created_at']) for r in rows],
+            'att_count': [len(atts.get(r['id'], ())) for r in rows],
+            'data': [_dict_encode(c) for c in cols]}
+
+def _dict_encode(values):
+    """Values aadhi se kam unique hon toh {dict, codes}, warna list as-is"""
+    try:
+        if len(set(values[:64])) > 48: return values   # shuru mein hi zyada unique — skip
+        codes = {}
+        for v in values:
+            if v not in codes:
+                codes[v] = len(codes)
+                if 2 * len(codes) > len(values): return values
+    except TypeError:   # list / object value — hash nahi hota
+        return values
+    return {'dict': list(codes), 'codes': [codes[v] for v in values]}
+
+def json_response(meta, **raw):
+    """meta dict + pehle se encoded JSON text wali keys → application/json Response"""
+    body = _dumps(meta)
+    if raw:
+        body = body[:-1] + (',' if meta else '') + ','.join(f'"{k}":{v}' for k, v in raw.items()) + '}'
+    return app.response_class(body, mimetype='application/json')
+
+_Q_TERM = re.compile(r'(?:("[^"]+"|[^\s:"]+):)?("[^"]*"|[^\s"]+)')
+
+def _fts_query(conn, pid, q, storage='json'):
+    """Search text → (MATCH string, extra WHERE list, params). Har word prefix se match hota hai;
+    `notes:x`, `tags:x` ya `"Column Name":x` likho toh sirf us column mein dhundo."""
+    names, terms, extra, params, live = None, [], [], [], []
+    for col, term in _Q_TERM.findall(q):
+        col, term = col.strip('"').strip(), term.strip('"')
+        words = re.findall(r'\w+', term)
+        if not words: continue
+        phrase = '"' + ' '.join(words) + '"*'
+        if col in ('notes', 'tags'):
+            terms.append(f"{col} : {phrase}"); continue
+        if col:
+            if names is None:
+                names = {c['name'].strip().lower(): c['id'] for c in project_columns(conn, pid)
+                         if not c['deleted_at']}
+            cid = names.get(col)
+            if cid is None:   # aisa column nahi — poora text hi search karo
+                words = re.findall(r'\w+', col) + words
+                phrase = '"' + ' '.join(words) + '"*'
+            else:
+                phrase = f"body : {phrase}"
+                like = '%' + re.sub(r'([%_\\])', r'\\\1', term) + '%'
+                cond = f"""json_extract(r.data, '$."{cid}"') LIKE ? ESCAPE '\\'"""
+                if storage == 'cells':
+                    cond = (f"({cond} OR EXISTS (SELECT 1 FROM crm_cells c WHERE c.record_id = r.id "
+                            f"AND c.column_id = {cid} AND c.value LIKE ? ESCAPE '\\'))")
+                    params.append(like)
+                extra.append(cond)
+                params.append(like)
+        live.append(['body' if col and cid is not None else 'any', words])
+        terms.append(phrase)
+    # Column delete sirf tombstone hai — FTS body mein uski values compact_columns tak rehti hain,
+    # isliye tab tak hits ko live text par dobara parakho
+    dead = _dead_columns(conn, pid) if live else ()
+    if dead:
+        extra.append(f"crm_live_match({FTS_LIVE_BODY}, r.notes, r.tags, ?)".format(
+            keys=','.join(f"'{d}'" for d in sorted(dead)), ids=','.join(sorted(dead))))
+        params.append(json.dumps(live))
+    return ' AND '.join(terms), extra, params
+
+def _enc_cursor(vals):
+    return base64.urlsafe_b64encode(json.dumps(vals).encode()).decode().rstrip('=')
+
+def _dec_cursor(s):
+    """next_cursor → [sort key, .., id]. Sirf scalar values (SQLite bind hone layak) aur aakhri
+    int id — baaki sab ValueError (400), query tak nahi pahunchta"""
+    vals = json.loads(base64.urlsafe_b64decode(s + '=' * (-len(s) % 4)))
+    if not isinstance(vals, list) or not vals or type(vals[-1]) is not int or \
+       any(v is not None and type(v) not in (str, int, float) for v in vals):
+        raise ValueError('cursor')
+    return vals
+
+def _keyset(order, vals):
+    """order = [(expr, 'ASC'|'DESC'), ...] → WHERE clause jo last row ke BAAD wali rows de"""
+    if len(vals) != len(order): raise ValueError('cursor')
+    dirs = {d for _, d in order}
+    if len(dirs) == 1 and len(order) == 2 and '(' in order[0][0]:
+        # Expression key (column sort) — row-value par SQLite expression index seek nahi karta,
+        # `e >= ? AND (e > ? OR id > ?)` par karta hai
+        (e, d), (e2, _) = order
+        op = '<' if d == 'DESC' else '>'
+        return f"({e} {op}= ? AND ({e} {op} ? OR {e2} {op} ?))", [vals[0], vals[0], vals[1]]
+    if len(dirs) == 1:   # row-value comparison — index seek ho jaata hai
+        op = '<' if dirs.pop() == 'DESC' else '>'
+        return f"({', '.join(e for e, _ in order)}) {op} ({', '.join('?' * len(order))})", list(vals)
+    ors, params = [], []
+    for i, (expr, d) in enumerate(order):
+        ors.append('(' + ' AND '.join([f"{e} = ?" for e, _ in order[:i]] +
+                                      [f"{expr} {'<' if d == 'DESC' else '>'} ?"]) + ')')
+        params += list(vals[:i]) + [vals[i]]
+    return '(' + ' OR '.join(ors) + ')', params
+
+REC_FILTER_OPS = ('eq', 'contains', 'gt', 'gte', 'lt', 'lte', 'empty', 'notempty')
+_CMP = {'eq': '=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+def _live_columns(conn, pid):
+    """{col_id (str): col_type} — tombstone wale nahi"""
+    return {str(c['id']): c['col_type'] for c in project_columns(conn, pid) if not c['deleted_at']}
+
+def _col_key(cid, col_type, storage='json', alias='r.'):
+    """Column ki sort/filter key SQL. Khaali = '' (NULL nahi, taaki keyset cursor chale);
+    number column REAL mein compare hota hai ('' aur non-number saare numbers ke baad),
+    text case-insensitive (NOCASE)."""
+    if storage == 'cells':
+        v = 'num_value' if col_type == 'number' else 'value'
+        k = (f"COALESCE((SELECT {v} FROM crm_cells WHERE record_id = {alias}id "
+             f"AND column_id = {int(cid)}), '')")
+    else:
+        v = f"""json_extract({alias}data, '$."{int(cid)}"')"""
+        k = f"COALESCE({NUM_EXPR.format(v=v)}, '')" if col_type == 'number' else f"COALESCE({v}, '')"
+    return k if col_type == 'number' else k + " COLLATE NOCASE"
+
+def _record_filters(cols, specs, storage='json'):
+    """['<col_id>:<op>[:<value>]', ...] → (WHERE parts, params), sab AND. ValueError agar galat.
+    JSON projects mein _col_key par compare (expression index lag sakta hai), cells projects
+    mein crm_cells ke (column_id, value|num_value) index se record ids."""
+    where, params = [], []
+    for spec in specs:
+        cid, _, rest = spec.partition(':')
+        op, _, val = rest.partition(':')
+        if cid not in cols or op not in REC_FILTER_OPS:
+            raise ValueError(f'Invalid filter: {spec}')
+        num = cols[cid] == 'number' and op in _CMP
+        if num:
+            try: val = float(val)
+            except ValueError: raise ValueError(f'Invalid number in filter: {spec}')
+        like = '%' + re.sub(r'([%_\\])', r'\\\1', str(val)) + '%'
+        if storage == 'cells':
+            sub = f"(SELECT record_id FROM crm_cells WHERE column_id = {int(cid)}"
+            if op == 'empty':      where.append(f"r.id NOT IN {sub} AND value <> '')")   # '' / null cell bhi khaali
+            elif op == 'notempty': where.append(f"r.id IN {sub} AND value <> '')")
+            elif op == 'contains':
+                where.append(f"r.id IN {sub} AND value LIKE ? ESCAPE '\\')"); params.append(like)
+            else:
+                where.append(f"r.id IN {sub} AND " + (f"num_value {_CMP[op]} ?)" if num else
+                             f"value {_CMP[op]} ? COLLATE NOCASE AND value <> '')"))
+                params.append(val)
+            continue
+        k = _col_key(cid, cols[cid])
+        if op in ('empty', 'notempty'):   # raw value — number column mein 'abc' bhi khaali nahi
+            where.append(f"{_col_key(cid, 'text')} {'=' if op == 'empty' else '<>'} ''")
+        elif op == 'contains':
+            where.append(f"""json_extract(r.data, '$."{int(cid)}"') LIKE ? ESCAPE '\\'""")
+            params.append(like)
+        elif op == 'eq':
+            where.append(f"{k} = ?"); params.append(val)
+        else:   # range — khaali values bahar
+            where.append(f"{k} {_CMP[op]} ? AND {k} <> ''"); params.append(val)
+    return where, params
+
+def _index_hint(conn, cids):
+    """cids (pehle sort column, phir eq/range filter columns) mein se pehla jiska ix_col index
+    bana hua hai → 'INDEXED BY ...'. Bina ANALYZE stats ke planner khud created_at index chunta."""
+    names = [f'ix_col_{int(c)}' for c in cids]
+    have = _column_indexes(conn) if names else ()
+    return next((f"INDEXED BY {n} " for n in names if n in have), '')
+
+def _unhinted_retry(hint, run):
+    """run(hint) → result. Hint ka index padhne ke baad drop ho sakta hai (sync_column_indexes) —
+    INDEXED BY tab 'no such index' deta hai, toh run('') se bina hint dobara."""
+    try: return run(hint)
+    except sqlite3.OperationalError as e:
+        if not hint or 'no such index' not in str(e): raise
+        return run('')
+
+def _record_sort(cols, spec):
+    """'<col_id>:asc|desc' ya 'created_at:asc|desc' → (col_id ya None, 'ASC'|'DESC')"""
+    col, _, d = spec.partition(':')
+    d = (d or 'asc').upper()
+    if d not in ('ASC', 'DESC') or (col != 'created_at' and col not in cols):
+        raise ValueError(f'Invalid sort: {spec}')
+    return (None if col == 'created_at' else col), d
+
+def _count_records(conn, base, params, mode):
+    """(total, exact) — mode: exact | estimate (COUNT_CAP tak) | none"""
+    if mode == 'none': return None, False
+    if mode == 'estimate':
+        n = conn.execute(f"SELECT COUNT(*) as c FROM (SELECT 1 {base} LIMIT ?)",
+                         params + [COUNT_CAP + 1]).fetchone()['c']
+        return min(n, COUNT_CAP), n <= COUNT_CAP
+    return conn.execute(f"SELECT COUNT(*) as c {base}", params).fetchone()['c'], True
+
+def _project_version(conn, pid):
+    """project_stats.version — project ke har write par badhta hai (triggers)"""
+    row = conn.execute("SELECT version FROM project_stats WHERE project_id=?", (pid,)).fetchone()
+    return row['version'] if row else 0
+
+def _conditional(tag, build):
+    """ETag wala GET: client ka If-None-Match same ho toh body banaye bina 304, warna build().
+    Tag hamesha data padhne se PEHLE lo — beech mein write ho toh agli baar naya tag milega.
+    no-cache = browser cache rakhe par har baar revalidate kare."""
+    if request.if_none_match.contains_weak(tag):   # gzip wale response ka tag weak ho jaata hai
+        resp = app.response_class(status=304)
+    else:
+        resp = app.make_response(build())
+        if resp.status_code != 200: return resp
+    resp.set_etag(tag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+def _atts_by_record(conn, rids):
+    """Poore page ke attachments ek grouped query mein (N+1 nahi) → {record_id: [att, ...]}"""
+    out = {}
+    for i in range(0, len(rids), 900):   # SQLite bound-parameter limit
+        chunk = rids[i:i+900]
+        for a in conn.execute(
+                ATT_SELECT + f"WHERE a.record_id IN ({','.join('?' * len(chunk))}) "
+                "ORDER BY a.record_id, a.id", chunk).fetchall():
+            out.setdefault(a['record_id'], []).append(att_to_dict(a))
+    return out
+
 def get_record_with_atts(conn, rid):
     row = conn.execute("SELECT * FROM crm_records WHERE id=?", (rid,)).fetchone()
     if not row: return None
     atts = [att_to_dict(a) for a in
-            conn.execute("SELECT * FROM attachments WHERE record_id=? ORDER BY id", (rid,)).fetchall()]
-    return record_to_dict(row, atts)
+            conn.execute(ATT_SELECT + "WHERE a.record_id=? ORDER BY a.id", (rid,)).fetchall()]
+    pid = row['project_id']
+    data = load_data(conn, [row], project_storage(conn, pid), dead=_dead_columns(conn, pid))
+    return record_to_dict(row, atts, data[rid])
+
+
+# ─────────────── STORAGE ───────────────
+# 'json'  — record ki saari values crm_records.data mein ek JSON object.
+# 'cells' — har value crm_cells ki alag row; page ke liye sirf zaroori columns padhte hain,
+#           filter/sort index se. Likhne wale hamesha pehle data mein JSON likhte hain, phir
+#           _sync_cells usse cells mein le jaata hai — isliye import/edit ka code dono ke liye ek.
+# Padhte waqt JSON aur cells dono jod ke lete hain, taaki convert ke beech bhi data sahi dikhe.
+# Value number ho (JSON number grammar: '12', '-3.5', '1e3') toh REAL, warna NULL
+NUM_EXPR = ("CASE WHEN json_valid(trim({v})) THEN CASE WHEN json_type(trim({v})) "
+            "IN ('integer','real') THEN CAST(trim({v}) AS REAL) END END")
+CELL_NUM = NUM_EXPR.format(v='j.value')
+
+def project_storage(conn, pid):
+    row = project_meta(conn, pid)
+    return (row['storage'] if row else None) or 'json'
+
+def _dead_columns(conn, pid):
+    """Tombstone lage columns (compaction baaki) ke ids — inki values readers chhod dete hain"""
+    return {str(c['id']) for c in project_columns(conn, pid) if c['deleted_at']}
+
+def load_data(conn, rows, storage='json', fields=None, dead=()):
+    """rows (id, data ke saath) → {record_id: {col_id: value}}. fields = sirf ye column ids,
+    dead = ye column ids chhod do"""
+    out = {}
+    for r in rows:
+        try:    d = _loads(r['data']) if r['data'] and r['data'] != '{}' else {}
+        except: d = {}
+        if fields is not None or dead:
+            d = {k: v for k, v in d.items() if (fields is None or k in fields) and k not in dead}
+        out[r['id']] = d
+    if storage == 'cells' and rows:
+        ids, only = list(out), ''
+        if fields is not None:
+            cids = [int(f) for f in fields if str(f).isdigit()]
+            if not cids: return out
+            only = f" AND column_id IN ({','.join(map(str, cids))})"
+        for i in range(0, len(ids), 900):
+            chunk = ids[i:i+900]
+            for c in conn.execute(
+                    f"SELECT record_id, column_id, value FROM crm_cells "
+                    f"WHERE record_id IN ({','.join('?' * len(chunk))}){only}", chunk).fetchall():
+                if str(c['column_id']) not in dead:
+                    out[c['record_id']][str(c['column_id'])] = c['value']
+    return out
+
+def _sync_cells(conn, where, params):
+    """Cells project: `where` (alias r) wale records ka data JSON crm_cells mein le jao aur
+    data = '{}' karo. Woh UPDATE FTS trigger chalata hai, jo body cells se banata hai."""
+    ids = f"SELECT r.id FROM crm_records r WHERE {where}"
+    conn.execute(f"DELETE FROM crm_cells WHERE record_id IN ({ids})", params)
+    conn.execute(
+        "INSERT OR REPLACE INTO crm_cells(record_id, column_id, value, num_value) "
+        f"SELECT r.id, c.id, j.value, {CELL_NUM} FROM crm_records r "
+        "JOIN json_each(CASE WHEN json_valid(r.data) THEN r.data ELSE '{}' END) j "
+        "JOIN crm_columns c ON c.id = CAST(j.key AS INTEGER) AND c.project_id = r.project_id "
+        "AND c.deleted_at IS NULL "
+        f"WHERE {where}", params)   # '' / null bhi — load_data JSON storage jaisa hi dict de
+    conn.execute(f"UPDATE crm_records SET data = '{{}}' WHERE id IN ({ids})", params)
+
+def _record_batches(conn, pid, start=None):
+    """Project ke records (created_at, id) order mein DELETE_BATCH ke batches → (ids, last).
+    last = resume key; start mein wapas do toh wahin se aage"""
+    last = start or ['', 0]
+    while True:
+        rows = conn.execute(
+            "SELECT id, created_at FROM crm_records WHERE project_id=? AND (created_at, id) > (?, ?) "
+            "ORDER BY created_at, id LIMIT ?", (pid, *last, DELETE_BATCH)).fetchall()
+        if not rows: return
+        last = [rows[-1]['created_at'], rows[-1]['id']]
+        yield [r['id'] for r in rows], last
+
+def convert_storage(conn, pid, target, progress=None, start=None):
+    """Project ko json ↔ cells mein badlo, DELETE_BATCH records ek transaction mein.
+    Flag pehle (→cells) ya baad mein (→json) badalta hai — beech mein reads dono jodte hain.
+    progress(done, total, last) har batch ke baad (woh commit bhi kare); start = pichla `last`
+    ([created_at, id], resume ke liye). → is run mein kitne records badle"""
+    if target not in STORAGES: raise ValueError(f'storage must be one of {STORAGES}')
+    total = conn.execute("SELECT COUNT(*) as c FROM crm_records WHERE project_id=?",
+                         (pid,)).fetchone()['c']
+    if target == 'cells':
+        conn.execute("UPDATE projects SET storage='cells' WHERE id=?", (pid,))
+    done = 0
+    for rids, last in _record_batches(conn, pid, start):
+        marks = ','.join('?' * len(rids))
+        if target == 'cells':
+            _sync_cells(conn, f"r.id IN ({marks})", rids)
+        else:
+            conn.execute(
+                "UPDATE crm_records SET data = json_patch("
+                "CASE WHEN json_valid(data) THEN data ELSE '{}' END, COALESCE((SELECT "
+                "json_group_object(CAST(column_id AS TEXT), value) FROM crm_cells "
+                f"WHERE record_id = crm_records.id), '{{}}')) WHERE id IN ({marks})", rids)
+            conn.execute(f"DELETE FROM crm_cells WHERE record_id IN ({marks})", rids)
+            # cells hat gaye — FTS body sirf JSON se dobara
+            conn.execute(f"UPDATE crm_records SET data = data WHERE id IN ({marks})", rids)
+        done += len(rids)
+        if progress: progress(done, total, last)
+        else: conn.commit()
+    if target == 'json':
+        conn.execute("UPDATE projects SET storage='json' WHERE id=?", (pid,))
+    conn.commit()
+    return done
+
+def compact_columns(conn, pid, progress=None, start=None):
+    """Tombstone wale columns ki values records (JSON aur cells) se batches mein hatao, phir
+    column rows DELETE. progress/start convert_storage jaise. → kitne records dekhe"""
+    dead = sorted(int(c) for c in _dead_columns(conn, pid))
+    if not dead: return 0
+    paths = [f"""'$."{c}"'""" for c in dead]
+    has = ' OR '.join(f"json_type(data, {p}) IS NOT NULL" for p in paths)
+    in_dead = f"column_id IN ({','.join(map(str, dead))})"
+    total = conn.execute("SELECT COUNT(*) as c FROM crm_records WHERE project_id=?",
+                         (pid,)).fetchone()['c']
+    done = 0
+    for rids, last in _record_batches(conn, pid, start):
+        marks = ','.join('?' * len(rids))
+        conn.execute(f"UPDATE crm_records SET data = json_remove(data, {', '.join(paths)}) "
+                     f"WHERE id IN ({marks}) AND json_valid(data) AND ({has})", rids)
+        touched = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT record_id FROM crm_cells WHERE record_id IN ({marks}) AND {in_dead}",
+            rids).fetchall()]
+        if touched:
+            tm = ','.join('?' * len(touched))
+            conn.execute(f"DELETE FROM crm_cells WHERE record_id IN ({tm}) AND {in_dead}", touched)
+            conn.execute(f"UPDATE crm_records SET data = data WHERE id IN ({tm})", touched)   # FTS body
+        done += len(rids)
+        if progress: progress(done, total, last)
+        else: conn.commit()
+    conn.execute(f"DELETE FROM crm_columns WHERE id IN ({','.join(map(str, dead))}) "
+                 "AND deleted_at IS NOT NULL")
+    conn.commit()
+    return done
+
+def sync_column_indexes(conn):
+    """ix_col_<id> indexes ko crm_columns.indexed ke barabar lao (sirf JSON projects — cells
+    mein (column_id, value) index pehle se hai). Har CREATE/DROP alag commit. → (banaye, hataye)"""
+    have = {r['name'] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND name GLOB 'ix_col_[0-9]*'").fetchall()}
+    want = {f"ix_col_{c['id']}": c for c in conn.execute(
+        "SELECT c.id, c.project_id, c.col_type FROM crm_columns c JOIN projects p "
+        "ON p.id = c.project_id WHERE c.indexed AND c.deleted_at IS NULL "
+        "AND COALESCE(p.storage, 'json') = 'json'").fetchall()}
+    for name in sorted(have - set(want)):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute("UPDATE meta_version SET n = n + 1"); conn.commit()
+    for name in sorted(set(want) - have):
+        c = want[name]
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON crm_records(project_id, "
+                     f"{_col_key(c['id'], c['col_type'], alias='')}) WHERE project_id = {c['project_id']}")
+        conn.execute("UPDATE meta_version SET n = n + 1"); conn.commit()
+    return sorted(set(want) - have), sorted(have - set(want))
+
+
+# ─────────────── ATTACHMENT STORE ───────────────
+# File pehle uploads/.partial mein (sha256 saath saath), phir add_attachment usse content ke
+# naam par rakhta hai — same bytes pehle se hain toh naya copy nahi. File rakhna aur unlink dono
+# SQLite write lock ke andar hote hain, isliye ek worker ki release doosre ke naye reference
+# wali file nahi uda sakti.
+def blob_name(sha, orig):
+    ext = orig.rsplit('.',1)[-1].lower() if '.' in orig else 'bin'
+    return f"{sha[:2]}/{sha[2:4]}/{sha}.{ext}"
+
+def _hash_file(path):
+    """→ (sha256 hex, size) — 1 MB ek baar mein"""
+    h, n = hashlib.sha256(), 0
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(1024 * 1024), b''): h.update(buf); n += len(buf)
+    return h.hexdigest(), n
+
+def spool_upload(stream):
+    """Upload stream → .partial temp file, hash karte hue → (path, sha256, size)"""
+    path = os.path.join(app.config['PARTIAL_FOLDER'], f'spool-{uuid.uuid4().hex}.part')
+    h, n = hashlib.sha256(), 0
+    with open(path, 'wb') as f:
+        for buf in iter(lambda: stream.read(1024 * 1024), b''):
+            f.write(buf); h.update(buf); n += len(buf)
+    return path, h.hexdigest(), n
+
+def add_attachment(conn, rid, tmp, sha, size, orig):
+    """attachments row + blob file ek transaction mein; tmp file le li jaati hai → row"""
+    name = blob_name(sha, orig)
+    try:
+        with conn:
+            c = conn.execute(
+                "INSERT INTO attachments(record_id,filename,original_name,file_type,file_size) "
+                "VALUES(?,?,?,?,?)", (rid, name, orig, _file_type(orig), size))
+            dest = os.path.join(app.config['UPLOAD_FOLDER'], name)
+            if os.path.exists(dest): os.remove(tmp)   # same content pehle se hai
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp, dest)
+            a = conn.execute(ATT_SELECT + "WHERE a.id=?", (c.lastrowid,)).fetchone()
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+    if a['thumb'] is None and a['file_type'] in ('image', 'pdf', 'video'):
+        queue_once('thumbnails')   # preview background mein — upload ruka nahi rehta
+    return a
+
+def release_blobs(conn):
+    """refs 0 wale blobs hatao → kitne. Files file_trash mein (trigger), 'purge_files' job hatata hai."""
+    with conn:
+        n = conn.execute("DELETE FROM blobs WHERE refs <= 0").rowcount
+    if n: queue_once('purge_files')
+    return n
+
+def _live_path(conn, rel):
+    """UPLOAD_FOLDER ki file rel abhi kisi blob (ya uske thumbnail) ki hai?"""
+    if rel.startswith('.thumbs/'):
+        stem = rel[len('.thumbs/'):-len('.jpg')]   # thumb_name ulta — blob path ka extension nahi pata
+        return conn.execute("SELECT 1 FROM blobs WHERE thumb='ok' AND (path=? OR (path>? AND path<?))",
+                            (stem, stem + '.', stem + '/')).fetchone() is not None
+    return conn.execute("SELECT 1 FROM blobs WHERE path=?", (rel,)).fetchone() is not None
+
+def purge_files(conn, progress=None):
+    """file_trash ki files PURGE_BATCH ke transactions mein unlink → (hati, bytes, fail).
+    Write lock ke andar har path dobara check — beech mein wahi content aaya ho toh file rehti hai.
+    Fail (permission, busy..) wale attempts+1 ke saath queue mein rehte hain."""
+    top, total = conn.execute("SELECT MAX(id), COUNT(*) FROM file_trash WHERE attempts < ?",
+                              (PURGE_ATTEMPTS,)).fetchone()
+    done = removed = size = failed = last = 0
+    while True:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT * FROM file_trash WHERE id > ? AND id <= ? AND attempts < ? "
+                                "ORDER BY id LIMIT ?", (last, top or 0, PURGE_ATTEMPTS, PURGE_BATCH)).fetchall()
+            if not rows: break
+            last = rows[-1]['id']
+            conn.executemany("DELETE FROM file_trash WHERE id=?", [(r['id'],) for r in rows])
+            for r in rows:
+                rels = [r['path']] if r['path'].startswith('.') else [r['path'], '.thumbs/' + thumb_name(r['path'])]
+                for rel in rels:   # thumb bhi — same sha ka .jpg / .jpeg ek hi thumbnail share karte hain
+                    if _live_path(conn, rel): continue
+                    f = os.path.join(app.config['UPLOAD_FOLDER'], rel)
+                    try:
+                        n = os.stat(f).st_size
+                        os.remove(f)
+                    except FileNotFoundError: continue
+                    except OSError as e:
+                        conn.execute("INSERT INTO file_trash(path, attempts, error) VALUES(?,?,?) "
+                                     "ON CONFLICT(path) DO UPDATE SET attempts=attempts+1, error=excluded.error",
+                                     (rel, r['attempts'] + 1, str(e)))
+                        failed += 1; continue
+                    removed += 1; size += n
+        done += len(rows)
+        if progress: progress(done, total)
+    return removed, size, failed
+
+def gc_uploads(conn, dry_run=False):
+    """uploads/ ko blobs se milao. Jo file kisi blob / thumbnail ki nahi woh file_trash mein, phir
+    purge. .partial upload sessions ka hai (cleanup_uploads). → report dict"""
+    root = app.config['UPLOAD_FOLDER']
+    orphans, orphan_bytes = [], 0
+    for d, dirs, files in os.walk(root):
+        if d == root: dirs[:] = [x for x in dirs if x != '.partial']
+        for f in files:
+            rel = os.path.relpath(os.path.join(d, f), root).replace(os.sep, '/')
+            if rel.startswith('.') and '/' not in rel: continue   # .gitkeep jaisi
+            if _live_path(conn, rel): continue
+            try: orphan_bytes += os.path.getsize(os.path.join(d, f))
+            except OSError: continue
+            orphans.append(rel)
+    missing = [r['path'] for r in conn.execute("SELECT path FROM blobs WHERE refs > 0").fetchall()
+               if not os.path.isfile(os.path.join(root, r['path']))]
+    rep = {'orphans': len(orphans), 'orphan_bytes': orphan_bytes, 'missing': missing,
+           'removed': 0, 'reclaimed': 0, 'failed': 0}
+    if dry_run: return rep
+    for i in range(0, len(orphans), PURGE_BATCH):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for rel in orphans[i:i + PURGE_BATCH]:   # lock ke andar dobara — walk ke baad aayi ho toh
+                if not _live_path(conn, rel):
+                    conn.execute("INSERT INTO file_trash(path) VALUES(?) "
+                                 "ON CONFLICT(path) DO UPDATE SET attempts=0", (rel,))
+    conn.execute("UPDATE file_trash SET attempts=0"); conn.commit()   # GC par fail wale bhi dobara
+    rep['removed'], rep['reclaimed'], rep['failed'] = purge_files(conn)
+    return rep
+
+def dedupe_uploads(conn, progress=None):
+    """Purani uuid naam wali files → content-addressed path; duplicate copies hat jaati hain.
+    Dobara chalana safe hai. → (files dekhi, bytes bache)"""
+    legacy = [r['path'] for r in conn.execute(
+        "SELECT path FROM blobs WHERE refs > 0 AND instr(path, '/') = 0").fetchall()]
+    saved = 0
+    for i, old in enumerate(legacy, 1):
+        try: sha, size = _hash_file(os.path.join(app.config['UPLOAD_FOLDER'], old))
+        except OSError: continue   # file disk par hai hi nahi — row jaisi hai waisi
+        new = blob_name(sha, old)
+        with conn:
+            conn.execute("UPDATE attachments SET filename=?, file_size=? WHERE filename=?", (new, size, old))
+            dest = os.path.join(app.config['UPLOAD_FOLDER'], new)
+            if os.path.exists(dest): saved += size   # purani copy release_blobs hatayega
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(os.path.join(app.config['UPLOAD_FOLDER'], old), dest)
+        release_blobs(conn)
+        if progress: progress(i, len(legacy))
+    return len(legacy), saved
+
+# Thumbnails: image → Pillow, pdf → pdftoppm (poppler), video → ffmpeg — jo is machine par
+# ho. .thumbs/<blob path>.jpg; blob ke saath hi banta aur release_blobs ke saath hatta hai.
+def thumb_name(path):
+    return path.rsplit('.', 1)[0] + '.jpg'
+
+def make_thumbnail(src, out):
+    """src ka THUMB_SIZE JPEG out par → bana ya nahi"""
+    kind = _file_type(src)
+    try:
+        if kind == 'image' and Image:
+            with Image.open(src) as im:
+                im.draft('RGB', (THUMB_SIZE, THUMB_SIZE))   # JPEG chhota decode — poora nahi
+                im = ImageOps.exif_transpose(im).convert('RGB')
+                im.thumbnail((THUMB_SIZE, THUMB_SIZE))
+                im.save(out, 'JPEG', quality=80)
+        elif kind == 'pdf' and shutil.which('pdftoppm'):
+            subprocess.run(['pdftoppm', '-f', '1', '-l', '1', '-jpeg', '-singlefile', '-scale-to',
+                            str(THUMB_SIZE), src, out[:-4]], capture_output=True, timeout=THUMB_TIMEOUT)
+        elif kind == 'video' and shutil.which('ffmpeg'):
+            subprocess.run(['ffmpeg', '-y', '-v', 'error', '-ss', '1', '-i', src, '-frames:v', '1',
+                            '-vf', f'scale={THUMB_SIZE}:{THUMB_SIZE}:force_original_aspect_ratio=decrease',
+                            '-f', 'image2', out], capture_output=True, timeout=THUMB_TIMEOUT)
+        else: return False
+    except Exception:   # toota file / tool fail — bas thumbnail nahi
+        return False
+    return os.path.exists(out) and os.path.getsize(out) > 0
+
+def make_thumbnails(conn, progress=None):
+    """thumb NULL wale blobs ke thumbnails → (dekhe, bane). File .thumbs mein write lock ke andar
+    rakhi jaati hai — beech mein blob release ho gaya toh temp hi hat jaata hai."""
+    todo = [r['path'] for r in conn.execute(
+        "SELECT path FROM blobs WHERE thumb IS NULL AND refs > 0").fetchall()]
+    made = 0
+    for i, path in enumerate(todo, 1):
+        tmp = os.path.join(app.config['PARTIAL_FOLDER'], f'thumb-{uuid.uuid4().hex}.jpg')
+        ok = make_thumbnail(os.path.join(app.config['UPLOAD_FOLDER'], path), tmp)
+        with conn:
+            c = conn.execute("UPDATE blobs SET thumb=? WHERE path=?", ('ok' if ok else 'none', path))
+            if ok and c.rowcount:
+                dest = os.path.join(app.config['THUMB_FOLDER'], thumb_name(path))
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp, dest); made += 1
+        if os.path.exists(tmp): os.remove(tmp)
+        if progress: progress(i, len(todo))
+    return len(todo), made
+
+def queue_once(kind):
+    """kind ka job — pehle se queued ho toh nahi (chal raha ho toh naya, woh aage ka kaam dekhega)"""
+    if not get_db().execute("SELECT 1 FROM jobs WHERE kind=? AND status='queued'", (kind,)).fetchone():
+        submit_job(kind)
+
+@app.cli.command('thumbnails')
+@click.option('--retry', is_flag=True, help="'none' wale bhi dobara (naya tool install kiya ho toh)")
+def thumbnails_cmd(retry):
+    """Jin attachments ke thumbnails nahi bane unke abhi banao."""
+    with get_db() as conn:
+        if retry: conn.execute("UPDATE blobs SET thumb=NULL WHERE thumb='none'"); conn.commit()
+        n, made = make_thumbnails(conn)
+    print(f"{n} files checked, {made} thumbnails made")
+
+@app.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Sirf batao, kuch hatao mat')
+def gc_uploads_cmd(dry_run):
+    """uploads/ mein jo files kisi attachment ki nahi unhe hatao aur bachi jagah batao."""
+    with get_db() as conn:
+        r = gc_uploads(conn, dry_run)
+    print(f"{r['orphans']} orphan files ({_human_size(r['orphan_bytes'])})")
+    if not dry_run:
+        print(f"{r['removed']} files removed, {_human_size(r['reclaimed'])} reclaimed"
+              + (f", {r['failed']} failed" if r['failed'] else ''))
+    for p in r['missing']: print(f"missing on disk: {p}")
+
+@app.cli.command('dedupe-uploads')
+def dedupe_uploads_cmd():
+    """Purane uploads ko content-addressed store mein le jao (duplicates ek ho jaate hain)."""
+    with get_db() as conn:
+        n, saved = dedupe_uploads(conn)
+    print(f"{n} files checked, {_human_size(saved)} reclaimed")
+
+
+# ─────────────── SHELL / COMPRESSION ───────────────
+# HTML startup par ek baar banta hai: <style> aur <script> alag files ban jaate hain jinke naam
+# mein content hash hai (code badla → naya URL), isliye unhe saal bhar cache kar sakte hain.
+# Shell khud no-cache + ETag ke saath jaata hai taaki naya deploy turant dikhe.
+def build_shell(html):
+    """→ (shell bytes, {asset naam: (bytes, mimetype)})"""
+    assets = {}
+    def pull(m, ext, mime, ref):
+        body = m.group(1).encode()
+        name = f"app.{hashlib.sha1(body).hexdigest()[:12]}.{ext}"
+        assets[name] = (body, mime)
+        return ref.format(url=f'/assets/{name}')
+    html = re.sub(r'<style>(.*?)</style>', lambda m: pull(
+        m, 'css', 'text/css', '<link rel="stylesheet" href="{url}"/>'), html, count=1, flags=re.S)
+    html = re.sub(r'<script>(.*?)</script>', lambda m: pull(
+        m, 'js', 'application/javascript', '<script src="{url}"></script>'), html, count=1, flags=re.S)
+    return html.encode(), assets
+
+def _pick_encoding():
+    ae = request.accept_encodings
+    if brotli and ae['br']: return 'br'
+    if ae['gzip']: return 'gzip'
+
+def _compress(data, enc):
+    return brotli.compress(data, quality=COMPRESS_LEVEL) if enc == 'br' else gzip.compress(data, COMPRESS_LEVEL)
+
+@functools.lru_cache(maxsize=16)
+def _compress_static(data, enc):   # shell / assets startup ke baad badalte nahi
+    return _compress(data, enc)
+
+@app.after_request
+def compress_response(resp):
+    """JSON / HTML / CSS / JS jo COMPRESS_MIN se bade hain → gzip (brotli ho toh br). Stream,
+    file aur pehle se encoded responses as-is. ETag weak ho jaata hai (_conditional weak match karta hai)."""
+    if resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed or \
+       'Content-Encoding' in resp.headers or resp.mimetype not in COMPRESS_TYPES:
+        return resp
+    resp.vary.add('Accept-Encoding')
+    enc = _pick_encoding()
+    if not enc or (resp.content_length or 0) < COMPRESS_MIN: return resp
+    data = resp.get_data()
+    resp.set_data(_compress_static(data, enc) if request.endpoint in ('index', 'serve_asset')
+                  else _compress(data, enc))
+    resp.headers['Content-Encoding'] = enc
+    tag, _ = resp.get_etag()
+    if tag: resp.set_etag(tag, weak=True)
+    return resp
 
 
 # ─────────────── API — PROJECTS ───────────────
 @app.route('/')
-def index(): return render_template_string(HTML)
-
-@app.route('/uploads/<filename>')
+def index():
+    return _conditional(SHELL_TAG, lambda: app.response_class(SHELL, mimetype='text/html'))
+
+@app.route('/assets/<name>')
+def serve_asset(name):
+    """Shell ki CSS / JS — naam mein content hash hai, isliye hamesha ke liye cache"""
+    if name not in ASSETS: return jsonify({'success': False}), 404
+    body, mime = ASSETS[name]
+    resp = app.response_class(body, mimetype=mime)
+    resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return resp
+
+@app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Attachment file. Naam content ka sha256 hai — content kabhi nahi badalta, isliye naam hi
+    ETag aur cache `immutable`. Range (video seek) aur If-None-Match / If-Modified-Since → 206 / 304.
+    ATT_OFFLOAD ho toh sirf headers; bytes nginx / apache bhejta hai, worker turant free.
+    nginx:  location /_uploads/ { internal; alias <UPLOAD_FOLDER>/; }"""
+    name = _public_name(filename)
+    if not name: return jsonify({'success': False}), 404
+    return _serve_file(app.config['UPLOAD_FOLDER'], name)
+
+@app.route('/thumbs/<path:filename>')
+def serve_thumb(filename):
+    """Attachment thumbnail — serve_upload jaisa hi (blob hash naam mein, immutable)"""
+    name = _public_name(filename)
+    if not name: return jsonify({'success': False}), 404
+    return _serve_file(app.config['THUMB_FOLDER'], name)
+
+def _public_name(filename):
+    """URL ka path → normalized naam, ya None agar koi bhi segment '.' se shuru ho — .partial /
+    .thumbs / '..' (x/../.partial/<uid>.part, %2f wala bhi) bahar se nahi khulte"""
+    name = posixpath.normpath(filename)
+    return None if any(p.startswith('.') for p in name.split('/')) else name
+
+def _serve_file(folder, filename):
+    """folder (UPLOAD_FOLDER / THUMB_FOLDER) ke andar ki file, Range / 304 / offload ke saath"""
+    path = safe_join(folder, filename)
+    if not path or not os.path.isfile(path): return jsonify({'success': False}), 404
+    if ATT_OFFLOAD not in ('x-accel', 'x-sendfile'):
+        resp = send_file(path, etag=filename, max_age=ATT_MAX_AGE, conditional=True)
+        resp.cache_control.immutable = True
+        resp.accept_ranges = 'bytes'   # browser ko pata rahe ki video seek ho sakta hai
+        return resp
+    st = os.stat(path)
+    resp = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    resp.set_etag(filename)
+    resp.last_modified = int(st.st_mtime)
+    resp.cache_control.public, resp.cache_control.max_age = True, ATT_MAX_AGE
+    resp.cache_control.immutable = True
+    resp = resp.make_conditional(request)   # 304 yahin, proxy tak jaane ki zaroorat nahi
+    if resp.status_code == 200:
+        rel = os.path.relpath(path, app.config['UPLOAD_FOLDER'])   # thumbs bhi UPLOAD_FOLDER ke andar
+        if ATT_OFFLOAD == 'x-accel': resp.headers['X-Accel-Redirect'] = ATT_ACCEL_PREFIX + quote(rel)
+        else:                        resp.headers['X-Sendfile'] = path
+    return resp
 
 @app.route('/api/projects')
 def get_projects():
     with get_db() as conn:
-        rows = conn.execute("SELECT * FROM projects ORDER BY created_at").fetchall()
-        result = []
-        for r in rows:
-            rc = conn.execute(
-                "SELECT COUNT(*) as c FROM crm_records WHERE project_id=?",
-                (r['id'],)).fetchone()['c']
-            result.append({'id': r['id'], 'name': r['name'], 'color': r['color'],
-                           'created_at': fmt_date(r['created_at']), 'record_count': rc})
+        tag = conn.execute(   # har project ka (id, version) — add / delete / koi bhi write
+            "SELECT group_concat(id || '.' || v) AS t FROM (SELECT p.id, COALESCE(s.version, 0) AS v "
+            "FROM projects p LEFT JOIN project_stats s ON s.project_id = p.id ORDER BY p.id)"
+        ).fetchone()['t'] or ''
+    return _conditional('p' + hashlib.sha1(tag.encode()).hexdigest()[:20], _projects_list)
+
+def _projects_list():
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT p.*, COALESCE(s.records, 0) AS record_count FROM projects p "
+            "LEFT JOIN project_stats s ON s.project_id = p.id ORDER BY p.created_at").fetchall()
+    result = [{'id': r['id'], 'name': r['name'], 'color': r['color'], 'storage': r['storage'],
+               'created_at': fmt_date(r['created_at']), 'record_count': r['record_count']}
+              for r in rows]
     return jsonify({'success': True, 'projects': result})
 
 @app.route('/api/projects', methods=['POST'])
@@ -165,34 +1554,54 @@ def add_project():
     d = request.get_json() or {}
     name = d.get('name','').strip()
     if not name: return jsonify({'success': False, 'message': 'Name required'}), 400
+    storage = d.get('storage') or DEFAULT_STORAGE
+    if storage not in STORAGES:
+        return jsonify({'success': False, 'message': f'storage must be one of {STORAGES}'}), 400
     with get_db() as conn:
-        c = conn.execute("INSERT INTO projects(name,color) VALUES(?,?)",
-                         (name, d.get('color','#00c8ff')))
+        c = conn.execute("INSERT INTO projects(name,color,storage) VALUES(?,?,?)",
+                         (name, d.get('color','#00c8ff'), storage))
         pid = c.lastrowid
         proj = dict(conn.execute("SELECT * FROM projects WHERE id=?", (pid,)).fetchone())
+    meta_changed()
     proj['record_count'] = 0
     proj['created_at'] = fmt_date(proj['created_at'])
     return jsonify({'success': True, 'project': proj})
 
 @app.route('/api/projects/<int:pid>', methods=['DELETE'])
 def del_project(pid):
+    if request.args.get('async'):   # bade project — batches mein background job
+        job = submit_job('delete_project', pid)
+        return jsonify({'success': True, 'job': job_to_dict(job)}), 202
     with get_db() as conn:
-        recs = conn.execute("SELECT id FROM crm_records WHERE project_id=?", (pid,)).fetchall()
-        for rec in recs:
-            for a in conn.execute("SELECT filename FROM attachments WHERE record_id=?",
-                                  (rec['id'],)).fetchall():
-                try: os.remove(os.path.join(app.config['UPLOAD_FOLDER'], a['filename']))
-                except: pass
+        indexed = conn.execute("SELECT 1 FROM crm_columns WHERE project_id=? AND indexed",
+                               (pid,)).fetchone()
         conn.execute("DELETE FROM projects WHERE id=?", (pid,))
+        release_blobs(conn)
+    meta_changed()
+    if indexed: submit_job('column_indexes')
     return jsonify({'success': True})
 
+@app.route('/api/projects/<int:pid>/storage', methods=['POST'])
+def set_storage(pid):
+    """{storage: 'json'|'cells'} → project ka data background job mein convert"""
+    storage = (request.get_json() or {}).get('storage')
+    if storage not in STORAGES:
+        return jsonify({'success': False, 'message': f'storage must be one of {STORAGES}'}), 400
+    job = submit_job('convert_storage', pid, {'storage': storage})
+    return jsonify({'success': True, 'job': job_to_dict(job)}), 202
+
 
 # ─────────────── API — COLUMNS ───────────────
 @app.route('/api/projects/<int:pid>/columns')
 def get_columns(pid):
     with get_db() as conn:
-        cols = [dict(r) for r in conn.execute(
-            "SELECT * FROM crm_columns WHERE project_id=? ORDER BY col_order", (pid,)).fetchall()]
+        tag = f'c{pid}.{_project_version(conn, pid)}'
+    return _conditional(tag, lambda: _columns_list(pid))
+
+def _columns_list(pid):
+    with get_db() as conn:
+        cols = [{k: v for k, v in c.items() if k != 'deleted_at'}
+                for c in project_columns(conn, pid) if not c['deleted_at']]
     return jsonify({'success': True, 'columns': cols})
 
 @app.route('/api/projects/<int:pid>/columns', methods=['POST'])
@@ -227,55 +1636,173 @@ def add_column(pid):
         c = conn.execute(
             "INSERT INTO crm_columns(project_id,name,col_type,col_order) VALUES(?,?,?,?)",
             (pid, name, d.get('col_type','text'), new_order))
-        col = dict(conn.execute("SELECT * FROM crm_columns WHERE id=?", (c.lastrowid,)).fetchone())
+        col = dict(conn.execute("SELECT id, project_id, name, col_type, col_order, indexed "
+                                "FROM crm_columns WHERE id=?", (c.lastrowid,)).fetchone())
+    meta_changed()
     return jsonify({'success': True, 'column': col})
 
+@app.route('/api/projects/<int:pid>/columns/<int:cid>', methods=['PATCH'])
+def upd_column(pid, cid):
+    """{indexed: true|false} → expression index background job mein banta / hatta hai"""
+    d = request.get_json() or {}
+    if 'indexed' not in d: return jsonify({'success': False, 'message': 'Nothing to update'}), 400
+    with get_db() as conn:
+        c = conn.execute("UPDATE crm_columns SET indexed=? WHERE id=? AND project_id=? "
+                         "AND deleted_at IS NULL", (int(bool(d['indexed'])), cid, pid))
+        if not c.rowcount: return jsonify({'success': False}), 404
+        col = dict(conn.execute("SELECT id, project_id, name, col_type, col_order, indexed "
+                                "FROM crm_columns WHERE id=?", (cid,)).fetchone())
+    meta_changed()
+    job = submit_job('column_indexes', pid)
+    return jsonify({'success': True, 'column': col, 'job': job_to_dict(job)})
+
 @app.route('/api/projects/<int:pid>/columns/<int:cid>', methods=['DELETE'])
 def del_column(pid, cid):
+    """Sirf tombstone — records ki values 'compact_columns' job baad mein hatata hai"""
     with get_db() as conn:
-        for rec in conn.execute(
-                "SELECT id, data FROM crm_records WHERE project_id=?", (pid,)).fetchall():
-            try:
-                d = json.loads(rec['data']); d.pop(str(cid), None)
-                conn.execute("UPDATE crm_records SET data=? WHERE id=?", (json.dumps(d), rec['id']))
-            except: pass
-        conn.execute("DELETE FROM crm_columns WHERE id=? AND project_id=?", (cid, pid))
+        c = conn.execute("UPDATE crm_columns SET deleted_at=datetime('now') "
+                         "WHERE id=? AND project_id=? AND deleted_at IS NULL", (cid, pid))
+    meta_changed()
+    if c.rowcount: submit_job('compact_columns', pid)
     return jsonify({'success': True})
 
 
 # ─────────────── API — RECORDS ───────────────
 @app.route('/api/projects/<int:pid>/records')
 def get_records(pid):
+    with get_db() as conn:
+        tag = f'r{pid}.{_project_version(conn, pid)}.' + \
+              hashlib.sha1(request.query_string).hexdigest()[:16]
+    return _conditional(tag, lambda: _records_page(pid))
+
+def _records_page(pid):
+    """Ek page records — keyset cursor par. Bina q ke newest first (created_at, id);
+    q ho toh FTS rank order mein. ?limit=N  ?cursor=<next_cursor>  ?count=exact|estimate|none
+    ?offset=N → cursor na ho toh N rows chhod ke (grid mein scrollbar se beech mein kudna);
+    aage ke pages next_cursor se hi lo
+    ?fields=<col_id>,<col_id> → data mein sirf ye columns
+    ?sort=<col_id>|created_at:asc|desc  (q ke saath bhi — tab rank ki jagah)
+    ?filter=<col_id>:<op>[:<value>] (repeat kar sakte ho, sab AND) — op: eq, contains,
+    gt, gte, lt, lte (number column mein numeric), empty, notempty
+    ?format=columns → records column-major (records_columns dekho); ?format=ndjson → pehli line
+    meta, phir har line ek record"""
     q = request.args.get('q','').strip().lower()
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or None
+    try:
+        limit = max(1, min(int(request.args.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE))
+        after = _dec_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        offset = 0 if after else max(0, int(request.args.get('offset', 0)))
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'message': 'Invalid limit / cursor / offset'}), 400
+    count = request.args.get('count', 'none' if after else 'exact')
+    if count not in ('exact', 'estimate', 'none'):
+        return jsonify({'success': False, 'message': 'count must be exact, estimate or none'}), 400
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'columns', 'ndjson'):
+        return jsonify({'success': False, 'message': 'format must be json, columns or ndjson'}), 400
     with get_db() as conn:
-        rows = conn.execute(
-            "SELECT * FROM crm_records WHERE project_id=? ORDER BY created_at DESC", (pid,)
-        ).fetchall()
-        result = []
-        for row in rows:
-            atts = [att_to_dict(a) for a in
-                    conn.execute("SELECT * FROM attachments WHERE record_id=?",
-                                 (row['id'],)).fetchall()]
-            rec = record_to_dict(row, atts)
-            if q:
-                txt = ' '.join(str(v) for v in rec['data'].values()).lower()
-                txt += ' ' + (rec['notes'] or '').lower() + ' ' + (rec['tags'] or '').lower()
-                if q not in txt: continue
-            result.append(rec)
-    return jsonify({'success': True, 'records': result, 'total': len(result)})
+        storage = project_storage(conn, pid)
+        cols = _live_columns(conn, pid)
+        try:
+            sort = _record_sort(cols, request.args['sort']) if request.args.get('sort') else None
+            extra, params = _record_filters(cols, request.args.getlist('filter'), storage)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        hint = ''
+        if q:
+            match, fx, fp = _fts_query(conn, pid, q, storage)
+            if not match: return _records_out(fmt, {'success': True, 'total': 0, 'total_exact': True,
+                                                    'has_more': False, 'next_cursor': None}, [], {}, {}, [])
+            select, order = f"SELECT {PAGE_COLS}, f.rank AS sort_rank ", [('f.rank', 'ASC'), ('r.id', 'ASC')]
+            base = ("FROM crm_records_fts f JOIN crm_records r ON r.id = f.rowid "
+                    f"WHERE crm_records_fts MATCH ? AND r.project_id = {pid}")
+            extra, params = fx + extra, [match] + fp + params
+            key = lambda row: [row['sort_rank'], row['id']]
+        else:
+            select, order = f"SELECT {PAGE_COLS} ", [('r.created_at', 'DESC'), ('r.id', 'DESC')]
+            # pid literal — indexed columns ke partial indexes (WHERE project_id = N) tabhi lagte hain
+            hint = _index_hint(conn, ([sort[0]] if sort and sort[0] else []) + [
+                f.split(':')[0] for f in request.args.getlist('filter') if f.split(':')[1] in _CMP]) \
+                if storage == 'json' else ''
+            base = f"FROM crm_records r {hint}WHERE r.project_id = {pid}"
+            key = lambda row: [row['created_at'], row['id']]
+        base += ''.join(' AND ' + e for e in extra)
+        if sort and sort[0]:
+            k = _col_key(sort[0], cols[sort[0]], storage)
+            select, order = f"SELECT {PAGE_COLS}, {k} AS sort_key ", [(k, sort[1]), ('r.id', sort[1])]
+            key = lambda row: [row['sort_key'], row['id']]
+        elif sort:
+            select = f"SELECT {PAGE_COLS} "
+            order = [('r.created_at', sort[1]), ('r.id', sort[1])]
+            key = lambda row: [row['created_at'], row['id']]
+        where, wp = base, list(params)
+        if after:
+            try: ks, kp = _keyset(order, after)
+            except ValueError:
+                return jsonify({'success': False, 'message': 'Invalid limit / cursor'}), 400
+            where += " AND " + ks; wp += kp
+        sql = select + where + " ORDER BY " + ', '.join(f"{e} {d}" for e, d in order) + " LIMIT ? OFFSET ?"
+        page = _unhinted_retry(hint, lambda h: conn.execute(
+            sql.replace(hint, h), wp + [limit + 1, offset]).fetchall())
+        has_more = len(page) > limit
+        page = page[:limit]
+        atts = _atts_by_record(conn, [row['id'] for row in page])
+        dead = _dead_columns(conn, pid)
+        # JSON storage, bina fields / dead columns ke → stored text hi response mein (toota
+        # text ho toh us row ka {} — record_to_dict jaisa, poora page invalid nahi hota)
+        data = {row['id']: {} for row in page if not row['data_ok']} \
+               if storage == 'json' and fields is None and not dead and fmt != 'columns' else \
+               load_data(conn, page, storage, fields, dead)
+        total, exact = _unhinted_retry(hint, lambda h: _count_records(
+            conn, base.replace(hint, h), params, count))
+    return _records_out(fmt, {'success': True, 'total': total, 'total_exact': exact,
+                              'has_more': has_more,
+                              'next_cursor': _enc_cursor(key(page[-1])) if has_more else None},
+                        page, atts, data, fields or list(cols))
+
+def _records_out(fmt, meta, page, atts, data, fields):
+    """records page ka response — json (default), columns ya ndjson"""
+    if fmt == 'columns':
+        return json_response(dict(meta, format='columns'),
+                             records=_dumps(records_columns(page, atts, data, fields)))
+    if fmt == 'ndjson':
+        def lines():
+            yield _dumps(meta) + '\n'
+            for i in range(0, len(page), PAGE_SIZE):
+                yield ''.join(record_json(row, atts.get(row['id'], []), data.get(row['id'])) + '\n'
+                              for row in page[i:i + PAGE_SIZE])
+        return app.response_class(lines(), mimetype='application/x-ndjson')
+    result = ','.join(record_json(row, atts.get(row['id'], []), data.get(row['id'])) for row in page)
+    return json_response(meta, records=f'[{result}]')
+
+def _record_body():
+    """Record POST / PUT ka JSON — body aur `data` dono object hone chahiye, warna None (400)"""
+    d = request.get_json() or {}
+    return d if isinstance(d, dict) and isinstance(d.get('data', {}), dict) else None
 
 @app.route('/api/projects/<int:pid>/records', methods=['POST'])
 def add_record(pid):
-    d = request.get_json() or {}
+    d = _record_body()
+    if d is None: return jsonify({'success': False, 'message': 'data must be an object'}), 400
     with get_db() as conn:
+        dead = _dead_columns(conn, pid)   # purane tab se aaye deleted columns na likho
         c = conn.execute(
             "INSERT INTO crm_records(project_id,data,tags,notes) VALUES(?,?,?,?)",
-            (pid, json.dumps(d.get('data',{})), d.get('tags',''), d.get('notes','')))
+            (pid, json.dumps({k: v for k, v in d.get('data', {}).items() if k not in dead}),
+             d.get('tags',''), d.get('notes','')))
+        if project_storage(conn, pid) == 'cells': _sync_cells(conn, "r.id = ?", [c.lastrowid])
         rec = get_record_with_atts(conn, c.lastrowid)
     return jsonify({'success': True, 'record': rec})
 
 @app.route('/api/records/<int:rid>')
 def get_record(rid):
+    with get_db() as conn:
+        row = conn.execute("SELECT COALESCE(s.version, 0) AS v FROM crm_records r LEFT JOIN "
+                           "project_stats s ON s.project_id = r.project_id WHERE r.id=?", (rid,)).fetchone()
+    if not row: return jsonify({'success': False}), 404
+    return _conditional(f'rec{rid}.{row["v"]}', lambda: _record_json(rid))
+
+def _record_json(rid):
     with get_db() as conn:
         rec = get_record_with_atts(conn, rid)
     if not rec: return jsonify({'success': False}), 404
@@ -283,28 +1810,27 @@ def get_record(rid):
 
 @app.route('/api/records/<int:rid>', methods=['PUT'])
 def upd_record(rid):
-    d = request.get_json() or {}
+    d = _record_body()
+    if d is None: return jsonify({'success': False, 'message': 'data must be an object'}), 400
     with get_db() as conn:
         row = conn.execute("SELECT * FROM crm_records WHERE id=?", (rid,)).fetchone()
         if not row: return jsonify({'success': False}), 404
-        try:    old = json.loads(row['data'])
-        except: old = {}
+        storage, dead = project_storage(conn, row['project_id']), _dead_columns(conn, row['project_id'])
+        data = d['data'] if 'data' in d else load_data(conn, [row], storage)[rid]
         conn.execute(
             "UPDATE crm_records SET data=?,tags=?,notes=?,updated_at=datetime('now') WHERE id=?",
-            (json.dumps(d.get('data', old)),
+            (json.dumps({k: v for k, v in data.items() if k not in dead}),
              d.get('tags', row['tags']),
              d.get('notes', row['notes']), rid))
+        if storage == 'cells': _sync_cells(conn, "r.id = ?", [rid])
         rec = get_record_with_atts(conn, rid)
     return jsonify({'success': True, 'record': rec})
 
 @app.route('/api/records/<int:rid>', methods=['DELETE'])
 def del_record(rid):
     with get_db() as conn:
-        for a in conn.execute("SELECT filename FROM attachments WHERE record_id=?",
-                              (rid,)).fetchall():
-            try: os.remove(os.path.join(app.config['UPLOAD_FOLDER'], a['filename']))
-            except: pass
         conn.execute("DELETE FROM crm_records WHERE id=?", (rid,))
+        release_blobs(conn)
     return jsonify({'success': True})
 
 
@@ -316,16 +1842,9 @@ def upload_att(rid):
     file = request.files['file']
     if not file.filename or not allowed(file.filename):
         return jsonify({'success': False, 'message': 'File type not allowed'}), 400
-    orig   = secure_filename(file.filename)
-    ext    = orig.rsplit('.',1)[-1] if '.' in orig else 'bin'
-    stored = f"{uuid.uuid4().hex}.{ext}"
-    fp     = os.path.join(app.config['UPLOAD_FOLDER'], stored)
-    file.save(fp)
-    with get_db() as conn:
-        c = conn.execute(
-            "INSERT INTO attachments(record_id,filename,original_name,file_type,file_size) VALUES(?,?,?,?,?)",
-            (rid, stored, orig, _file_type(orig), os.path.getsize(fp)))
-        a = dict(conn.execute("SELECT * FROM attachments WHERE id=?", (c.lastrowid,)).fetchone())
+    orig = secure_filename(file.filename)
+    tmp, sha, size = spool_upload(file.stream)
+    a = add_attachment(get_db(), rid, tmp, sha, size, orig)
     return jsonify({'success': True, 'attachment': att_to_dict(a)})
 
 @app.route('/api/attachments/<int:aid>', methods=['DELETE'])
@@ -333,13 +1852,279 @@ def del_att(aid):
     with get_db() as conn:
         a = conn.execute("SELECT * FROM attachments WHERE id=?", (aid,)).fetchone()
         if not a: return jsonify({'success': False}), 404
-        try: os.remove(os.path.join(app.config['UPLOAD_FOLDER'], a['filename']))
-        except: pass
         conn.execute("DELETE FROM attachments WHERE id=?", (aid,))
+        release_blobs(conn)   # file sirf aakhri reference par jaati hai
+    return jsonify({'success': True})
+
+# Chunked, resumable upload — badi files ke liye:
+#   POST   /api/records/<rid>/uploads        {filename, size, chunk_size?, sha256?} → session
+#   PUT    /api/uploads/<uid>/chunks/<idx>   body = chunk bytes; X-Chunk-Sha256 header optional
+#   GET    /api/uploads/<uid>                → kaunse chunks aa chuke (resume)
+#   POST   /api/uploads/<uid>/finalize       → attachment
+#   DELETE /api/uploads/<uid>                → cancel
+# Chunk request.stream se 1 MB tukdon mein seedha .part file ke offset par likha jaata hai.
+def _part_path(uid): return os.path.join(app.config['PARTIAL_FOLDER'], f'{uid}.part')
+
+def upload_to_dict(conn, u):
+    chunks = conn.execute("SELECT idx, sha256 FROM upload_chunks WHERE upload_id=? ORDER BY idx",
+                          (u['id'],)).fetchall()
+    return {'id': u['id'], 'record_id': u['record_id'], 'original_name': u['original_name'],
+            'file_size': u['file_size'], 'chunk_size': u['chunk_size'],
+            'chunks': -(-u['file_size'] // u['chunk_size']) or 1,
+            'received': [c['idx'] for c in chunks], 'checksums': [c['sha256'] for c in chunks]}
+
+def cleanup_uploads(conn):
+    """UPLOAD_TTL se purane sessions hatao, aur jin .part files ka session nahi (cancel / record
+    delete) woh bhi — par sirf UPLOAD_TTL se purani, taaki abhi ban rahe session ki file na jaaye"""
+    stale = [r['id'] for r in conn.execute(
+        "SELECT id FROM upload_sessions WHERE updated_at < datetime('now', ?)",
+        (f'-{UPLOAD_TTL} seconds',)).fetchall()]
+    with conn:
+        conn.executemany("DELETE FROM upload_sessions WHERE id=?", [(u,) for u in stale])
+    live = {r['id'] for r in conn.execute("SELECT id FROM upload_sessions").fetchall()}
+    n, old = 0, datetime.now().timestamp() - UPLOAD_TTL
+    for e in os.scandir(app.config['PARTIAL_FOLDER']):
+        if e.name[:-5] in live: continue
+        try:
+            if e.stat().st_mtime < old: os.remove(e.path); n += 1
+        except OSError: pass
+    return n
+
+@app.route('/api/records/<int:rid>/uploads', methods=['POST'])
+def init_upload(rid):
+    d = request.get_json() or {}
+    orig = secure_filename(d.get('filename') or '')
+    try:
+        size = int(d.get('size'))
+        chunk = min(int(d.get('chunk_size') or UPLOAD_CHUNK), app.config['MAX_CONTENT_LENGTH'])
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'size / chunk_size must be numbers'}), 400
+    if not orig or not allowed(orig):
+        return jsonify({'success': False, 'message': 'File type not allowed'}), 400
+    if not 0 <= size <= UPLOAD_MAX or chunk < 64 * 1024:
+        return jsonify({'success': False, 'message': f'size must be ≤ {UPLOAD_MAX}, chunk_size ≥ 64 KB'}), 400
+    uid = uuid.uuid4().hex
+    with get_db() as conn:
+        if not conn.execute("SELECT 1 FROM crm_records WHERE id=?", (rid,)).fetchone():
+            return jsonify({'success': False, 'message': 'Record not found'}), 404
+        cleanup_uploads(conn)
+        conn.execute("INSERT INTO upload_sessions(id,record_id,original_name,file_size,chunk_size,sha256) "
+                     "VALUES(?,?,?,?,?,?)", (uid, rid, orig, size, chunk, (d.get('sha256') or '').lower() or None))
+        with open(_part_path(uid), 'wb') as f: f.truncate(size)
+        u = conn.execute("SELECT * FROM upload_sessions WHERE id=?", (uid,)).fetchone()
+        return jsonify({'success': True, 'upload': upload_to_dict(conn, u)}), 201
+
+@app.route('/api/uploads/<uid>')
+def get_upload(uid):
+    with get_db() as conn:
+        u = conn.execute("SELECT * FROM upload_sessions WHERE id=?", (uid,)).fetchone()
+        if not u: return jsonify({'success': False}), 404
+        return jsonify({'success': True, 'upload': upload_to_dict(conn, u)})
+
+@app.route('/api/uploads/<uid>/chunks/<int:idx>', methods=['PUT'])
+def put_chunk(uid, idx):
+    with get_db() as conn:
+        u = conn.execute("SELECT * FROM upload_sessions WHERE id=?", (uid,)).fetchone()
+    if not u: return jsonify({'success': False}), 404
+    start = idx * u['chunk_size']
+    want = min(u['chunk_size'], u['file_size'] - start)
+    if idx < 0 or want < 0 or (want == 0 and idx):
+        return jsonify({'success': False, 'message': 'Chunk index out of range'}), 400
+    if request.content_length is not None and request.content_length != want:
+        return jsonify({'success': False, 'message': f'Chunk {idx} must be {want} bytes'}), 400
+    h, got = hashlib.sha256(), 0
+    try: fd = os.open(_part_path(uid), os.O_WRONLY)
+    except FileNotFoundError:   # finalize file le gaya, ya cancel / cleanup ne session hata diya
+        with get_db() as conn:
+            if not conn.execute("SELECT 1 FROM upload_sessions WHERE id=?", (uid,)).fetchone():
+                return jsonify({'success': False}), 404
+        return jsonify({'success': False, 'message': 'Upload already finalized'}), 409
+    try:
+        while got < want:
+            buf = request.stream.read(min(1024 * 1024, want - got))
+            if not buf: break
+            os.pwrite(fd, buf, start + got)
+            h.update(buf); got += len(buf)
+    finally:
+        os.close(fd)
+    digest = h.hexdigest()
+    if got != want or request.stream.read(1):
+        return jsonify({'success': False, 'message': f'Chunk {idx} must be {want} bytes'}), 400
+    sent = request.headers.get('X-Chunk-Sha256', '').lower()
+    if sent and sent != digest:
+        return jsonify({'success': False, 'message': f'Chunk {idx} checksum mismatch'}), 422
+    with get_db() as conn:
+        conn.execute("INSERT INTO upload_chunks(upload_id,idx,size,sha256) VALUES(?,?,?,?) "
+                     "ON CONFLICT(upload_id, idx) DO UPDATE SET size=excluded.size, sha256=excluded.sha256",
+                     (uid, idx, got, digest))
+        conn.execute("UPDATE upload_sessions SET updated_at=datetime('now') WHERE id=?", (uid,))
+    return jsonify({'success': True, 'idx': idx, 'sha256': digest})
+
+@app.route('/api/uploads/<uid>/finalize', methods=['POST'])
+def finalize_upload(uid):
+    with get_db() as conn:
+        u = conn.execute("SELECT * FROM upload_sessions WHERE id=?", (uid,)).fetchone()
+        if not u: return jsonify({'success': False}), 404
+        info = upload_to_dict(conn, u)
+    missing = sorted(set(range(info['chunks'])) - set(info['received']))
+    if missing and u['file_size']:
+        return jsonify({'success': False, 'message': 'Chunks missing', 'missing': missing[:100]}), 409
+    part = os.path.join(app.config['PARTIAL_FOLDER'], f'spool-{uid}.part')
+    try: os.replace(_part_path(uid), part)   # session ki file ab sirf is request ki
+    except FileNotFoundError:   # doosra finalize pehle hi le gaya
+        return jsonify({'success': False, 'message': 'Upload already finalized'}), 409
+    sha, size = _hash_file(part)   # content address ke liye poori file — 1 MB ek baar mein
+    if u['sha256'] and sha != u['sha256']:
+        os.replace(part, _part_path(uid))   # session wapas — galat chunk dobara bhejo
+        return jsonify({'success': False, 'message': 'File checksum mismatch'}), 422
+    with get_db() as conn:
+        conn.execute("DELETE FROM upload_sessions WHERE id=?", (uid,))
+    a = add_attachment(get_db(), u['record_id'], part, sha, size, u['original_name'])
+    return jsonify({'success': True, 'attachment': att_to_dict(a)})
+
+@app.route('/api/uploads/<uid>', methods=['DELETE'])
+def cancel_upload(uid):
+    with get_db() as conn:
+        conn.execute("DELETE FROM upload_sessions WHERE id=?", (uid,))
+    try: os.remove(_part_path(uid))
+    except OSError: pass
     return jsonify({'success': True})
 
 
 # ─────────────── API — IMPORT / EXPORT / STATS ───────────────
+def _find_header(rows):
+    """Pehli HEADER_ROWS rows mein pehli jisme koi naam ho woh header — frame aur stream dono
+    path yahi use karte hain, taaki file size se header na badle.
+    → (row_index ya None, [(col_idx, name)]); duplicate names pandas ki tarah Client, Client.1"""
+    for i, row in enumerate(itertools.islice(rows, HEADER_ROWS)):
+        seen, hdr = {}, []
+        for j, v in enumerate(row):
+            h = '' if v is None else str(v).strip()
+            if not h or h.lower() in ('nan', 'none'): continue
+            n = seen.get(h, 0); seen[h] = n + 1
+            hdr.append((j, f"{h}.{n}" if n else h))
+        if hdr: return i, hdr
+    return None, []
+
+def _read_sheet(file_bytes):
+    """Excel → (DataFrame, headers). Header row _find_header se (upar ki title / khaali rows chhodke)."""
+    raw = pd.read_excel(io.BytesIO(file_bytes), dtype=str, header=None)
+    hrow, hdr = _find_header(raw.head(HEADER_ROWS).itertuples(index=False))
+    if not hdr: return raw.iloc[0:0], []
+    df = raw.iloc[hrow + 1:, [j for j, _ in hdr]].fillna('')
+    df.columns = [h for _, h in hdr]
+    return df.reset_index(drop=True), list(df.columns)
+
+def _import_columns(conn, pid, headers):
+    """Header → column id; jo column project mein nahi hai woh end mein ban jaata hai"""
+    existing = {c['name'].strip().lower(): c['id'] for c in project_columns(conn, pid)
+                if not c['deleted_at']}
+    col_map = {}
+    mo = conn.execute(
+        "SELECT MAX(col_order) as m FROM crm_columns WHERE project_id=?", (pid,)
+    ).fetchone()['m'] or 0
+
+    for i, h in enumerate(headers):
+        k = h.strip().lower()
+        if k in existing:
+            col_map[h] = existing[k]
+        else:
+            c = conn.execute(
+                "INSERT INTO crm_columns(project_id,name,col_type,col_order) VALUES(?,?,?,?)",
+                (pid, h.strip(), 'text', mo+i+1))
+            col_map[h] = c.lastrowid
+            meta_changed()
+    return col_map
+
+def _frame_payloads(df, col_map):
+    """Column-wise JSON banao: har column se '"cid": value, ' fragments, phir row-wise jodo.
+    Khaali rows drop ho jaati hain. Output json.dumps(dict) jaisa hi hai."""
+    parts = pd.Series('', index=df.index, dtype=object)
+    for cid, h in {cid: h for h, cid in col_map.items()}.items():
+        v = df[h].astype(str).str.strip()
+        keep = (v != '') & (v != 'nan')
+        if keep.any():
+            parts.loc[keep] = parts[keep] + f'"{cid}": ' + v[keep].map(json.dumps) + ', '
+    parts = parts[parts != '']
+    return '{' + parts.str[:-2] + '}'
+
+def _insert_batch(conn, pid, payloads, storage):
+    """(pid, data JSON) rows executemany se; cells project mein turant crm_cells mein"""
+    since = conn.execute("SELECT COALESCE(MAX(id), 0) FROM crm_records").fetchone()[0] \
+        if storage == 'cells' else 0
+    conn.executemany("INSERT INTO crm_records(project_id,data) VALUES(?,?)", payloads)
+    if storage == 'cells': _sync_cells(conn, "r.project_id = ? AND r.id > ?", [pid, since])
+
+def _import_frame(conn, pid, df, col_map, progress=None, start=0):
+    """DataFrame ko IMPORT_BATCH rows ke chunks mein executemany se insert karo (ek transaction).
+    start = pehle itni rows chhod do (resume ke liye)"""
+    inserted, storage = 0, project_storage(conn, pid)
+    for i in range(start, len(df), IMPORT_BATCH):
+        payloads = _frame_payloads(df.iloc[i:i+IMPORT_BATCH], col_map)
+        _insert_batch(conn, pid, ((pid, p) for p in payloads), storage)
+        inserted += len(payloads)
+        if progress: progress(min(i + IMPORT_BATCH, len(df)), len(df), inserted)
+    return inserted
+
+def _import_stream(conn, pid, fobj, progress=None, start=0):
+    """openpyxl read-only: header ek baar dekho, baaki rows batches mein stream karke insert.
+    Memory file size par depend nahi karti. → (inserted, processed, headers)"""
+    wb = openpyxl.load_workbook(fobj, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        first = list(itertools.islice(rows, HEADER_ROWS))
+        hrow, hdr = _find_header(first)
+        if not hdr:
+            raise ValueError(f'Excel mein koi valid column header nahi mila. Pehli {HEADER_ROWS} rows mein column names hone chahiye.')
+        col_map = _import_columns(conn, pid, [h for _, h in hdr])
+        cells = [(j, str(col_map[h])) for j, h in hdr]
+        total = max((ws.max_row or 0) - hrow - 1, 0)
+        processed, inserted = start, 0
+        batch, storage = [], project_storage(conn, pid)
+        for row in itertools.islice(itertools.chain(first[hrow + 1:], rows), start, None):
+            processed += 1
+            rd = {}
+            for j, cid in cells:
+                v = row[j] if j < len(row) else None
+                if v is None: continue
+                v = str(v).strip()
+                if v and v != 'nan': rd[cid] = v
+            if rd: batch.append((pid, json.dumps(rd)))
+            if processed % IMPORT_BATCH == 0:
+                _insert_batch(conn, pid, batch, storage)
+                inserted += len(batch); batch.clear()
+                if progress: progress(processed, max(total, processed), inserted)
+        _insert_batch(conn, pid, batch, storage)
+        inserted += len(batch)
+        if progress: progress(processed, processed, inserted)
+        return inserted, processed, [h for _, h in hdr]
+    finally:
+        wb.close()
+
+def import_file(pid, fobj, filename, mode=None, progress=None, start=0):
+    """Excel file-like → project records. mode 'stream' = openpyxl read-only (flat memory),
+    'frame' = pandas. Default: badi .xlsx stream, baaki frame. .xls hamesha frame.
+    progress(processed, total, inserted) har batch ke baad; start = itni data rows skip."""
+    fobj.seek(0, 2); size = fobj.tell(); fobj.seek(0)
+    xlsx = filename.lower().endswith('.xlsx')
+    if mode not in ('stream', 'frame') or not xlsx:
+        mode = 'stream' if xlsx and size > STREAM_IMPORT_BYTES else 'frame'
+    if mode == 'stream':
+        with get_db() as conn:
+            inserted, processed, headers = _import_stream(conn, pid, fobj, progress, start)
+    else:
+        df, headers = _read_sheet(fobj.read())
+        if not headers:
+            raise ValueError(f'Excel mein koi valid column header nahi mila. Pehli {HEADER_ROWS} rows mein column names hone chahiye.')
+        df = df[headers]
+        with get_db() as conn:
+            col_map  = _import_columns(conn, pid, headers)
+            inserted = _import_frame(conn, pid, df, col_map, progress, start)
+        processed = len(df)
+    return {'rows': inserted, 'cols': len(headers), 'processed': processed,
+            'skipped': processed - inserted, 'mode': mode}
+
 @app.route('/api/projects/<int:pid>/import', methods=['POST'])
 def import_excel(pid):
     if 'file' not in request.files:
@@ -347,121 +2132,416 @@ def import_excel(pid):
     f = request.files['file']
     if not f.filename.endswith(('.xlsx','.xls')):
         return jsonify({'success': False, 'message': 'Only .xlsx / .xls'}), 400
+    if request.args.get('async'):
+        jid = uuid.uuid4().hex
+        path = _job_file(jid, f.filename.rsplit('.', 1)[-1].lower())
+        f.save(path)
+        job = submit_job('import', pid, {'path': path, 'filename': f.filename,
+                                         'mode': request.args.get('mode')}, jid)
+        return jsonify({'success': True, 'job': job_to_dict(job)}), 202
     try:
-        import re as _re
-        # ── File memory mein padho taaki multiple baar read kar sake ──
-        file_bytes = f.read()
-
-        def _clean_hdrs(df):
-            return [h for h in df.columns
-                    if str(h).strip()
-                    and not _re.match(r'^Unnamed:\s*\d+', str(h))
-                    and str(h).strip().lower() not in ('nan','none','')]
-
-        # Try 1: Row 1 as header (default)
-        df = pd.read_excel(io.BytesIO(file_bytes), dtype=str).fillna('')
-        headers = _clean_hdrs(df)
-
-        # Try 2: Row 2 as header (skip title row)
-        if not headers:
-            df = pd.read_excel(io.BytesIO(file_bytes), dtype=str, header=1).fillna('')
-            headers = _clean_hdrs(df)
-
-        # Try 3: Row 3 as header
-        if not headers:
-            df = pd.read_excel(io.BytesIO(file_bytes), dtype=str, header=2).fillna('')
-            headers = _clean_hdrs(df)
-
-        # Last resort: use all non-empty column names as-is
-        if not headers:
-            df = pd.read_excel(io.BytesIO(file_bytes), dtype=str).fillna('')
-            headers = [str(h).strip() for h in df.columns if str(h).strip()]
-            df.columns = [str(c).strip() for c in df.columns]
-
-        if not headers:
-            return jsonify({'success': False,
-                            'message': 'Excel mein koi valid column header nahi mila. Row 1 mein column names hone chahiye.'}), 400
+        res = import_file(pid, f.stream, f.filename, request.args.get('mode'))
+        return jsonify({'success': True, 'message': f"{res['rows']} rows imported", **res})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
 
-        df = df[headers]
+def _export_rows(conn, pid, progress=None):
+    """Header row, phir har record ki row — cursor se EXPORT_CHUNK rows ek baar mein"""
+    cols = [c for c in project_columns(conn, pid) if not c['deleted_at']]
+    keys = [str(c['id']) for c in cols]
+    yield [c['name'] for c in cols] + ['Notes', 'Tags', 'Created']
+    storage = project_storage(conn, pid)
+    cur = conn.execute(
+        "SELECT id, data, notes, tags, created_at FROM crm_records WHERE project_id=? "
+        "ORDER BY created_at DESC, id DESC", (pid,))
+    total = done = 0
+    if progress:
+        total = conn.execute("SELECT COUNT(*) as c FROM crm_records WHERE project_id=?",
+                             (pid,)).fetchone()['c']
+    while True:
+        chunk = cur.fetchmany(EXPORT_CHUNK)
+        if not chunk: break
+        data = load_data(conn, chunk, storage)
+        for r in chunk:
+            d = data[r['id']]
+            yield [d.get(k, '') for k in keys] + [r['notes'], r['tags'], fmt_date(r['created_at'])]
+        done += len(chunk)
+        if progress: progress(done, total)
+
+def export_xlsx(pid, out, progress=None):
+    """openpyxl write-only workbook — rows seedha file mein, poora sheet memory mein nahi"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    with get_db() as conn:
+        for row in _export_rows(conn, pid, progress): ws.append(row)
+    wb.save(out)
 
-        with get_db() as conn:
-            existing = {r['name'].strip().lower(): r['id'] for r in
-                        conn.execute("SELECT id,name FROM crm_columns WHERE project_id=?",
-                                     (pid,)).fetchall()}
-            col_map = {}
-            mo = conn.execute(
-                "SELECT MAX(col_order) as m FROM crm_columns WHERE project_id=?", (pid,)
-            ).fetchone()['m'] or 0
+def export_csv(pid, progress=None):
+    """CSV text chunks ka generator (UTF-8 BOM ke saath taaki Excel sahi khole)"""
+    buf = io.StringIO(); w = csv.writer(buf)
+    buf.write('\ufeff')
+    with get_db() as conn:
+        for i, row in enumerate(_export_rows(conn, pid, progress), 1):
+            w.writerow(row)
+            if i % EXPORT_CHUNK == 0:
+                yield buf.getvalue(); buf.seek(0); buf.truncate()
+    yield buf.getvalue()
 
-            for i, h in enumerate(headers):
-                k = h.strip().lower()
-                if k in existing:
-                    col_map[h] = existing[k]
-                else:
-                    c = conn.execute(
-                        "INSERT INTO crm_columns(project_id,name,col_type,col_order) VALUES(?,?,?,?)",
-                        (pid, h.strip(), 'text', mo+i+1))
-                    col_map[h] = c.lastrowid
-
-            inserted = 0
-            for _, row in df.iterrows():
-                rd = {str(col_map[h]): str(row[h]).strip()
-                      for h in headers
-                      if str(row[h]).strip() and str(row[h]).strip() != 'nan'}
-                if any(rd.values()):
-                    conn.execute(
-                        "INSERT INTO crm_records(project_id,data) VALUES(?,?)",
-                        (pid, json.dumps(rd)))
-                    inserted += 1
-
-        return jsonify({'success': True, 'message': f'{inserted} rows imported',
-                        'rows': inserted, 'cols': len(headers)})
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+def _export_name(pid, ext):
+    with get_db() as conn:
+        proj = conn.execute("SELECT name FROM projects WHERE id=?", (pid,)).fetchone()
+    return f"{proj['name'] if proj else 'export'}.{ext}"
 
 @app.route('/api/projects/<int:pid>/export')
 def export_excel(pid):
-    with get_db() as conn:
-        proj = conn.execute("SELECT name FROM projects WHERE id=?", (pid,)).fetchone()
-        cols = conn.execute(
-            "SELECT * FROM crm_columns WHERE project_id=? ORDER BY col_order", (pid,)).fetchall()
-        recs = conn.execute(
-            "SELECT * FROM crm_records WHERE project_id=? ORDER BY created_at DESC",
-            (pid,)).fetchall()
-    rows = []
-    for r in recs:
-        try:    d = json.loads(r['data'])
-        except: d = {}
-        row = {c['name']: d.get(str(c['id']),'') for c in cols}
-        row['Notes']   = r['notes']
-        row['Tags']    = r['tags']
-        row['Created'] = fmt_date(r['created_at'])
-        rows.append(row)
-    out = io.BytesIO()
-    pd.DataFrame(rows).to_excel(out, index=False, engine='openpyxl')
+    """?format=xlsx (default) | csv   ?async=1 → background job, result /api/jobs/<id>/download"""
+    if request.args.get('async'):
+        job = submit_job('export', pid, {'format': request.args.get('format', 'xlsx')})
+        return jsonify({'success': True, 'job': job_to_dict(job)}), 202
+    if request.args.get('format') == 'csv':
+        fname = _export_name(pid, 'csv')
+        return Response(stream_with_context(export_csv(pid)), mimetype='text/csv',
+                        headers={'Content-Disposition':
+                                 f"attachment; filename=\"{secure_filename(fname) or 'export.csv'}\"; "
+                                 f"filename*=UTF-8''{quote(fname)}"})
+    out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    export_xlsx(pid, out)
     out.seek(0)
-    fname = f"{proj['name'] if proj else 'export'}.xlsx"
     return send_file(out,
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True, download_name=fname)
+        as_attachment=True, download_name=_export_name(pid, 'xlsx'))
 
 @app.route('/api/stats/<int:pid>')
 def stats(pid):
     today = date.today().isoformat()
     with get_db() as conn:
-        records     = conn.execute("SELECT COUNT(*) as c FROM crm_records WHERE project_id=?",
-                                   (pid,)).fetchone()['c']
-        columns     = conn.execute("SELECT COUNT(*) as c FROM crm_columns WHERE project_id=?",
-                                   (pid,)).fetchone()['c']
-        today_c     = conn.execute(
-            "SELECT COUNT(*) as c FROM crm_records WHERE project_id=? AND date(created_at)=?",
-            (pid, today)).fetchone()['c']
-        attachments = conn.execute(
-            "SELECT COUNT(*) as c FROM attachments a "
-            "JOIN crm_records r ON a.record_id=r.id WHERE r.project_id=?",
-            (pid,)).fetchone()['c']
-    return jsonify({'records': records, 'columns': columns,
-                    'attachments': attachments, 'today': today_c})
+        st = conn.execute("SELECT * FROM project_stats WHERE project_id=?", (pid,)).fetchone()
+    if not st: return jsonify({'records': 0, 'columns': 0, 'attachments': 0, 'today': 0})
+    return _conditional(f"s{pid}.{st['version']}.{today}", lambda: jsonify({
+        'records': st['records'], 'columns': st['columns'], 'attachments': st['attachments'],
+        'today': st['today_count'] if st['today_date'] == today else 0}))
+
+
+# ─────────────── JOBS ───────────────
+# SQLite `jobs` table par chalne wali background queue — har process mein JOB_WORKERS threads.
+# Process mar jaaye toh job 'running' reh jaati hai; owner ka pid mara ho ya heartbeat
+# JOB_STALE sec purana ho toh koi bhi worker usse dobara queue kar deta hai. Heartbeat ek alag
+# thread likhta hai (lamba step bina progress ke bhi chale); job kisi aur ki ho gayi toh purana
+# worker agle update() par JobLost se ruk jaata hai — do workers ek hi job nahi chalate.
+JOB_KINDS = {}
+_job_wake = threading.Event()
+_job_lock = threading.Lock()
+_job_pid  = None
+_job_running = {}   # is process mein chal rahi jobs: id → owner (heartbeat ke liye)
+_job_pruned  = 0
+
+class JobCancelled(Exception):
+    pass
+
+class JobLost(Exception):
+    """Job ka owner badal gaya — kisi aur worker ne dobara queue se le li"""
+
+class Job:
+    def __init__(self, row):
+        self.id, self.kind, self.project_id = row['id'], row['kind'], row['project_id']
+        self.params = json.loads(row['params'] or '{}')
+        self.result = json.loads(row['result'] or '{}')
+        self.done   = row['progress']   # resume ke liye — pichli baar kahan tak pahuncha
+        self.owner  = row['owner']
+
+    def update(self, done, total=None, **result):
+        """Progress + heartbeat likho aur thread ke connection par commit karo — caller ka
+        adhoora batch bhi isi commit mein jaata hai. Cancel hua ho toh JobCancelled; job ab
+        hamari nahi (owner badla) toh batch rollback aur JobLost."""
+        self.done = done
+        self.result.update(result)
+        conn = get_db()
+        if not conn.execute(
+                "UPDATE jobs SET progress=?, total=COALESCE(?,total), result=?, "
+                "heartbeat=datetime('now'), updated_at=datetime('now') WHERE id=? AND owner=?",
+                (done, total, json.dumps(self.result), self.id, self.owner)).rowcount:
+            conn.rollback()
+            raise JobLost()
+        if conn.execute("SELECT cancel FROM jobs WHERE id=?", (self.id,)).fetchone()['cancel']:
+            raise JobCancelled()
+        conn.commit()
+
+def job_kind(name):
+    def deco(fn):
+        JOB_KINDS[name] = fn
+        return fn
+    return deco
+
+def submit_job(kind, pid=None, params=None, jid=None):
+    jid = jid or uuid.uuid4().hex
+    with get_db() as conn:
+        conn.execute("INSERT INTO jobs(id,kind,project_id,params) VALUES(?,?,?,?)",
+                     (jid, kind, pid, json.dumps(params or {})))
+        row = conn.execute("SELECT * FROM jobs WHERE id=?", (jid,)).fetchone()
+    start_job_workers()
+    _job_wake.set()
+    return row
+
+def job_to_dict(row):
+    res = json.loads(row['result'] or '{}')
+    d = {k: row[k] for k in ('id','kind','project_id','status','progress','total',
+                             'message','created_at','updated_at')}
+    d['result'] = {k: v for k, v in res.items() if k != 'file'}
+    if row['status'] == 'done' and res.get('file'):
+        d['download_url'] = url_for('download_job', jid=row['id'])
+    return d
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _pid_alive(pid):
+    try:    os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except OSError: pass
+    return True
+
+def _claim_job():
+    conn = get_db()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE jobs SET status='queued', owner=NULL "
+                     "WHERE status='running' AND heartbeat < datetime('now', ?)",
+                     (f'-{JOB_STALE} seconds',))
+        host = socket.gethostname()
+        for r in conn.execute("SELECT id, owner FROM jobs WHERE status='running'").fetchall():
+            h, pid, _ = (r['owner'] or '::').split(':')
+            if h == host and pid.isdigit() and not _pid_alive(int(pid)):
+                conn.execute("UPDATE jobs SET status='queued', owner=NULL WHERE id=?", (r['id'],))
+        conn.execute("UPDATE jobs SET status='failed', message='Too many restarts' "
+                     "WHERE status='queued' AND attempts >= ?", (JOB_ATTEMPTS,))
+        row = conn.execute("SELECT * FROM jobs WHERE status='queued' "
+                           "ORDER BY created_at, rowid LIMIT 1").fetchone()
+        if row is None: return None
+        job = Job(row)
+        job.owner = _owner()
+        conn.execute("UPDATE jobs SET status='running', owner=?, attempts=attempts+1, "
+                     "heartbeat=datetime('now'), updated_at=datetime('now') WHERE id=?",
+                     (job.owner, job.id))
+    return job
+
+def _run_job(job):
+    conn = get_db()
+    _job_running[job.id] = job.owner
+    try:
+        res = JOB_KINDS[job.kind](job) or {}
+        status, msg = 'done', res.pop('message', '')
+    except JobCancelled:
+        res, status, msg = {}, 'cancelled', 'Cancelled'
+    except JobLost:   # naya owner chala raha hai — status wahi likhega
+        res, status, msg = None, None, None
+    except Exception as e:
+        res, status, msg = {}, 'failed', str(e)
+    finally:
+        _job_running.pop(job.id, None)
+    if conn.in_transaction: conn.rollback()
+    if status is None: return
+    job.result.update(res)
+    with conn:
+        conn.execute("UPDATE jobs SET status=?, message=?, result=?, owner=NULL, "
+                     "updated_at=datetime('now') WHERE id=? AND owner=?",
+                     (status, msg, json.dumps(job.result), job.id, job.owner))
+
+def _job_heartbeat():
+    """Is process ki chal rahi jobs ka heartbeat — JOB_STALE ke chauthai par"""
+    while True:
+        time.sleep(JOB_STALE / 4)
+        try:
+            with get_db() as conn:
+                conn.executemany("UPDATE jobs SET heartbeat=datetime('now') WHERE id=? AND owner=?",
+                                 list(_job_running.items()))
+        except sqlite3.Error:   # DB busy — agle round mein
+            pass
+
+def prune_jobs(conn):
+    """JOB_TTL se purani khatam jobs ki rows, aur JOB_FOLDER ki woh files (export result, import
+    upload) jinki job row nahi aur JOB_TTL se purani hain → (rows, files)"""
+    with conn:
+        n = conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') "
+                         "AND updated_at < datetime('now', ?)", (f'-{JOB_TTL} seconds',)).rowcount
+    live = {r['id'] for r in conn.execute("SELECT id FROM jobs").fetchall()}
+    files, old = 0, time.time() - JOB_TTL
+    for e in os.scandir(app.config['JOB_FOLDER']):
+        if e.name.split('.')[0] in live: continue
+        try:
+            if e.stat().st_mtime < old: os.remove(e.path); files += 1
+        except OSError: pass
+    return n, files
+
+def _job_worker():
+    global _job_pruned
+    while True:
+        try:
+            job = _claim_job()
+        except sqlite3.Error:   # DB busy — agle round mein
+            job = None
+        if job is None:
+            if time.time() > _job_pruned + JOB_PRUNE_EVERY:
+                _job_pruned = time.time()
+                try: prune_jobs(get_db())
+                except sqlite3.Error: pass
+            _job_wake.wait(JOB_POLL); _job_wake.clear()
+            continue
+        _run_job(job)
+
+def start_job_workers():
+    """Is process ke worker threads (fork ke baad dobara) — pehli request par ya submit par"""
+    global _job_pid
+    if JOB_WORKERS <= 0 or _job_pid == os.getpid(): return
+    with _job_lock:
+        if _job_pid == os.getpid(): return
+        _job_pid = os.getpid()
+        for i in range(JOB_WORKERS):
+            threading.Thread(target=_job_worker, name=f'crm-job-{i}', daemon=True).start()
+        threading.Thread(target=_job_heartbeat, name='crm-job-heartbeat', daemon=True).start()
+
+@app.before_request
+def _boot_job_workers():
+    start_job_workers()
+
+def _job_file(jid, ext):
+    return os.path.join(app.config['JOB_FOLDER'], f'{jid}.{ext}')
+
+@job_kind('import')
+def _job_import(job):
+    p, base, lost = job.params, job.result.get('rows', 0), False
+    try:
+        with open(p['path'], 'rb') as f:
+            res = import_file(job.project_id, f, p['filename'], p.get('mode'),
+                              lambda done, total, ins: job.update(done, total, rows=base + ins),
+                              start=job.done)
+    except JobLost:
+        lost = True; raise   # file naye owner ko chahiye
+    finally:
+        if not lost:
+            try: os.remove(p['path'])
+            except OSError: pass
+    rows = base + res['rows']
+    return {'rows': rows, 'cols': res['cols'], 'message': f'{rows} rows imported'}
+
+@job_kind('export')
+def _job_export(job):
+    fmt  = 'csv' if job.params.get('format') == 'csv' else 'xlsx'
+    path = _job_file(job.id, fmt)
+    progress = lambda done, total: job.update(done, total)
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in export_csv(job.project_id, progress): f.write(chunk)
+    else:
+        with open(path, 'wb') as f: export_xlsx(job.project_id, f, progress)
+    return {'file': path, 'filename': _export_name(job.project_id, fmt), 'message': 'Export ready'}
+
+@job_kind('delete_project')
+def _job_delete_project(job):
+    """Records DELETE_BATCH ke batches mein — har batch alag transaction, lock chhota rehta hai"""
+    pid, conn, done = job.project_id, get_db(), job.done
+    total = done + conn.execute("SELECT COUNT(*) as c FROM crm_records WHERE project_id=?",
+                                (pid,)).fetchone()['c']
+    while True:
+        rids = [r['id'] for r in conn.execute(
+            "SELECT id FROM crm_records WHERE project_id=? LIMIT ?", (pid, DELETE_BATCH)).fetchall()]
+        if not rids: break
+        conn.execute(f"DELETE FROM crm_records WHERE id IN ({','.join('?' * len(rids))})", rids)
+        done += len(rids)
+        job.update(done, total)
+        release_blobs(conn)
+    with conn:
+        conn.execute("DELETE FROM projects WHERE id=?", (pid,))
+    release_blobs(conn)
+    sync_column_indexes(conn)
+    return {'message': f'{done} records deleted'}
+
+
+@job_kind('compact_columns')
+def _job_compact_columns(job):
+    base = job.done
+    done = compact_columns(get_db(), job.project_id,
+                           lambda done, total, last: job.update(base + done, total, last=last),
+                           start=job.result.get('last'))
+    sync_column_indexes(get_db())   # deleted column ka index bhi jaaye
+    return {'message': f'{base + done} records compacted'}
+
+@job_kind('column_indexes')
+def _job_column_indexes(job):
+    made, dropped = sync_column_indexes(get_db())
+    return {'created': made, 'dropped': dropped,
+            'message': f'{len(made)} index(es) created, {len(dropped)} dropped'}
+
+@job_kind('dedupe_uploads')
+def _job_dedupe_uploads(job):
+    n, saved = dedupe_uploads(get_db(), lambda done, total: job.update(done, total))
+    queue_once('thumbnails')   # naye paths ke thumbnails
+    return {'files': n, 'reclaimed': saved,
+            'message': f'{n} files checked, {_human_size(saved)} reclaimed'}
+
+@job_kind('purge_files')
+def _job_purge_files(job):
+    n, size, failed = purge_files(get_db(), lambda done, total: job.update(done, total))
+    return {'files': n, 'reclaimed': size, 'failed': failed,
+            'message': f'{n} files removed, {_human_size(size)} reclaimed'
+                       + (f', {failed} failed' if failed else '')}
+
+@job_kind('thumbnails')
+def _job_thumbnails(job):
+    n, made = make_thumbnails(get_db(), lambda done, total: job.update(done, total))
+    return {'files': n, 'thumbnails': made, 'message': f'{made} of {n} thumbnails made'}
+
+@job_kind('convert_storage')
+def _job_convert_storage(job):
+    base = job.done
+    done = convert_storage(get_db(), job.project_id, job.params['storage'],
+                           lambda done, total, last: job.update(base + done, total, last=last),
+                           start=job.result.get('last'))
+    sync_column_indexes(get_db())   # expression indexes sirf JSON projects par
+    return {'message': f"{base + done} records converted to {job.params['storage']}"}
+
+
+# ─────────────── API — JOBS ───────────────
+@app.route('/api/metrics')
+def metrics():
+    return jsonify({'success': True, 'meta_cache': _meta.stats()})
+
+@app.route('/api/jobs')
+def list_jobs():
+    sql, params = "SELECT * FROM jobs WHERE 1=1", []
+    for k in ('project_id', 'status', 'kind'):
+        if request.args.get(k):
+            sql += f" AND {k}=?"; params.append(request.args[k])
+    with get_db() as conn:
+        rows = conn.execute(sql + " ORDER BY created_at DESC, rowid DESC LIMIT 50", params).fetchall()
+    return jsonify({'success': True, 'jobs': [job_to_dict(r) for r in rows]})
+
+@app.route('/api/jobs/<jid>')
+def get_job(jid):
+    with get_db() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id=?", (jid,)).fetchone()
+    if not row: return jsonify({'success': False}), 404
+    return jsonify({'success': True, 'job': job_to_dict(row)})
+
+@app.route('/api/jobs/<jid>/cancel', methods=['POST'])
+def cancel_job(jid):
+    with get_db() as conn:
+        conn.execute("UPDATE jobs SET cancel=1, updated_at=datetime('now') WHERE id=?", (jid,))
+        conn.execute("UPDATE jobs SET status='cancelled', message='Cancelled' "
+                     "WHERE id=? AND status='queued'", (jid,))
+        row = conn.execute("SELECT * FROM jobs WHERE id=?", (jid,)).fetchone()
+    if not row: return jsonify({'success': False}), 404
+    return jsonify({'success': True, 'job': job_to_dict(row)})
+
+@app.route('/api/jobs/<jid>/download')
+def download_job(jid):
+    with get_db() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id=?", (jid,)).fetchone()
+    res = json.loads(row['result'] or '{}') if row else {}
+    if not row or row['status'] != 'done' or not res.get('file') or not os.path.exists(res['file']):
+        return jsonify({'success': False, 'message': 'Result not available'}), 404
+    return send_file(res['file'], as_attachment=True, download_name=res.get('filename'))
 
 
 # ─────────────── HTML ───────────────
@@ -569,6 +2649,8 @@ th{background:var(--s2);padding:8px 10px;text-align:left;font-size:9px;letter-sp
    text-transform:uppercase;color:var(--t3);font-weight:500;border-bottom:2px solid var(--b1);
    white-space:nowrap}
 .th-w{display:flex;align-items:center;gap:4px}
+.th-s{cursor:pointer;user-select:none}
+.th-s:hover{color:var(--acc)}
 .dc{opacity:0;cursor:pointer;color:var(--err);font-size:12px;transition:.15s}
 th:hover .dc{opacity:1}
 td{padding:7px 10px;border-bottom:1px solid rgba(26,48,80,.4);color:var(--t1);
@@ -576,6 +2658,7 @@ td{padding:7px 10px;border-bottom:1px solid rgba(26,48,80,.4);color:var(--t1);
 tr:hover td{background:rgba(0,200,255,.025)}
 .td-n{color:var(--t3);font-size:10px;width:30px;text-align:right}
 .td-act{white-space:nowrap;width:1%}
+.vs td{padding:0;border:0}
 
 /* Att btn */
 .att-btn{display:inline-flex;align-items:center;gap:4px;padding:3px 8px;border-radius:5px;
@@ -736,6 +2819,13 @@ select option{background:var(--s2)}
         <line x1="12" y1="3" x2="12" y2="15"/>
       </svg>Export Excel
     </div>
+    <div class="ni" onclick="doExport('csv')">
+      <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+        <path d="M21 15v4a2 2 0 01-2 2H5a2 2 0 01-2-2v-4"/>
+        <polyline points="17 8 12 3 7 8"/>
+        <line x1="12" y1="3" x2="12" y2="15"/>
+      </svg>Export CSV
+    </div>
   </div>
   <div class="side-foot">SQLite · Flask · Python</div>
 </aside>
@@ -1006,6 +3096,15 @@ select option{background:var(--s2)}
 const COLORS = ['#00c8ff','#00e07a','#ff9500','#ff3d5a','#a855f7','#f59e0b','#06b6d4','#84cc16'];
 let projects=[], curPid=null, cols=[], curRecId=null, curAttId=null, stimer=null;
 let activeTab='full', selColor=COLORS[0];
+const REC_BLOCK=500, REC_BUF=20, REC_KEEP=200;   // grid: rows per fetch, extra rows, max blocks
+let recBlocks=new Map(), recCursors=new Map(), recLoading=new Set(), recTotal=null, recSeq=0;
+let recRowH=34, recFrame=0, recFetchT=null;
+let recSort='';   // '<col_id>:asc|desc' — server par sort hota hai
+
+// ════ FETCH ════
+// GET APIs ETag bhejte hain — cache:'no-cache' se browser If-None-Match ke saath revalidate
+// karta hai aur 304 par apni cached copy deta hai (data badla na ho toh body dobara nahi aati)
+function getJSON(u){ return fetch(u,{cache:'no-cache'}).then(r=>r.json()); }
 
 // ════ BOOT ════
 (async()=>{
@@ -1030,7 +3129,7 @@ function pickColor(clr,el){
 
 // ════ PROJECTS ════
 async function loadProjects(){
-  const r = await fetch('/api/projects').then(r=>r.json());
+  const r = await getJSON('/api/projects');
   projects = r.projects;
   renderFileList();
 }
@@ -1052,7 +3151,7 @@ function renderFileList(){
 }
 
 async function selectProject(pid){
-  curPid=pid;
+  curPid=pid; recSort='';
   const p=projects.find(x=>x.id===pid);
   // File-specific color
   document.documentElement.style.setProperty('--fc', p?p.color:'#00c8ff');
@@ -1120,7 +3219,7 @@ function gotoSection(sec){
 // ════ STATS ════
 async function loadStats(){
   if(!curPid) return;
-  const r=await fetch('/api/stats/'+curPid).then(r=>r.json());
+  const r=await getJSON('/api/stats/'+curPid);
   document.getElementById('sRec').textContent   = r.records;
   document.getElementById('sCols').textContent  = r.columns;
   document.getElementById('sAtts').textContent  = r.attachments;
@@ -1132,7 +3231,7 @@ async function loadStats(){
 // ════ COLUMNS ════
 async function loadCols(){
   if(!curPid) return;
-  const r=await fetch('/api/projects/'+curPid+'/columns').then(r=>r.json());
+  const r=await getJSON('/api/projects/'+curPid+'/columns');
   cols=r.columns;
 }
 
@@ -1152,8 +3251,11 @@ function renderColList(){
         <span style="color:var(--t3);font-size:10px;min-width:18px">${i+1}.</span>
         <span style="font-weight:600">${c.name}</span>
         <span class="ct-badge">${c.col_type}</span>
+        ${c.indexed?'<span class="ct-badge" title="Is column par filter / sort index se">⚡ indexed</span>':''}
       </div>
       <div style="display:flex;gap:5px;flex-shrink:0">
+        <button class="btn btn-g btn-sm" title="Is column par filter / sort tez karo (background mein index banta hai)"
+          onclick="toggleColIndex(${c.id},${c.indexed?0:1})">${c.indexed?'Unindex':'Index'}</button>
         <button class="btn btn-g btn-sm" title="Is column ke BAAD naya column insert karo"
           onclick="openInsertAfter(${c.id},'${c.name.replace(/'/g,"\\'")}')">Insert ↓</button>
         <button class="btn btn-err btn-sm" onclick="delCol(${c.id},'${c.name}')">Delete</button>
@@ -1222,6 +3324,14 @@ async function saveCol(){
   else toast(r.message,'err');
 }
 
+async function toggleColIndex(id,on){
+  const r=await fetch('/api/projects/'+curPid+'/columns/'+id,{method:'PATCH',
+    headers:{'Content-Type':'application/json'},body:JSON.stringify({indexed:!!on})}).then(r=>r.json());
+  if(!r.success){toast(r.message||'Failed','err');return;}
+  toast(on?'Index ban raha hai (background)':'Index hat raha hai','ok');
+  await loadCols(); renderColList();
+}
+
 async function delCol(id,name){
   if(!confirm(`Column "${name}" delete karna chahte ho?`)) return;
   await fetch('/api/projects/'+curPid+'/columns/'+id,{method:'DELETE'});
@@ -1229,50 +3339,129 @@ async function delCol(id,name){
 }
 
 // ════ RECORDS ════
+// Virtual grid: DOM mein sirf dikhne wali rows (+ REC_BUF upar/neeche), baaki height do spacer
+// rows se. Data REC_BLOCK rows ke blocks mein aata hai (?format=columns) — block k ka cursor
+// block k-1 se milta hai; scrollbar kheench ke beech mein kude toh ?offset= se. Door ke blocks
+// REC_KEEP se zyada hon toh memory se hata dete hain (cursor yaad rehta hai).
 function onSearch(){clearTimeout(stimer); stimer=setTimeout(loadRecs,280);}
 
-async function loadRecs(){
+// keep=true → scroll position wahi rahe (edit / delete ke baad)
+async function loadRecs(keep){
   if(!curPid) return;
-  const q=document.getElementById('srchInput').value;
-  const r=await fetch('/api/projects/'+curPid+'/records?q='+encodeURIComponent(q)).then(r=>r.json());
-  renderTable(r.records);
-  document.getElementById('recInfo').textContent=r.total+' records';
+  recSeq++; recBlocks=new Map(); recCursors=new Map(); recLoading=new Set(); recTotal=null;
+  const ta=document.querySelector('.table-area');
+  if(keep!==true) ta.scrollTop=0;
+  renderHead();
+  await fetchBlock(0);
+}
+
+function recURL(){
+  let u='/api/projects/'+curPid+'/records?format=columns&limit='+REC_BLOCK
+    +'&q='+encodeURIComponent(document.getElementById('srchInput').value);
+  if(recSort) u+='&sort='+encodeURIComponent(recSort);
+  return u;
 }
 
-function renderTable(recs){
-  const head=document.getElementById('tHead');
-  const body=document.getElementById('tBody');
+async function fetchBlock(k){
+  if(recBlocks.has(k) || recLoading.has(k)) return;
+  const seq=recSeq; recLoading.add(k);
+  let u=recURL();
+  if(k>0) u+='&count=none'+(recCursors.has(k)
+    ?'&cursor='+encodeURIComponent(recCursors.get(k)):'&offset='+k*REC_BLOCK);
+  const r=await getJSON(u).finally(()=>{ if(seq===recSeq) recLoading.delete(k); });
+  if(seq!==recSeq) return;           // beech mein search / file / sort badal gayi
+  if(!r.success){toast('Error: '+r.message,'err');return;}
+  const p=r.records;
+  const vals=cols.map(c=>{
+    const v=p.data[p.fields.indexOf(String(c.id))]||[];
+    return v.dict?v.codes.map(x=>v.dict[x]):v;   // dictionary-encoded column
+  });
+  recBlocks.set(k,{id:p.id, created_at:p.created_at, att_count:p.att_count, vals});
+  if(r.has_more) recCursors.set(k+1, r.next_cursor);
+  if(k===0 && r.total!==null) recTotal={n:r.total, exact:r.total_exact};
+  const seen=k*REC_BLOCK+p.id.length;
+  if(!r.has_more) recTotal={n:seen, exact:true};
+  else if(!recTotal || (!recTotal.exact && recTotal.n<seen+REC_BLOCK)) recTotal={n:seen+REC_BLOCK, exact:false};
+  if(recBlocks.size>REC_KEEP){         // sabse door wala block hatao
+    const cur=Math.floor(document.querySelector('.table-area').scrollTop/recRowH/REC_BLOCK);
+    let far=k;
+    for(const b of recBlocks.keys()) if(Math.abs(b-cur)>Math.abs(far-cur)) far=b;
+    recBlocks.delete(far);
+  }
+  renderGrid();
+}
+
+// Header click: asc → desc → default order
+function sortBy(cid){
+  const [sc, sd]=recSort.split(':');
+  recSort = sc!=cid ? cid+':asc' : (sd==='asc' ? cid+':desc' : '');
+  loadRecs();
+}
+
+function renderHead(){
+  const [sc, sd]=recSort.split(':');
   const hcols=cols.map(c=>`
-    <th><div class="th-w">${c.name}
+    <th><div class="th-w"><span class="th-s" onclick="sortBy(${c.id})">${c.name}${
+      sc==c.id?(sd==='asc'?' ▲':' ▼'):''}</span>
       <span class="dc" onclick="delCol(${c.id},'${c.name}')">✕</span>
     </div></th>`).join('');
-  head.innerHTML=`<tr>
+  document.getElementById('tHead').innerHTML=`<tr>
     <th style="color:var(--t3);width:30px">#</th>${hcols}
     <th>📎 Files</th><th>Added</th>
     <th style="text-align:right">Actions</th></tr>`;
-  if(!recs.length){
-    body.innerHTML=`<tr><td colspan="${cols.length+4}">
+}
+
+function scheduleGrid(){ if(!recFrame) recFrame=requestAnimationFrame(renderGrid); }
+
+function renderGrid(){
+  recFrame=0;
+  const body=document.getElementById('tBody'), ta=document.querySelector('.table-area');
+  const n=recTotal?recTotal.n:0, span=cols.length+4;
+  document.getElementById('recInfo').textContent=recTotal?n+(recTotal.exact?'':'+')+' records':'';
+  if(!n){
+    body.innerHTML=recTotal?`<tr><td colspan="${span}">
       <div class="empty"><h3>Koi record nahi</h3>
-      <p>Add Record ya Import Excel se data daalo</p></div></td></tr>`;
+      <p>Add Record ya Import Excel se data daalo</p></div></td></tr>`:'';
     return;
   }
-  body.innerHTML=recs.map((rec,i)=>{
-    const cells=cols.map(c=>{
-      const v=rec.data[c.id]||'';
-      return `<td title="${v.replace(/"/g,'&quot;')}">${v||'<span style="color:var(--t3)">—</span>'}</td>`;
-    }).join('');
-    const ac=rec.attachments.length;
-    const abtn=ac
-      ?`<span class="att-btn has" onclick="openAtt(${rec.id})">📎 ${ac} file${ac>1?'s':''}</span>`
-      :`<span class="att-btn" onclick="openAtt(${rec.id})">📎 Add</span>`;
-    return `<tr>
-      <td class="td-n">${i+1}</td>${cells}<td>${abtn}</td>
-      <td style="color:var(--t3);font-size:10px;white-space:nowrap">${rec.created_at}</td>
-      <td class="td-act" style="text-align:right">
-        <button class="btn btn-g btn-ico btn-sm" onclick="openEditRec(${rec.id})">✏️</button>
-        <button class="btn btn-err btn-ico btn-sm" onclick="delRec(${rec.id})">🗑</button>
-      </td></tr>`;
+  const first=Math.max(0, Math.floor(ta.scrollTop/recRowH)-REC_BUF);
+  const last=Math.min(n, Math.ceil((ta.scrollTop+ta.clientHeight)/recRowH)+REC_BUF);
+  const need=new Set();
+  let html='';
+  for(let i=first;i<last;i++){
+    const k=Math.floor(i/REC_BLOCK), b=recBlocks.get(k), j=i-k*REC_BLOCK;
+    if(!b){
+      need.add(k);
+      html+=`<tr class="vr" style="height:${recRowH}px"><td class="td-n">${i+1}</td>
+        <td colspan="${span-1}" style="color:var(--t3)">…</td></tr>`;
+    } else if(j<b.id.length) html+=recRow(b,j,i);
+  }
+  body.innerHTML=`<tr class="vs" style="height:${first*recRowH}px"><td colspan="${span}"></td></tr>`+html
+    +`<tr class="vs" style="height:${(n-last)*recRowH}px"><td colspan="${span}"></td></tr>`;
+  // tez scroll / drag mein har guzarte block ki request na jaaye — thehre tab maango
+  clearTimeout(recFetchT);
+  if(need.size) recFetchT=setTimeout(()=>need.forEach(fetchBlock), 90);
+  const tr=body.querySelector('tr.vr[data-id]');
+  if(tr && Math.abs(tr.offsetHeight-recRowH)>1){ recRowH=tr.offsetHeight; scheduleGrid(); }
+}
+
+function recRow(b, j, i){
+  const id=b.id[j];
+  const cells=b.vals.map(col=>{
+    const v=col[j]==null?'':String(col[j]);
+    return `<td title="${v.replace(/"/g,'&quot;')}">${v||'<span style="color:var(--t3)">—</span>'}</td>`;
   }).join('');
+  const ac=b.att_count[j];
+  const abtn=ac
+    ?`<span class="att-btn has" onclick="openAtt(${id})">📎 ${ac} file${ac>1?'s':''}</span>`
+    :`<span class="att-btn" onclick="openAtt(${id})">📎 Add</span>`;
+  return `<tr class="vr" data-id="${id}" style="height:${recRowH}px">
+    <td class="td-n">${i+1}</td>${cells}<td>${abtn}</td>
+    <td style="color:var(--t3);font-size:10px;white-space:nowrap">${b.created_at[j]}</td>
+    <td class="td-act" style="text-align:right">
+      <button class="btn btn-g btn-ico btn-sm" onclick="openEditRec(${id})">✏️</button>
+      <button class="btn btn-err btn-ico btn-sm" onclick="delRec(${id})">🗑</button>
+    </td></tr>`;
 }
 
 // ════ ADD/EDIT RECORD ════
@@ -1318,7 +3507,7 @@ function openAddRec(){
 }
 
 async function openEditRec(id){
-  const r=await fetch('/api/records/'+id).then(r=>r.json());
+  const r=await getJSON('/api/records/'+id);
   curRecId=id;
   document.getElementById('mRecT').textContent='Edit Record #'+id;
   document.getElementById('recTabs').style.display='none';
@@ -1352,7 +3541,7 @@ async function saveRec(){
       method:'POST',headers:{'Content-Type':'application/json'},
       body:JSON.stringify({data:{[colId]:val},tags:'',notes:''})
     }).then(r=>r.json());
-    if(r.success){toast('Record added!','ok');closeM('mRec');loadRecs();loadStats();}
+    if(r.success){toast('Record added!','ok');closeM('mRec');loadRecs(true);loadStats();}
     else toast(r.message||'Error','err');
     return;
   }
@@ -1364,14 +3553,14 @@ async function saveRec(){
   const u=curRecId?'/api/records/'+curRecId:'/api/projects/'+curPid+'/records';
   const r=await fetch(u,{method:m,headers:{'Content-Type':'application/json'},
     body:JSON.stringify(payload)}).then(r=>r.json());
-  if(r.success){toast(curRecId?'Updated!':'Record added!','ok');closeM('mRec');loadRecs();loadStats();}
+  if(r.success){toast(curRecId?'Updated!':'Record added!','ok');closeM('mRec');loadRecs(true);loadStats();}
   else toast(r.message||'Error','err');
 }
 
 async function delRec(id){
   if(!confirm('Record aur uski files delete karna chahte ho?')) return;
   await fetch('/api/records/'+id,{method:'DELETE'});
-  toast('Deleted','ok'); loadRecs(); loadStats();
+  toast('Deleted','ok'); loadRecs(true); loadStats();
 }
 
 // ════ ATTACHMENTS ════
@@ -1383,7 +3572,7 @@ async function openAtt(recId){
 }
 
 async function refreshAtts(){
-  const r=await fetch('/api/records/'+curAttId).then(r=>r.json());
+  const r=await getJSON('/api/records/'+curAttId);
   const atts=r.record.attachments;
   const el=document.getElementById('attList');
   if(!atts.length){
@@ -1391,8 +3580,9 @@ async function refreshAtts(){
   } else {
     el.innerHTML=atts.map(a=>{
       const icon=a.file_type==='image'?'🖼️':a.file_type==='video'?'🎬':a.file_type==='pdf'?'📄':'📁';
-      const prev=a.file_type==='image'
-        ?`<img class="att-thumb" src="${a.url}" onerror="this.outerHTML='<div class=att-ico>🖼️</div>'">`
+      const src=a.thumb_url||(a.file_type==='image'?a.url:'');
+      const prev=src
+        ?`<img class="att-thumb" src="${src}" loading="lazy" onerror="this.outerHTML='<div class=att-ico>${icon}</div>'">`
         :`<div class="att-ico">${icon}</div>`;
       return `<div class="att-item">${prev}
         <div class="att-inf">
@@ -1407,6 +3597,9 @@ async function refreshAtts(){
         </div></div>`;
     }).join('');
   }
+  for(const b of recBlocks.values()){   // grid ki cached ginti bhi
+    const j=b.id.indexOf(curAttId); if(j>=0) b.att_count[j]=atts.length;
+  }
   const oldBtn=document.querySelector(`[onclick="openAtt(${curAttId})"]`);
   if(oldBtn){
     oldBtn.className=atts.length?'att-btn has':'att-btn';
@@ -1424,8 +3617,12 @@ async function doUpload(){
   ov.innerHTML=`<span class="spin"></span>&nbsp;Uploading…`;
   body.appendChild(ov);
   for(const f of files){
-    const fd=new FormData(); fd.append('file',f);
-    const r=await fetch('/api/records/'+curAttId+'/attachments',{method:'POST',body:fd}).then(r=>r.json());
+    let r;
+    if(f.size>CHUNKED_MIN) r=await uploadChunked(f,p=>{ov.innerHTML=`<span class="spin"></span>&nbsp;Uploading… ${Math.floor(p*100)}%`;});
+    else{
+      const fd=new FormData(); fd.append('file',f);
+      r=await fetch('/api/records/'+curAttId+'/attachments',{method:'POST',body:fd}).then(r=>r.json());
+    }
     if(!r.success) toast('Error: '+r.message,'err');
   }
   ov.remove();
@@ -1434,6 +3631,45 @@ async function doUpload(){
   await refreshAtts();
 }
 
+// Badi file — chunked upload: har chunk alag PUT (sha256 ke saath), fail ho toh 3 baar retry.
+// Session id localStorage mein — page reload ke baad wahi file dobara chuno toh jo chunks server
+// par aa chuke woh dobara nahi jaate.
+const CHUNKED_MIN=8*1024*1024;
+async function uploadChunked(f, onProgress){
+  const key=`upl:${curAttId}:${f.name}:${f.size}:${f.lastModified}`;
+  let up=null, r;
+  if(localStorage[key]){
+    r=await getJSON('/api/uploads/'+localStorage[key]).catch(()=>({}));
+    if(r.success) up=r.upload;
+  }
+  if(!up){
+    r=await fetch('/api/records/'+curAttId+'/uploads',{method:'POST',headers:{'Content-Type':'application/json'},
+      body:JSON.stringify({filename:f.name,size:f.size})}).then(r=>r.json());
+    if(!r.success) return r;
+    up=r.upload; localStorage[key]=up.id;
+  }
+  const have=new Set(up.received);
+  for(let i=0;i<up.chunks;i++){
+    if(!have.has(i)){
+      const blob=f.slice(i*up.chunk_size,(i+1)*up.chunk_size), headers={};
+      if(crypto.subtle)   // sirf https / localhost par milta hai
+        headers['X-Chunk-Sha256']=[...new Uint8Array(await crypto.subtle.digest('SHA-256',await blob.arrayBuffer()))]
+          .map(b=>b.toString(16).padStart(2,'0')).join('');
+      for(let t=1;;t++){
+        r=await fetch(`/api/uploads/${up.id}/chunks/${i}`,{method:'PUT',headers,body:blob})
+          .then(r=>r.json()).catch(e=>({success:false,message:String(e)}));
+        if(r.success) break;
+        if(t>=3) return r;
+        await new Promise(ok=>setTimeout(ok,1000*t));
+      }
+    }
+    onProgress((i+1)/up.chunks);
+  }
+  r=await fetch(`/api/uploads/${up.id}/finalize`,{method:'POST'}).then(r=>r.json());
+  if(r.success) delete localStorage[key];
+  return r;
+}
+
 async function delAtt(id){
   if(!confirm('Attachment delete karna chahte ho?')) return;
   await fetch('/api/attachments/'+id,{method:'DELETE'});
@@ -1447,7 +3683,16 @@ async function doImport(inp){
   const rd=document.getElementById('impRes');
   rd.innerHTML='<div class="toast t-info"><span class="spin"></span> Importing…</div>';
   const fd=new FormData(); fd.append('file',f);
-  const r=await fetch('/api/projects/'+curPid+'/import',{method:'POST',body:fd}).then(r=>r.json());
+  const big=f.size>5*1024*1024;   // badi file — background job, progress poll karo
+  let r=await fetch('/api/projects/'+curPid+'/import'+(big?'?async=1':''),{method:'POST',body:fd}).then(r=>r.json());
+  if(r.success && r.job){
+    const j=await pollJob(r.job.id, j=>{
+      rd.innerHTML=`<div class="toast t-info"><span class="spin"></span>
+        Importing… ${j.progress}${j.total?' / '+j.total:''} rows
+        <button class="btn btn-err btn-sm" onclick="cancelJob('${j.id}')">Cancel</button></div>`;
+    });
+    r={success:j.status==='done', message:j.message, cols:j.result.cols};
+  }
   rd.innerHTML=r.success
     ?`<div class="toast t-ok">✅ ${r.message} (${r.cols} columns)</div>`
     :`<div class="toast t-err">❌ ${r.message}</div>`;
@@ -1455,9 +3700,24 @@ async function doImport(inp){
   if(r.success){await loadCols(); loadRecs(); loadStats();}
 }
 
-function doExport(){
+async function pollJob(id, onTick){
+  while(true){
+    const r=await fetch('/api/jobs/'+id).then(r=>r.json());
+    if(!r.success) return {status:'failed', message:'Job not found', result:{}};
+    if(['done','failed','cancelled'].includes(r.job.status)) return r.job;
+    if(onTick) onTick(r.job);
+    await new Promise(res=>setTimeout(res,1000));
+  }
+}
+
+async function cancelJob(id){
+  await fetch('/api/jobs/'+id+'/cancel',{method:'POST'});
+  toast('Cancelling…','info');
+}
+
+function doExport(fmt){
   if(!curPid){toast('Pehle file choose karo','err');return;}
-  window.open('/api/projects/'+curPid+'/export','_blank');
+  window.open('/api/projects/'+curPid+'/export'+(fmt?'?format='+fmt:''),'_blank');
   toast('Downloading…','info');
 }
 
@@ -1478,6 +3738,9 @@ dz.addEventListener('drop',e=>{
     doImport(document.getElementById('xlsInp'));}
 });
 
+document.querySelector('.table-area').addEventListener('scroll',scheduleGrid);
+window.addEventListener('resize',scheduleGrid);
+
 function toast(msg,type='info'){
   const tc=document.getElementById('tc');
   const t=document.createElement('div');
@@ -1488,6 +3751,9 @@ function toast(msg,type='info'){
 </body>
 </html>"""
 
+SHELL, ASSETS = build_shell(HTML)
+SHELL_TAG = 'h' + hashlib.sha1(SHELL).hexdigest()[:16]
+
 
 if __name__ == '__main__':
     print("="*55)
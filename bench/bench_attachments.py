@@ -0,0 +1,74 @@
+"""
+Record listing — N+1 attachment queries vs ek grouped query per page.
+
+python bench/bench_attachments.py [sizes...]     (default: 1000 10000 50000)
+"""
+
+import os, sys, json, time, tempfile, sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CRM_DB_PATH', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+import app as A
+
+A.DB_PATH = os.environ['CRM_DB_PATH']
+A.init_db()
+QUERIES = [0]
+_get_db = A.get_db
+
+def counting_db():
+    conn = _get_db()
+    conn.set_trace_callback(lambda sql: QUERIES.__setitem__(0, QUERIES[0] + 1))
+    return conn
+
+A.get_db = counting_db
+
+
+def seed(n):
+    with _get_db() as conn:
+        pid = conn.execute("INSERT INTO projects(name) VALUES(?)", (f'bench {n}',)).lastrowid
+        cid = conn.execute("INSERT INTO crm_columns(project_id,name) VALUES(?,?)",
+                           (pid, 'Name')).lastrowid
+        conn.executemany("INSERT INTO crm_records(project_id,data) VALUES(?,?)",
+                         [(pid, json.dumps({str(cid): f'row {i}'})) for i in range(n)])
+        rids = [r[0] for r in conn.execute("SELECT id FROM crm_records WHERE project_id=?", (pid,))]
+        conn.executemany(
+            "INSERT INTO attachments(record_id,filename,original_name,file_type,file_size) "
+            "VALUES(?,?,?,?,?)",
+            [(rid, f'{rid}.pdf', 'a.pdf', 'pdf', 1000) for rid in rids[::3]])
+    return pid
+
+
+def old_listing(pid):
+    """Pehle wala get_records — saari rows, har row ke liye alag attachments query"""
+    with A.app.test_request_context(), A.get_db() as conn:
+        out = []
+        for row in conn.execute("SELECT * FROM crm_records WHERE project_id=? "
+                                "ORDER BY created_at DESC", (pid,)).fetchall():
+            atts = [A.att_to_dict(a) for a in conn.execute(
+                "SELECT * FROM attachments WHERE record_id=?", (row['id'],)).fetchall()]
+            out.append(A.record_to_dict(row, atts))
+    return len(out)
+
+
+def new_listing(pid, all_pages):
+    c, n, cur = A.app.test_client(), 0, None
+    while True:
+        u = f'/api/projects/{pid}/records?limit={A.PAGE_SIZE}&count=none'
+        r = c.get(u + (f'&cursor={cur}' if cur else '')).get_json()
+        n += len(r['records']); cur = r['next_cursor']
+        if not (all_pages and cur): return n
+
+
+def run(label, fn):
+    QUERIES[0] = 0
+    t = time.perf_counter(); rows = fn()
+    print(f"  {label:<28} rows={rows:<7} queries={QUERIES[0]:<7} {(time.perf_counter()-t)*1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    for n in [int(a) for a in sys.argv[1:]] or [1000, 10000, 50000]:
+        pid = seed(n)
+        print(f"{n} records, {len(range(0, n, 3))} attachments")
+        run('before: full N+1 listing', lambda: old_listing(pid))
+        run('after: first page', lambda: new_listing(pid, False))
+        run('after: all pages', lambda: new_listing(pid, True))
@@ -0,0 +1,71 @@
+"""
+Column delete — purana eager rewrite (har record json decode + UPDATE) vs tombstone + compaction.
+Request time woh hai jitni der DB write lock pakda rehta hai; compaction background job mein
+DELETE_BATCH records ke chhote transactions mein chalti hai.
+
+python bench/bench_del_column.py [rows...]     (default: 10000 100000)
+"""
+
+import os, sys, json, time, tempfile, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CRM_DB_PATH', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+os.environ.setdefault('CRM_JOB_WORKERS', '0')   # compaction yahan khud chalate hain
+import app as A
+
+NCOLS = 11
+
+
+def seed(conn, n, storage):
+    pid = conn.execute("INSERT INTO projects(name,storage) VALUES(?,?)",
+                       (f'bench {n} {storage}', storage)).lastrowid
+    cids = [conn.execute("INSERT INTO crm_columns(project_id,name,col_order) VALUES(?,?,?)",
+                         (pid, f'Col {i}', i)).lastrowid for i in range(NCOLS)]
+    rnd = random.Random(n)
+    for i in range(0, n, A.IMPORT_BATCH):
+        A._insert_batch(conn, pid, [(pid, json.dumps({str(c): f'v{rnd.randint(1, 9999)}' for c in cids}))
+                                    for _ in range(min(A.IMPORT_BATCH, n - i))], storage)
+    conn.commit()
+    return pid, cids
+
+
+def old_del_column(conn, pid, cid):
+    for rec in conn.execute(
+            "SELECT id, data FROM crm_records WHERE project_id=?", (pid,)).fetchall():
+        try:
+            d = json.loads(rec['data']); d.pop(str(cid), None)
+            conn.execute("UPDATE crm_records SET data=? WHERE id=?", (json.dumps(d), rec['id']))
+        except: pass
+    conn.execute("DELETE FROM crm_columns WHERE id=? AND project_id=?", (cid, pid))
+    conn.commit()
+
+
+def timed(label, fn):
+    t = time.perf_counter(); out = fn()
+    print(f"  {label:<44} {time.perf_counter() - t:8.3f} s")
+    return out
+
+
+if __name__ == '__main__':
+    client = A.app.test_client()
+    for n in [int(a) for a in sys.argv[1:]] or [10000, 100000]:
+        print(f"{n} rows x {NCOLS} columns")
+        with A.get_db() as conn:
+            pid, cids = seed(conn, n, 'json')
+            timed('json  before: eager rewrite (request)', lambda: old_del_column(conn, pid, cids[3]))
+            timed('json  after:  tombstone (request)',
+                  lambda: client.delete(f'/api/projects/{pid}/columns/{cids[4]}'))
+            timed('json  after:  compaction (background)', lambda: A.compact_columns(conn, pid))
+            left = conn.execute("SELECT COUNT(*) FROM crm_records WHERE project_id=? AND "
+                                f"""json_type(data, '$."{cids[4]}"') IS NOT NULL""", (pid,)).fetchone()[0]
+            assert left == 0, left
+
+            pid, cids = seed(conn, n, 'cells')
+            timed('cells after:  tombstone (request)',
+                  lambda: client.delete(f'/api/projects/{pid}/columns/{cids[4]}'))
+            timed('cells after:  compaction (background)', lambda: A.compact_columns(conn, pid))
+            left = conn.execute("SELECT COUNT(*) FROM crm_cells WHERE column_id=?",
+                                (cids[4],)).fetchone()[0]
+            assert left == 0, left
+        A._local.conn.execute("DELETE FROM jobs")
+        A._local.conn.commit()
@@ -0,0 +1,70 @@
+"""
+Excel import — purana iterrows + per-row INSERT vs column-wise payloads + chunked executemany.
+
+python bench/bench_import.py [rows...]     (default: 10000 100000 500000)
+"""
+
+import os, sys, json, time, tempfile, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TMP = tempfile.mkdtemp()
+os.environ.setdefault('CRM_DB_PATH', os.path.join(TMP, 'bench.db'))
+import openpyxl
+import app as A
+
+HEADERS = ['Client Name','Location','PO Number','Item Code','Size','Type',
+           'Material','Diameter','Quantity','Date','Remarks']
+
+
+def make_sheet(n):
+    path = os.path.join(TMP, f'sheet_{n}.xlsx')
+    wb = openpyxl.Workbook(write_only=True); ws = wb.create_sheet()
+    ws.append(HEADERS)
+    rnd = random.Random(n)
+    for i in range(n):
+        ws.append([f'Client {rnd.randint(1, 500)}', 'Pune', f'PO-{i}', f'IC{i % 97}', '6x12',
+                   'Bag', 'PP', rnd.choice(['', '150']), rnd.randint(1, 900), '2025-01-01',
+                   '' if i % 3 else 'urgent'])
+    wb.save(path)
+    return path
+
+
+def old_insert(conn, pid, df, headers, col_map):
+    inserted = 0
+    for _, row in df.iterrows():
+        rd = {str(col_map[h]): str(row[h]).strip()
+              for h in headers
+              if str(row[h]).strip() and str(row[h]).strip() != 'nan'}
+        if any(rd.values()):
+            conn.execute("INSERT INTO crm_records(project_id,data) VALUES(?,?)",
+                         (pid, json.dumps(rd)))
+            inserted += 1
+    return inserted
+
+
+def timed(label, fn):
+    t = time.perf_counter(); out = fn()
+    print(f"  {label:<34} {time.perf_counter() - t:8.2f} s")
+    return out
+
+
+if __name__ == '__main__':
+    for n in [int(a) for a in sys.argv[1:]] or [10000, 100000, 500000]:
+        path = make_sheet(n)
+        print(f"{n} rows ({os.path.getsize(path) / 1e6:.1f} MB)")
+        with open(path, 'rb') as f: raw = f.read()
+        df, headers = timed('read_excel (dono mein same)', lambda: A._read_sheet(raw))
+        df = df[headers]
+        for label, fn in [('before: iterrows + INSERT per row', old_insert),
+                          ('after: column-wise + executemany',
+                           lambda conn, pid, df, headers, cm: A._import_frame(conn, pid, df, cm))]:
+            with A.get_db() as conn:
+                pid = conn.execute("INSERT INTO projects(name) VALUES(?)", (label,)).lastrowid
+                col_map = A._import_columns(conn, pid, headers)
+                rows = timed(label, lambda: fn(conn, pid, df, headers, col_map))
+            assert rows == n, rows
+        with A.get_db() as conn:   # dono pipelines ka JSON same hona chahiye
+            a, b = ([json.loads(r['data']) for r in conn.execute(
+                "SELECT data FROM crm_records WHERE project_id=? ORDER BY id LIMIT 1000", (p,))]
+                for p in (pid - 1, pid))
+            assert [sorted(x.values()) for x in a] == [sorted(x.values()) for x in b]
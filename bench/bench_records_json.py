@@ -0,0 +1,65 @@
+"""
+Records page ka JSON — purana record_to_dict + jsonify vs stored text passthrough + record_json
+(orjson ho toh usse). Saath mein CSV export aur fmt_date cache.
+
+python bench/bench_records_json.py [rows...]     (default: 2000 — MAX_PAGE_SIZE ka ek page)
+"""
+
+import os, sys, json, time, tempfile, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CRM_DB_PATH', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+os.environ.setdefault('CRM_JOB_WORKERS', '0')
+os.environ.setdefault('CRM_MAX_PAGE_SIZE', '100000')
+from flask import jsonify
+import app as A
+
+NCOLS = 20
+
+
+def seed(conn, n):
+    pid = conn.execute("INSERT INTO projects(name) VALUES(?)", (f'bench {n}',)).lastrowid
+    cids = [conn.execute("INSERT INTO crm_columns(project_id,name,col_order) VALUES(?,?,?)",
+                         (pid, f'Col {i}', i)).lastrowid for i in range(NCOLS)]
+    rnd = random.Random(n)
+    rows = [(pid, json.dumps({str(c): f'value {rnd.randint(1, 99999)}' for c in cids}),
+             'tag', 'some notes', f'2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} '
+             f'{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:00') for _ in range(n)]
+    conn.executemany("INSERT INTO crm_records(project_id,data,tags,notes,created_at) VALUES(?,?,?,?,?)", rows)
+    conn.commit()
+    return pid
+
+
+def old_page(conn, pid, n):
+    page = conn.execute("SELECT r.* FROM crm_records r WHERE r.project_id = ? "
+                        "ORDER BY r.created_at DESC, r.id DESC LIMIT ?", (pid, n)).fetchall()
+    fmt = lambda s: A.datetime.fromisoformat(s.split('.')[0]).strftime('%d %b %Y')
+    result = [{'id': r['id'], 'data': json.loads(r['data']), 'tags': r['tags'] or '',
+               'notes': r['notes'] or '', 'created_at': fmt(r['created_at']), 'attachments': []}
+              for r in page]
+    return jsonify({'success': True, 'records': result}).get_data()
+
+
+def timed(label, fn, reps=5):
+    best = float('inf')
+    for _ in range(reps):
+        t = time.perf_counter(); out = fn(); best = min(best, time.perf_counter() - t)
+    print(f"  {label:<40} {best * 1000:9.1f} ms")
+    return out
+
+
+if __name__ == '__main__':
+    client = A.app.test_client()
+    print(f"encoder: {'orjson' if A.orjson else 'json (stdlib)'}")
+    for n in [int(a) for a in sys.argv[1:]] or [2000]:
+        print(f"{n} rows x {NCOLS} columns")
+        with A.get_db() as conn:
+            pid = seed(conn, n)
+            with A.app.test_request_context():
+                before = timed('before: record_to_dict + jsonify', lambda: old_page(conn, pid, n))
+        after = timed('after:  passthrough + record_json',
+                      lambda: client.get(f'/api/projects/{pid}/records?limit={n}&count=none').get_data())
+        a, b = json.loads(before)['records'], json.loads(after)['records']
+        assert a == b, 'payload mismatch'
+        print(f"  {'bytes before / after':<40} {len(before):>9} / {len(after)}")
+        timed('csv export', lambda: sum(map(len, A.export_csv(pid))), reps=3)
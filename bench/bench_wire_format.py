@@ -0,0 +1,70 @@
+"""
+get_records wire formats — json (array of record objects) vs ?format=columns vs ?format=ndjson.
+Payload bytes (raw aur gzip) aur client parse time. Parse node se naapte hain (browser jaisa
+JSON.parse); node na ho toh Python json.loads.
+
+python bench/bench_wire_format.py [rows...]     (default: 2000 — MAX_PAGE_SIZE ka ek page)
+"""
+
+import os, sys, json, gzip, time, shutil, tempfile, random, subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TMP = tempfile.mkdtemp()
+os.environ.setdefault('CRM_DB_PATH', os.path.join(TMP, 'bench.db'))
+os.environ.setdefault('CRM_JOB_WORKERS', '0')
+os.environ.setdefault('CRM_MAX_PAGE_SIZE', '100000')
+import app as A
+
+NCOLS = 30
+NODE = shutil.which('node')
+PARSE_JS = """
+const fs=require('fs'); const [file, kind]=process.argv.slice(2);
+const txt=fs.readFileSync(file,'utf8'); let best=1e9;
+for(let k=0;k<7;k++){
+  const t=process.hrtime.bigint();
+  if(kind==='ndjson') txt.split('\\n').filter(Boolean).map(JSON.parse); else JSON.parse(txt);
+  best=Math.min(best, Number(process.hrtime.bigint()-t)/1e6);
+}
+console.log(best.toFixed(1));
+"""
+
+
+def seed(conn, n):
+    pid = conn.execute("INSERT INTO projects(name) VALUES(?)", (f'bench {n}',)).lastrowid
+    cids = [conn.execute("INSERT INTO crm_columns(project_id,name,col_order) VALUES(?,?,?)",
+                         (pid, f'Col {i}', i)).lastrowid for i in range(NCOLS)]
+    rnd = random.Random(n)
+    # har teesra column lagbhag unique (PO no., remarks), baaki chhote sets se (client, city, status)
+    pools = [None if i % 3 == 0 else [f'{i}-option-{k}' for k in range(5 * (i + 1))] for i in range(NCOLS)]
+    A._insert_batch(conn, pid, [(pid, json.dumps({
+        str(c): f'PO-{rnd.randint(1, 10**6)}' if pool is None else rnd.choice(pool)
+        for c, pool in zip(cids, pools) if rnd.random() < 0.8})) for _ in range(n)], 'json')
+    conn.commit()
+    return pid
+
+
+def parse_ms(body, kind):
+    path = os.path.join(TMP, f'page.{kind}')
+    with open(path, 'wb') as f: f.write(body)
+    if NODE:
+        js = os.path.join(TMP, 'parse.js')
+        with open(js, 'w') as f: f.write(PARSE_JS)
+        return float(subprocess.check_output([NODE, js, path, kind]))
+    t = time.perf_counter()
+    [json.loads(l) for l in body.splitlines()] if kind == 'ndjson' else json.loads(body)
+    return (time.perf_counter() - t) * 1000
+
+
+if __name__ == '__main__':
+    client = A.app.test_client()
+    print(f"parse: {'node JSON.parse' if NODE else 'python json.loads'}")
+    for n in [int(a) for a in sys.argv[1:]] or [2000]:
+        print(f"{n} rows x {NCOLS} columns")
+        with A.get_db() as conn:
+            pid = seed(conn, n)
+        for kind in ('json', 'columns', 'ndjson'):
+            t = time.perf_counter()
+            body = client.get(f'/api/projects/{pid}/records?limit={n}&count=none&format={kind}').get_data()
+            server = (time.perf_counter() - t) * 1000
+            print(f"  {kind:<8} {len(body):>10} B  gzip {len(gzip.compress(body)):>9} B  "
+                  f"server {server:7.1f} ms  parse {parse_ms(body, kind):7.1f} ms")
@@ -0,0 +1,29 @@
+"""
+Tests ka common setup — app import hone se PEHLE temp DB / uploads / jobs folder, aur job
+workers band (tests jobs khud run_jobs() se isi thread mein chalate hain).
+"""
+
+import os, sys, tempfile
+
+_tmp = tempfile.mkdtemp()
+os.environ['CRM_DB_PATH'] = os.path.join(_tmp, 'test.db')
+os.environ['CRM_UPLOAD_FOLDER'] = os.path.join(_tmp, 'uploads')
+os.environ['CRM_JOB_FOLDER'] = os.path.join(_tmp, 'jobs')
+os.environ['CRM_JOB_WORKERS'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import app as A
+
+
+@pytest.fixture
+def client():
+    return A.app.test_client()
+
+
+@pytest.fixture
+def record(client):
+    """Naye project ka ek record → (pid, rid)"""
+    pid = client.post('/api/projects', json={'name': 'T'}).get_json()['project']['id']
+    rid = client.post(f'/api/projects/{pid}/records', json={'data': {}}).get_json()['record']['id']
+    return pid, rid
@@ -0,0 +1,104 @@
+"""
+Content-addressed attachment store — same bytes ek hi file, refs triggers se, dedupe_uploads
+purani uuid files ko sha path par laata hai. refs 0 → file_trash → purge_files; gc_uploads
+bina blob wali files.
+"""
+
+import io, os, uuid
+import app as A
+
+
+def run_jobs():
+    while (job := A._claim_job()): A._run_job(job)
+
+
+def upload(client, rid, body, name='a.txt'):
+    return client.post(f'/api/records/{rid}/attachments',
+                       data={'file': (io.BytesIO(body), name)}).get_json()['attachment']
+
+
+def on_disk(rel): return os.path.exists(os.path.join(A.app.config['UPLOAD_FOLDER'], rel))
+
+
+def refs(path):
+    r = A.get_db().execute("SELECT refs FROM blobs WHERE path=?", (path,)).fetchone()
+    return r and r['refs']
+
+
+def test_same_bytes_one_file(client, record):
+    pid, rid = record
+    body = os.urandom(1000)
+    a = upload(client, rid, body)
+    rid2 = client.post(f'/api/projects/{pid}/records', json={'data': {}}).get_json()['record']['id']
+    b = upload(client, rid2, body, 'copy.txt')
+    u = client.post(f'/api/records/{rid2}/uploads', json={'filename': 'c.txt', 'size': len(body)}
+                    ).get_json()['upload']
+    client.put(f"/api/uploads/{u['id']}/chunks/0", data=body)
+    c = client.post(f"/api/uploads/{u['id']}/finalize").get_json()['attachment']
+    assert a['filename'] == b['filename'] == c['filename'] and refs(a['filename']) == 3
+    assert a['id'] != b['id'] and b['original_name'] == 'copy.txt'
+
+
+def test_refs_drop_to_zero(client, record):
+    pid, rid = record
+    a = upload(client, rid, b'shared content')
+    b = upload(client, rid, b'shared content')
+    client.delete(f"/api/attachments/{a['id']}")
+    assert refs(a['filename']) == 1 and client.get(b['url']).status_code == 200
+    client.delete(f'/api/records/{rid}')   # cascade se attachments row — trigger wahi
+    assert refs(a['filename']) is None
+    assert A.get_db().execute("SELECT 1 FROM file_trash WHERE path=?", (a['filename'],)).fetchone()
+
+
+def test_dedupe_legacy_files(client, record):
+    pid, rid = record
+    body = os.urandom(500)
+    a = upload(client, rid, body)
+    legacy = uuid.uuid4().hex + '.txt'   # purana naam: uuid, content wahi
+    with open(os.path.join(A.app.config['UPLOAD_FOLDER'], legacy), 'wb') as f: f.write(body)
+    with A.get_db() as conn:
+        conn.execute("INSERT INTO attachments(record_id,filename,original_name,file_type,file_size) "
+                     "VALUES(?,?,?,?,?)", (rid, legacy, 'old.txt', 'document', len(body)))
+    etag = client.get(f'/api/records/{rid}').headers['ETag']
+    A.dedupe_uploads(A.get_db())
+    atts = client.get(f'/api/records/{rid}').get_json()['record']['attachments']
+    assert {x['filename'] for x in atts} == {a['filename']} and refs(a['filename']) == 2
+    # filename badla → version bhi, purane ETag par 304 nahi
+    assert client.get(f'/api/records/{rid}', headers={'If-None-Match': etag}).status_code == 200
+    run_jobs()   # purge_files
+    assert not on_disk(legacy) and on_disk(a['filename'])
+
+
+def test_purge_after_last_ref(client, record):
+    a = upload(client, record[1], os.urandom(300))
+    client.delete(f"/api/attachments/{a['id']}")
+    assert on_disk(a['filename'])   # request ne unlink nahi kiya — job karega
+    run_jobs()
+    assert not on_disk(a['filename'])
+    assert not A.get_db().execute("SELECT 1 FROM file_trash WHERE path=?", (a['filename'],)).fetchone()
+
+
+def test_reupload_before_purge_keeps_file(client, record):
+    body = os.urandom(300)
+    a = upload(client, record[1], body)
+    client.delete(f"/api/attachments/{a['id']}")
+    b = upload(client, record[1], body)   # wahi content purge se pehle wapas
+    run_jobs()
+    assert b['filename'] == a['filename'] and client.get(b['url']).data == body
+
+
+def test_gc_orphans(client, record):
+    a = upload(client, record[1], os.urandom(200))
+    root = A.app.config['UPLOAD_FOLDER']
+    stray = ['ff/ee/' + 'f' * 64 + '.txt', '.thumbs/ff/ee/' + 'e' * 64 + '.jpg', 'old-uuid-name.pdf']
+    for rel in stray:
+        os.makedirs(os.path.dirname(os.path.join(root, rel)), exist_ok=True)
+        with open(os.path.join(root, rel), 'wb') as f: f.write(b'x' * 10)
+    gone = upload(client, record[1], os.urandom(200))
+    os.remove(os.path.join(root, gone['filename']))   # blob hai, file nahi
+    rep = A.gc_uploads(A.get_db(), dry_run=True)
+    assert rep['orphans'] >= 3 and gone['filename'] in rep['missing'] and rep['removed'] == 0
+    assert all(on_disk(rel) for rel in stray)
+    rep = A.gc_uploads(A.get_db())
+    assert rep['removed'] >= 3 and rep['failed'] == 0
+    assert not any(on_disk(rel) for rel in stray) and on_disk(a['filename'])
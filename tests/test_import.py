@@ -0,0 +1,52 @@
+"""
+Excel import — stream (openpyxl read-only) aur frame (pandas) path ek hi file se ek hi columns
+aur records banate hain; kaunsa path chale yeh sirf file size par depend karta hai.
+"""
+
+import io
+import openpyxl
+import pytest
+
+
+def xlsx(rows):
+    """rows: {row_no: [values]} — beech ki / shuru ki rows khaali rehti hain"""
+    wb = openpyxl.Workbook(); ws = wb.active
+    for i, vals in rows.items():
+        for j, v in enumerate(vals, 1):
+            if v is not None: ws.cell(row=i, column=j, value=v)
+    out = io.BytesIO(); wb.save(out)
+    return out.getvalue()
+
+
+def imported(client, body, mode):
+    """body ko naye project mein mode se import karo → (status, column names, records as {name: value})"""
+    pid = client.post('/api/projects', json={'name': f'I {mode}'}).get_json()['project']['id']
+    r = client.post(f'/api/projects/{pid}/import?mode={mode}', data={'file': (io.BytesIO(body), 'i.xlsx')})
+    if r.status_code != 200: return r.status_code, None, None
+    assert r.get_json()['mode'] == mode
+    names = {str(c['id']): c['name'] for c in client.get(f'/api/projects/{pid}/columns').get_json()['columns']}
+    recs = client.get(f'/api/projects/{pid}/records?limit=500').get_json()['records']
+    return 200, sorted(names.values()), sorted(sorted((names[k], v) for k, v in rec['data'].items()) for rec in recs)
+
+
+SHEETS = {
+    'header row 1':        {1: ['Client', 'City', 'Amount'], 2: ['Acme', 'Pune', 10], 3: ['Beta', None, 2.5]},
+    'header after blanks': {4: ['Client', 'City'], 5: ['Acme', 'Pune'], 7: ['Beta', 'Goa']},
+    'title row':           {1: ['Sales report'], 3: ['Client', 'City'], 4: ['Acme', 'Pune']},
+    'none header row':     {1: ['none', 'nan'], 2: [None, 'Client', 'Client'], 3: ['x', 'Acme', 'Acme 2']},
+    'none rows first':     {1: ['none'], 2: ['nan'], 3: ['None'], 4: ['Client'], 5: ['Acme']},
+    'header too low':      {12: ['Client'], 13: ['Acme']},
+}
+
+
+@pytest.mark.parametrize('rows', SHEETS.values(), ids=SHEETS.keys())
+def test_stream_and_frame_agree(client, rows):
+    body = xlsx(rows)
+    assert imported(client, body, 'stream') == imported(client, body, 'frame')
+
+
+def test_header_below_blank_rows(client):
+    body = xlsx({4: ['Client', 'City'], 5: ['Acme', 'Pune'], 7: ['Beta', None]})
+    status, names, recs = imported(client, body, 'stream')
+    assert status == 200 and names == ['City', 'Client']
+    assert recs == [[('City', 'Pune'), ('Client', 'Acme')], [('Client', 'Beta')]]
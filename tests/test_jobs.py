@@ -0,0 +1,92 @@
+"""
+Job queue — heartbeat purana hone par doosra worker job le leta hai aur purana JobLost se ruk
+jaata hai (status sirf naya owner likhta hai); JOB_TTL ke baad khatam jobs aur files hat jaati hain.
+"""
+
+import os, time, threading
+import pytest
+import app as A
+
+STEPS = {}   # job id → har step se pehle chalne wala hook (test beech mein kuch karwata hai)
+
+
+@A.job_kind('test_steps')
+def _job_test_steps(job):
+    for i in range(job.done, 3):
+        STEPS.get(job.id, lambda i: None)(i)
+        job.update(i + 1, 3)
+    return {'message': 'ok', 'owner': job.owner}
+
+
+def run_jobs():
+    while (job := A._claim_job()): A._run_job(job)
+
+
+def in_thread(fn):
+    """fn alag thread mein (alag owner, alag connection) → uska return"""
+    out = []
+    t = threading.Thread(target=lambda: out.append(fn())); t.start(); t.join()
+    return out[0]
+
+
+def job_row(jid):
+    return A.get_db().execute("SELECT * FROM jobs WHERE id=?", (jid,)).fetchone()
+
+
+def test_stale_job_taken_over():
+    run_jobs()
+    jid = A.submit_job('test_steps')['id']
+    taken = []
+    def takeover(i):
+        if i != 1: return
+        with A.get_db() as conn:   # heartbeat ruk gaya — JOB_STALE se purana
+            conn.execute("UPDATE jobs SET heartbeat=datetime('now', '-1 hour') WHERE id=?", (jid,))
+        taken.append(in_thread(A._claim_job))
+    STEPS[jid] = takeover
+    job = A._claim_job()
+    assert job.id == jid and A._job_running == {}
+    A._run_job(job)   # step 1 par job chhin gayi → JobLost, status nahi likha
+    new = taken[0]
+    assert new.id == jid and new.owner != job.owner and new.done == 1
+    row = job_row(jid)
+    assert row['status'] == 'running' and row['owner'] == new.owner and row['attempts'] == 2
+    assert jid not in A._job_running
+    del STEPS[jid]
+    in_thread(lambda: A._run_job(new))   # naya owner wahin se aage (progress 1) khatam karta hai
+    row = job_row(jid)
+    assert row['status'] == 'done' and row['owner'] is None and row['progress'] == 3
+    assert new.owner in row['result']
+
+
+def test_old_owner_cannot_finish():
+    run_jobs()
+    jid = A.submit_job('test_steps')['id']
+    job = A._claim_job()
+    with A.get_db() as conn:
+        conn.execute("UPDATE jobs SET owner='elsewhere:1:1' WHERE id=?", (jid,))
+    with pytest.raises(A.JobLost):
+        job.update(1, 3)
+    assert job_row(jid)['progress'] == 0
+    A._run_job(job)
+    assert job_row(jid)['status'] == 'running' and job_row(jid)['owner'] == 'elsewhere:1:1'
+
+
+def test_prune_after_ttl():
+    run_jobs()
+    folder, old = A.app.config['JOB_FOLDER'], time.time() - A.JOB_TTL - 60
+    ids = {s: A.submit_job('test_steps')['id'] for s in ('done_old', 'done_new', 'running_old')}
+    with A.get_db() as conn:
+        for s, jid in ids.items():
+            conn.execute("UPDATE jobs SET status=?, updated_at=datetime('now', ?) WHERE id=?",
+                         (s.split('_')[0], f'-{A.JOB_TTL + 60} seconds' if s.endswith('old') else '-1 minute', jid))
+    files = {s: os.path.join(folder, f'{s}.csv') for s in ('orphan_old', 'orphan_new')}
+    files.update({s: A._job_file(jid, 'csv') for s, jid in ids.items()})
+    for s, f in files.items():
+        open(f, 'w').close()
+        os.utime(f, (old, old))
+    os.utime(files['orphan_new'])   # abhi ki — export likh raha ho sakta hai
+    rows, removed = A.prune_jobs(A.get_db())
+    assert rows >= 1 and removed >= 2
+    assert job_row(ids['done_old']) is None
+    assert job_row(ids['done_new']) and job_row(ids['running_old'])
+    assert {s for s, f in files.items() if os.path.exists(f)} == {'orphan_new', 'done_new', 'running_old'}
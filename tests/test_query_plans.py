@@ -0,0 +1,161 @@
+"""
+Query plans — jo SQL endpoints aur jobs sach mein chalate hain (set_trace_callback se pakda,
+params expand kiye hue) uska EXPLAIN QUERY PLAN. Koi core table poora scan ho ya ORDER BY /
+DISTINCT ke liye temp b-tree bane toh fail — sirf PLAN_ALLOW wali queries chhoot hain.
+Triggers ki body bhi (NEW / OLD ki jagah literal) check hoti hai.
+
+python -m pytest -q tests/test_query_plans.py
+"""
+
+import io, re, sqlite3
+
+import openpyxl
+import app as A
+
+# (SQL par regex, jin tables / aliases ka SCAN theek hai + 'temp' agar sort zaroori hai)
+PLAN_ALLOW = [
+    # projects chhota table; list created_at order mein, etag id order mein
+    (r'FROM projects p LEFT JOIN project_stats', {'p', 'temp'}),
+    # column / text sort aur FTS rank — sort key index mein nahi; ix_col hint wala filter
+    # pehle rows chhant leta hai, phir created_at sort
+    (r' AS sort_key ', {'temp'}),
+    (r' AS sort_rank ', {'temp'}),
+    (r' INDEXED BY ix_col_\d+ ', {'temp'}),
+    # jobs list sirf aakhri 50; prune / live ids — jobs JOB_TTL ke baad hat jaati hain
+    (r'FROM jobs WHERE 1=1', {'jobs', 'temp'}),
+    (r'^SELECT id FROM jobs$', {'jobs'}),
+    (r'FROM sqlite_master', {'sqlite_master'}),
+    (r"FROM 'main'\.'crm_records_fts_", {'main'}),   # FTS5 ke andar ki
+    (r'^UPDATE meta_version ', {'meta_version'}),     # ek hi row
+    # maintenance jobs / CLI — poore blobs / sessions / trash par ek pass
+    (r'FROM blobs WHERE (thumb IS NULL AND )?refs > 0', {'blobs'}),
+    (r'^DELETE FROM blobs WHERE refs <= 0$', {'blobs'}),   # ix_blobs_unused (partial) scan
+    (r'^SELECT id FROM upload_sessions$', {'upload_sessions'}),
+    (r'FROM file_trash WHERE attempts < ', {'file_trash'}),
+    (r'^UPDATE file_trash SET attempts=0$', {'file_trash'}),
+    (r'^SELECT c\.id, c\.project_id, c\.col_type FROM crm_columns c JOIN projects p', {'c'}),
+]
+
+
+def plan_problems(conn, sql):
+    """sql ke plan ki woh lines jo rules todti hain"""
+    allow = set().union(*[a for rx, a in PLAN_ALLOW if re.search(rx, sql)])
+    bad = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall():
+        d = row['detail']
+        m = re.match(r'SCAN (\w+)', d)
+        if (m and 'VIRTUAL TABLE' not in d and 'CONSTANT ROW' not in d and m.group(1) not in allow) or \
+           ('TEMP B-TREE' in d and 'temp' not in allow):
+            bad.append(d)
+    return bad
+
+
+def trigger_statements(conn):
+    """Har trigger ki body ke statements, NEW.x / OLD.x ki jagah 1"""
+    for r in conn.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger'").fetchall():
+        body = re.search(r'\bBEGIN\b(.*)\bEND\s*$', r['sql'], re.S | re.I).group(1)
+        for stmt in body.split(';'):
+            if stmt.strip(): yield r['name'], re.sub(r'\b(NEW|OLD)\.\w+', '1', stmt.strip())
+
+
+def run_jobs():
+    while (job := A._claim_job()): A._run_job(job)
+
+
+def xlsx(rows):
+    wb = openpyxl.Workbook(); ws = wb.active
+    for r in rows: ws.append(r)
+    out = io.BytesIO(); wb.save(out); out.seek(0)
+    return out
+
+
+def drive(c):
+    """Har endpoint / job ek baar (ya variants ke saath)"""
+    pids = {s: c.post('/api/projects', json={'name': f'P {s}', 'storage': s}).get_json()['project']['id']
+            for s in A.STORAGES}
+    for storage, pid in pids.items():
+        name = c.post(f'/api/projects/{pid}/columns', json={'name': 'Client'}).get_json()['column']['id']
+        amt = c.post(f'/api/projects/{pid}/columns', json={'name': 'Amount', 'col_type': 'number'}
+                     ).get_json()['column']['id']
+        city = c.post(f'/api/projects/{pid}/columns', json={'name': 'City', 'insert_after': name}
+                      ).get_json()['column']['id']
+        c.patch(f'/api/projects/{pid}/columns/{name}', json={'indexed': True})
+        run_jobs()
+        rids = [c.post(f'/api/projects/{pid}/records', json={
+            'data': {str(name): f'Acme {i % 4}', str(amt): str(i * 10), str(city): 'Pune' if i % 2 else ''},
+            'tags': 'vip', 'notes': f'note {i}'}).get_json()['record']['id'] for i in range(30)]
+        url = f'/api/projects/{pid}/records'
+        first = c.get(url + '?limit=5').get_json()
+        for q in ['', f'?cursor={first["next_cursor"]}', '?offset=10', '?count=estimate',
+                  '?count=none', f'?sort={name}:asc', f'?sort={amt}:desc&limit=5', '?sort=created_at:asc',
+                  f'?filter={name}:eq:Acme 1', f'?filter={name}:contains:cme',
+                  f'?filter={amt}:gt:50', f'?filter={amt}:lte:50', f'?filter={city}:empty',
+                  f'?filter={city}:notempty', '?q=acme', f'?q=acme&sort={amt}:asc', f'?fields={name},{amt}',
+                  '?format=columns', '?format=ndjson', f'?filter={name}:eq:Acme 2&sort={name}:desc&limit=2']:
+            r = c.get(url + q)
+            assert r.status_code == 200, (q, r.get_data(as_text=True))
+            nxt = r.get_json().get('next_cursor') if q != '?format=ndjson' else None
+            if nxt: c.get(url + q + ('&' if q else '?') + f'cursor={nxt}')
+        etag = c.get(url).headers['ETag']
+        c.get(url, headers={'If-None-Match': etag})
+        c.get(f'/api/projects/{pid}/columns'); c.get(f'/api/stats/{pid}')
+        c.get(f'/api/records/{rids[0]}')
+        c.put(f'/api/records/{rids[0]}', json={'notes': 'changed'})
+        c.put(f'/api/records/{rids[1]}', json={'data': {str(name): 'Beta'}})
+        a = c.post(f'/api/records/{rids[2]}/attachments',
+                   data={'file': (io.BytesIO(b'\x89PNG' + bytes([storage == 'cells'])), 'a.png')}).get_json()
+        c.get(a['attachment']['url'])
+        u = c.post(f'/api/records/{rids[3]}/uploads', json={'filename': 'b.pdf', 'size': 3}).get_json()['upload']
+        c.get(f"/api/uploads/{u['id']}")
+        c.put(f"/api/uploads/{u['id']}/chunks/0", data=b'pdf')
+        c.post(f"/api/uploads/{u['id']}/finalize")
+        u = c.post(f'/api/records/{rids[3]}/uploads', json={'filename': 'c.pdf', 'size': 3}).get_json()['upload']
+        c.delete(f"/api/uploads/{u['id']}")
+        c.delete(f"/api/attachments/{a['attachment']['id']}")
+        c.delete(f'/api/records/{rids[4]}')
+        c.delete(f'/api/projects/{pid}/columns/{city}')
+        run_jobs()
+        c.post(f'/api/projects/{pid}/import', data={'file': (xlsx([['Client', 'Amount'], ['Imp', 5]]), 'i.xlsx')})
+        c.post(f'/api/projects/{pid}/import?async=1&mode=stream',
+               data={'file': (xlsx([['Client', 'New'], ['Imp', 'x']]), 'i.xlsx')})
+        c.get(f'/api/projects/{pid}/export'); c.get(f'/api/projects/{pid}/export?format=csv').get_data()
+        jid = c.get(f'/api/projects/{pid}/export?async=1&format=csv').get_json()['job']['id']
+        run_jobs()
+        c.get(f'/api/jobs/{jid}'); c.get(f'/api/jobs/{jid}/download')
+        c.get(f'/api/jobs?project_id={pid}&status=done&kind=export')
+    c.post(f"/api/projects/{pids['json']}/storage", json={'storage': 'cells'})
+    jid = c.post(f"/api/projects/{pids['cells']}/storage", json={'storage': 'json'}).get_json()['job']['id']
+    c.post(f'/api/jobs/{jid}/cancel')
+    run_jobs()
+    for q in ['?async=1', '']:
+        pid = c.post('/api/projects', json={'name': 'Gone'}).get_json()['project']['id']
+        rid = c.post(f'/api/projects/{pid}/records', json={'data': {}}).get_json()['record']['id']
+        c.post(f'/api/records/{rid}/attachments', data={'file': (io.BytesIO(b'gone'), 'g.txt')})
+        c.delete(f'/api/projects/{pid}{q}')
+        run_jobs()
+    c.get('/api/projects'); c.get('/api/jobs'); c.get('/api/metrics')
+    conn = A.get_db()
+    A.dedupe_uploads(conn); A.make_thumbnails(conn); A.purge_files(conn)
+    A.gc_uploads(conn); A.cleanup_uploads(conn); A.prune_jobs(conn); A.sync_column_indexes(conn)
+    run_jobs()
+
+
+def test_query_plans():
+    """Har statement ka plan usi waqt (alag connection par) — baad mein schema badal chuka hota
+    hai (storage convert / column index drop)"""
+    conn, other, plans = A.get_db(), A._connect(), {}
+    def explain(sql):
+        sql = ' '.join(sql.split())
+        if sql in plans or not re.match(r'(SELECT|INSERT|UPDATE|DELETE|WITH)\b', sql, re.I): return
+        try:    plans[sql] = plan_problems(other, sql)
+        except sqlite3.Error as e: plans[sql] = [f'error: {e}']
+    conn.set_trace_callback(explain)
+    try:
+        drive(A.app.test_client())
+    finally:
+        conn.set_trace_callback(None)
+    assert len(plans) > 100   # driver sach mein endpoints tak pahuncha
+    bad = [(sql, d) for sql, ds in sorted(plans.items()) for d in ds]
+    bad += [(f'trigger {name}: {sql}', d) for name, sql in trigger_statements(other)
+            for d in plan_problems(other, sql)]
+    assert not bad, '\n'.join(f'{d}\n    {sql}' for sql, d in bad)
@@ -0,0 +1,136 @@
+"""
+Records page — keyset cursor (barabar sort keys par bhi har row ek hi baar) aur ETag / 304
+(write ke baad naya version), dono storages mein.
+"""
+
+import json, base64
+import pytest
+import app as A
+
+
+def make_project(client, storage, n):
+    """n records wala project → (pid, {naam: col_id})"""
+    pid = client.post('/api/projects', json={'name': 'R', 'storage': storage}).get_json()['project']['id']
+    cols = {nm: client.post(f'/api/projects/{pid}/columns', json=dict(name=nm, **kw)).get_json()['column']['id']
+            for nm, kw in [('Client', {}), ('Amount', {'col_type': 'number'})]}
+    for i in range(n):
+        client.post(f'/api/projects/{pid}/records', json={'data': {
+            str(cols['Client']): f'Acme {i % 3}', str(cols['Amount']): str(i % 4)}})
+    with A.get_db() as conn:   # sab ek hi second mein — created_at bhi tie
+        conn.execute("UPDATE crm_records SET created_at = '2025-01-01 10:00:00' WHERE project_id=?", (pid,))
+    return pid, cols
+
+
+def walk(client, url):
+    """cursor se saare pages → ids (order mein)"""
+    ids, cursor = [], None
+    while True:
+        r = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert r.status_code == 200, r.get_data(as_text=True)
+        body = r.get_json()
+        ids += [rec['id'] for rec in body['records']]
+        cursor = body['next_cursor']
+        if not cursor: return ids
+
+
+@pytest.mark.parametrize('storage', A.STORAGES)
+@pytest.mark.parametrize('sort', [None, 'created_at:asc', 'Client:asc', 'Amount:desc'])
+def test_cursor_pages_across_ties(client, storage, sort):
+    pid, cols = make_project(client, storage, 23)
+    url = f'/api/projects/{pid}/records?limit=4'
+    if sort:
+        col, d = sort.split(':')
+        url += f'&sort={cols.get(col, col)}:{d}'
+    ids = walk(client, url)
+    full = [rec['id'] for rec in client.get(url.replace('limit=4', 'limit=100')).get_json()['records']]
+    assert ids == full and len(set(ids)) == 23
+
+
+@pytest.mark.parametrize('vals', [[[1], [2]], [{'a': 1}, 2], ['x', '2'], [True, 1], [], 'x', ['x', None]])
+def test_bad_cursor_is_400(client, vals):
+    pid, _ = make_project(client, 'json', 1)
+    cursor = base64.urlsafe_b64encode(json.dumps(vals).encode()).decode().rstrip('=')
+    r = client.get(f'/api/projects/{pid}/records?cursor={cursor}')
+    assert r.status_code == 400
+    assert client.get(f'/api/projects/{pid}/records?cursor=%%%').status_code == 400
+
+
+@pytest.mark.parametrize('storage', A.STORAGES)
+def test_etag_304_until_write(client, storage):
+    pid, cols = make_project(client, storage, 3)
+    rid = client.get(f'/api/projects/{pid}/records').get_json()['records'][0]['id']
+    urls = [f'/api/projects/{pid}/records', f'/api/projects/{pid}/records?format=columns',
+            f'/api/records/{rid}', f'/api/projects/{pid}/columns', f'/api/stats/{pid}', '/api/projects']
+    writes = [lambda: client.put(f'/api/records/{rid}', json={'data': {str(cols['Client']): 'Changed'}}),
+              lambda: client.post(f'/api/projects/{pid}/records', json={'data': {}}),
+              lambda: client.post(f'/api/projects/{pid}/columns', json={'name': 'City'})]
+    for write in writes:
+        tags = {u: client.get(u).headers['ETag'] for u in urls}
+        for u, t in tags.items():
+            r = client.get(u, headers={'If-None-Match': t})
+            assert r.status_code == 304 and not r.data, u
+        write()
+        r = client.get(f'/api/projects/{pid}/records', headers={'If-None-Match': tags[urls[0]]})
+        assert r.status_code == 200 and r.headers['ETag'] != tags[urls[0]]
+    # dusre project ka write is project ka ETag nahi badalta
+    tag = client.get(urls[0]).headers['ETag']
+    make_project(client, storage, 1)
+    assert client.get(urls[0], headers={'If-None-Match': tag}).status_code == 304
+
+
+def test_storages_return_same_data(client):
+    """Wahi writes dono storages mein → wahi data dict (khaali string bhi) aur wahi filters"""
+    out = {}
+    for storage in A.STORAGES:
+        pid, cols = make_project(client, storage, 0)
+        c, a = str(cols['Client']), str(cols['Amount'])
+        rids = [client.post(f'/api/projects/{pid}/records', json={'data': d}).get_json()['record']['id']
+                for d in ({c: 'Acme', a: ''}, {c: '', a: '5'}, {c: 'Beta'})]
+        client.put(f'/api/records/{rids[2]}', json={'data': {c: 'Beta', a: ''}})
+        name = {c: 'Client', a: 'Amount'}
+        recs = [{name[k]: v for k, v in client.get(f'/api/records/{rid}').get_json()['record']['data'].items()}
+                for rid in rids]
+        page = sorted(((r['id'], tuple(sorted(r['data'].items()))) for r in
+                       client.get(f'/api/projects/{pid}/records').get_json()['records']))
+        filt = {f: sorted(rids.index(r['id']) for r in client.get(
+                    f'/api/projects/{pid}/records?filter={cols[col]}:{op}').get_json()['records'])
+                for f, (col, op) in {'c empty': ('Client', 'empty'), 'a empty': ('Amount', 'empty'),
+                                     'a notempty': ('Amount', 'notempty')}.items()}
+        out[storage] = recs, [len(d) for _, d in page], filt
+    assert out['json'] == out['cells']
+    assert out['json'][0] == [{'Client': 'Acme', 'Amount': ''}, {'Client': '', 'Amount': '5'},
+                              {'Client': 'Beta', 'Amount': ''}]
+
+
+@pytest.mark.parametrize('storage', A.STORAGES)
+def test_search_skips_deleted_column(client, storage):
+    """Column delete ke baad (compact_columns se pehle bhi) uski values q se match nahi hoti"""
+    pid, cols = make_project(client, storage, 0)
+    city = client.post(f'/api/projects/{pid}/columns', json={'name': 'City'}).get_json()['column']['id']
+    c = str(cols['Client'])
+    rids = [client.post(f'/api/projects/{pid}/records', json={'data': d, 'notes': n}).get_json()['record']['id']
+            for d, n in (({c: 'Acme', str(city): 'Pune'}, ''), ({c: 'Pune Traders'}, ''),
+                         ({c: 'Beta', str(city): 'Pune'}, 'pune office'))]
+    search = lambda q: sorted(r['id'] for r in client.get(
+        f'/api/projects/{pid}/records', query_string={'q': q}).get_json()['records'])
+    assert search('pun') == rids
+    client.delete(f'/api/projects/{pid}/columns/{city}')
+    assert search('pun') == rids[1:] and search('pune acme') == []
+    assert search('notes:pune') == rids[2:] and search('Client:pune') == rids[1:2]
+    while (job := A._claim_job()): A._run_job(job)   # compaction ke baad bhi wahi
+    assert search('pun') == rids[1:] and search('pune acme') == []
+
+
+@pytest.mark.parametrize('body', [{'data': ['x']}, {'data': 'x'}, {'data': None}, ['x']])
+def test_record_data_must_be_object(client, record, body):
+    pid, rid = record
+    assert client.post(f'/api/projects/{pid}/records', json=body).status_code == 400
+    assert client.put(f'/api/records/{rid}', json=body).status_code == 400
+    assert client.get(f'/api/records/{rid}').status_code == 200
+
+
+def test_bad_count_is_400(client):
+    pid, _ = make_project(client, 'json', 2)
+    for count in ('exact', 'estimate', 'none'):
+        assert client.get(f'/api/projects/{pid}/records?count={count}').status_code == 200
+    assert client.get(f'/api/projects/{pid}/records?count=extact').status_code == 400
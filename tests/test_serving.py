@@ -0,0 +1,36 @@
+"""
+/uploads/ aur /thumbs/ — attachment serve hota hai, .partial / .thumbs / '..' wale raaste nahi.
+"""
+
+import io, os
+import pytest
+import app as A
+
+
+def test_upload_served(client, record):
+    a = client.post(f'/api/records/{record[1]}/attachments',
+                    data={'file': (io.BytesIO(b'hello'), 'a.txt')}).get_json()['attachment']
+    r = client.get(a['url'])
+    assert r.status_code == 200 and r.data == b'hello'
+    assert client.get(a['url'], headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+
+
+def test_thumb_served(client):
+    os.makedirs(os.path.join(A.app.config['THUMB_FOLDER'], 'ab', 'cd'), exist_ok=True)
+    with open(os.path.join(A.app.config['THUMB_FOLDER'], 'ab', 'cd', 'abcd.jpg'), 'wb') as f: f.write(b'jpg')
+    r = client.get('/thumbs/ab/cd/abcd.jpg')
+    assert r.status_code == 200 and r.data == b'jpg'
+
+
+@pytest.mark.parametrize('url', ['/uploads/.partial/{uid}.part',
+                                 '/uploads/x/../.partial/{uid}.part',
+                                 '/uploads/x/..%2f.partial/{uid}.part',
+                                 '/uploads/x/%2e%2e/.partial/{uid}.part',
+                                 '/thumbs/../.partial/{uid}.part',
+                                 '/thumbs/..%2f.partial/{uid}.part',
+                                 '/thumbs/x/../../.partial/{uid}.part'])
+def test_partial_upload_not_served(client, record, url):
+    uid = client.post(f'/api/records/{record[1]}/uploads',
+                      json={'filename': 'b.pdf', 'size': 4}).get_json()['upload']['id']
+    client.put(f'/api/uploads/{uid}/chunks/0', data=b'half')
+    assert client.get(url.format(uid=uid)).status_code == 404
@@ -0,0 +1,62 @@
+"""
+Chunked upload — resume, chunk / file checksum mismatch, finalize, aur finalize ke baad aaya chunk.
+"""
+
+import os, hashlib
+import app as A
+
+CHUNK = 64 * 1024
+BODY = os.urandom(2 * CHUNK + 1234)   # 3 chunks, aakhri chhota
+
+
+def chunk(i): return BODY[i * CHUNK:(i + 1) * CHUNK]
+
+
+def start(client, rid, **kw):
+    return client.post(f'/api/records/{rid}/uploads', json=dict(
+        filename='v.mp4', size=len(BODY), chunk_size=CHUNK, **kw)).get_json()['upload']
+
+
+def test_resume_and_finalize(client, record):
+    u = start(client, record[1], sha256=hashlib.sha256(BODY).hexdigest())
+    assert u['chunks'] == 3 and u['received'] == []
+    for i in (2, 0):   # order zaroori nahi
+        r = client.put(f"/api/uploads/{u['id']}/chunks/{i}", data=chunk(i),
+                       headers={'X-Chunk-Sha256': hashlib.sha256(chunk(i)).hexdigest()})
+        assert r.status_code == 200
+    # reload ke baad client session padh ke sirf bacha hua chunk bhejta hai
+    u = client.get(f"/api/uploads/{u['id']}").get_json()['upload']
+    assert u['received'] == [0, 2] and u['checksums'][0] == hashlib.sha256(chunk(0)).hexdigest()
+    assert client.post(f"/api/uploads/{u['id']}/finalize").get_json()['missing'] == [1]
+    client.put(f"/api/uploads/{u['id']}/chunks/1", data=chunk(1))
+    a = client.post(f"/api/uploads/{u['id']}/finalize").get_json()['attachment']
+    assert a['original_name'] == 'v.mp4' and client.get(a['url']).data == BODY
+    assert client.get(f"/api/uploads/{u['id']}").status_code == 404
+    assert not os.path.exists(os.path.join(A.app.config['PARTIAL_FOLDER'], f"{u['id']}.part"))
+
+
+def test_checksum_mismatch(client, record):
+    u = start(client, record[1], sha256=hashlib.sha256(BODY).hexdigest())
+    r = client.put(f"/api/uploads/{u['id']}/chunks/0", data=chunk(0), headers={'X-Chunk-Sha256': '0' * 64})
+    assert r.status_code == 422
+    assert client.get(f"/api/uploads/{u['id']}").get_json()['upload']['received'] == []
+    assert client.put(f"/api/uploads/{u['id']}/chunks/0", data=chunk(0)[:-1]).status_code == 400
+    # chunk sha na bheja ho aur bytes galat — poori file ka sha finalize par pakadta hai
+    client.put(f"/api/uploads/{u['id']}/chunks/0", data=b'x' * CHUNK)
+    for i in (1, 2): client.put(f"/api/uploads/{u['id']}/chunks/{i}", data=chunk(i))
+    assert client.post(f"/api/uploads/{u['id']}/finalize").status_code == 422
+    client.put(f"/api/uploads/{u['id']}/chunks/0", data=chunk(0))   # session bacha hai — sahi chunk
+    a = client.post(f"/api/uploads/{u['id']}/finalize").get_json()['attachment']
+    assert client.get(a['url']).data == BODY
+
+
+def test_chunk_after_finalize(client, record):
+    u = start(client, record[1])
+    for i in range(3): client.put(f"/api/uploads/{u['id']}/chunks/{i}", data=chunk(i))
+    assert client.post(f"/api/uploads/{u['id']}/finalize").status_code == 200
+    assert client.post(f"/api/uploads/{u['id']}/finalize").status_code == 404
+    assert client.put(f"/api/uploads/{u['id']}/chunks/0", data=chunk(0)).status_code == 404
+    # finalize ne file le li par session row abhi hai (beech ka pal) → 409
+    u = start(client, record[1])
+    os.remove(os.path.join(A.app.config['PARTIAL_FOLDER'], f"{u['id']}.part"))
+    assert client.put(f"/api/uploads/{u['id']}/chunks/0", data=chunk(0)).status_code == 409